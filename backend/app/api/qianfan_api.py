@@ -1,20 +1,23 @@
 """
 千帆AI直接调用API
 """
+import asyncio
+
 from fastapi import APIRouter
 from app.schemas.ticket import IntentAnalysisRequest, IntentAnalysisResponse
+from app.services.local_classifier import local_classifier
 from app.services.qianfan_service import qianfan_service
 
 router = APIRouter()
 
 @router.post("/analyze", response_model=IntentAnalysisResponse, summary="意图分析")
-async def analyze_intent(request: IntentAnalysisRequest):
+async def analyze_intent(request: IntentAnalysisRequest, no_cache: bool = False):
     """
     直接调用千帆AI进行意图分析
     
-    这个接口可以独立使用，不创建工单
+    这个接口可以独立使用，不创建工单；no_cache=true 时绕过响应缓存
     """
-    result = await qianfan_service.analyze_intent(request.content)
+    result = await qianfan_service.analyze_intent(request.content, use_cache=not no_cache)
     
     return IntentAnalysisResponse(
         core_issues=result.get("core_issues", []),
@@ -27,11 +30,11 @@ async def analyze_intent(request: IntentAnalysisRequest):
     )
 
 @router.post("/summary", summary="生成摘要")
-async def generate_summary(request: IntentAnalysisRequest):
+async def generate_summary(request: IntentAnalysisRequest, no_cache: bool = False):
     """
     为长文本生成简短摘要
     """
-    summary = await qianfan_service.generate_summary(request.content)
+    summary = await qianfan_service.generate_summary(request.content, use_cache=not no_cache)
     return {
         "content": request.content,
         "summary": summary
@@ -44,7 +47,7 @@ async def test_qianfan():
     """
     test_content = "这是一个测试消息"
     try:
-        result = await qianfan_service.analyze_intent(test_content)
+        result = await qianfan_service.analyze_intent(test_content, use_cache=False)
         return {
             "status": "success",
             "message": "千帆API连接正常",
@@ -56,3 +59,54 @@ async def test_qianfan():
             "message": f"千帆API连接失败: {str(e)}"
         }
 
+
+
+@router.get("/cache/stats", summary="千帆响应缓存统计")
+async def get_cache_stats():
+    """
+    查看响应缓存的命中率和容量
+    """
+    if qianfan_service.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **qianfan_service.cache.stats()}
+
+@router.get("/usage", summary="千帆调用用量统计")
+async def get_usage():
+    """
+    进程启动以来实际发生的模型调用次数和token用量（缓存命中不计）
+    """
+    return qianfan_service.usage
+
+@router.get("/resilience", summary="千帆调用保护状态")
+async def get_resilience():
+    """
+    熔断器状态（closed/open/half_open）、进行中的调用数、当前调用时限，
+    以及被拒绝（名额不足）、熔断短路、超时和失败的调用次数
+    """
+    if qianfan_service.guard is None:
+        return {"enabled": False}
+    return {"enabled": True, **qianfan_service.guard.stats()}
+
+@router.get("/classifier", summary="本地分类器状态")
+async def get_classifier_stats():
+    """
+    本地分类器是否启用、模型训练信息和评估结果，以及进程启动以来本地处理和交给千帆的工单数
+    """
+    return local_classifier.stats()
+
+@router.post("/classifier/reload", summary="重新加载本地分类模型")
+async def reload_classifier():
+    """
+    重新训练模型后无需重启服务，调用本接口加载新的模型文件
+    """
+    loaded = await asyncio.to_thread(local_classifier.reload)
+    return {"loaded": loaded, "path": local_classifier.path}
+
+@router.delete("/cache", summary="清空千帆响应缓存")
+async def clear_cache():
+    """
+    清空进程内响应缓存
+    """
+    if qianfan_service.cache is not None:
+        qianfan_service.cache.clear()
+    return {"message": "缓存已清空"}
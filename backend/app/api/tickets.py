@@ -1,17 +1,36 @@
 """
 工单管理API
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import datetime
+import asyncio
 import random
 import string
 
-from app.db.database import get_db
+from app.core.config import settings
+from app.db.database import get_async_db
 from app.models.ticket import Ticket
-from app.schemas.ticket import TicketCreate, TicketUpdate, TicketResponse
-from app.services.qianfan_service import qianfan_service
+from app.schemas.ticket import (
+    TicketCreate, TicketUpdate, TicketResponse, TicketSummary, TicketSearchResult, TicketClusterResponse,
+    EnrichmentStatusResponse
+)
+from app.services import search_index
+from app.services.pagination import after_cursor, after_scored_cursor, decode_cursor, set_next_cursor
+from app.services.similarity_index import embed, vector_index
+from app.services.ticket_projection import columns, parse_fields, projection_response, to_dict
+from app.services.ticket_filters import ticket_filters
+from app.services.dedup_service import (
+    can_reuse_analysis, find_duplicate_parent, get_cluster, promote_children, reuse_parent_analysis
+)
+from app.services.import_service import detect_format, run_import, spool_upload
+from app.services.enrichment_service import (
+    ENRICHMENT_QUEUED, ENRICHMENT_DONE, analyze_ticket_content, apply_enrichment,
+    classify_locally, count_backlog, enrichment_pool
+)
 
 router = APIRouter()
 
@@ -21,201 +40,332 @@ def generate_ticket_no() -> str:
     random_str = ''.join(random.choices(string.digits, k=4))
     return f"GH{timestamp}{random_str}"
 
+async def _get_ticket_or_404(db: AsyncSession, ticket_id: int) -> Ticket:
+    ticket = await db.get(Ticket, ticket_id)
+    if not ticket:
+        raise HTTPException(status_code=404, detail="工单不存在")
+    return ticket
+
+async def _paginate(db: AsyncSession, query, skip: int, limit: int, cursor: str = None) -> list:
+    """按 (created_at, id) 倒序取一页，有游标时走游标分页，否则按 skip 偏移"""
+    query = query.order_by(Ticket.created_at.desc(), Ticket.id.desc())
+    if cursor:
+        created_at, last_id, _ = decode_cursor(cursor)
+        query = query.where(after_cursor(db, created_at, last_id))
+    else:
+        query = query.offset(skip)
+    return (await db.execute(query.limit(limit))).all()
+
 @router.post("/", response_model=TicketResponse, summary="创建工单")
-async def create_ticket(ticket: TicketCreate, db: Session = Depends(get_db)):
+async def create_ticket(ticket: TicketCreate, db: AsyncSession = Depends(get_async_db)):
     """
     创建新工单，自动调用AI进行分析
-    """
-    import time
-    start_time = time.time()
-    
-    # 调用AI分析
-    analysis_result = await qianfan_service.analyze_intent(ticket.content)
-    
-    # 提取关键词
-    keywords_list = analysis_result.get("keywords", [])
-    if not keywords_list:
-        keywords_list = await qianfan_service.extract_keywords(ticket.content)
-    
-    # 生成解决方案建议
-    category = analysis_result.get("suggested_category", "其他")
-    solution = await qianfan_service.generate_solution(ticket.content, category)
-    
-    # 计算响应时间
-    response_time = int((time.time() - start_time) * 1000)  # 毫秒
     
-    # 创建工单
+    DEDUP_ENABLED 开启时先与近期事件工单比对指纹，判定为同一事件的重复工单挂到父工单下
+    并复用其AI分析结果，不再调用千帆；本地分类器有把握的工单同样不调用千帆。
+    ENRICHMENT_MODE=async 时工单立即入库返回，AI分析由后台协程池完成，
+    前端可轮询 /{ticket_id}/enrichment 获取补全进度
+    """
     db_ticket = Ticket(
         ticket_no=generate_ticket_no(),
         user_id=1,  # 简化版，默认用户ID
         content=ticket.content,
-        summary=analysis_result.get("summary", ""),
-        category=category,
-        department=analysis_result.get("suggested_department", "综合服务部"),
-        priority=analysis_result.get("priority", "medium"),
-        sentiment=analysis_result.get("sentiment", {}).get("type", "neutral"),
-        sentiment_score=analysis_result.get("sentiment", {}).get("intensity", 0.5),
         location_detail=ticket.location_info or "",
-        keywords=",".join(keywords_list),
-        solution_suggestion=solution,
-        response_time=response_time,
-        status="pending",
-        ai_analysis=analysis_result
+        location_reported=ticket.location_info or "",
+        status="pending"
     )
     
-    # 提取位置信息
-    entities = analysis_result.get("entities", {})
-    if "location" in entities:
-        db_ticket.location_detail = entities["location"]
+    parent = None
+    if settings.DEDUP_ENABLED:
+        parent = await db.run_sync(find_duplicate_parent, ticket.content, ticket.location_info)
+    if parent is not None:
+        db_ticket.parent_id = parent.id
+    
+    reuse_parent = parent is not None and can_reuse_analysis(parent)
+    # 本地分类器有把握的工单直接使用本地结果，不调用千帆，也不进入补全队列
+    local_fields = None if reuse_parent else classify_locally(ticket.content)
+    
+    if reuse_parent:
+        apply_enrichment(db_ticket, reuse_parent_analysis(parent))
+        if ticket.location_info:
+            db_ticket.location_detail = ticket.location_info
+    elif local_fields is not None:
+        apply_enrichment(db_ticket, local_fields)
+    elif settings.ENRICHMENT_MODE == "async" and enrichment_pool.running:
+        # 背压：积压过多时拒绝受理，避免队列无限增长
+        backlog = await asyncio.to_thread(count_backlog)
+        if backlog >= settings.ENRICHMENT_MAX_BACKLOG:
+            raise HTTPException(
+                status_code=503,
+                detail="工单受理繁忙，请稍后重试",
+                headers={"Retry-After": str(settings.ENRICHMENT_RETRY_DELAY)}
+            )
+        db_ticket.enrichment_status = ENRICHMENT_QUEUED
+        db_ticket.enrichment_attempts = 0
+    else:
+        fields = await analyze_ticket_content(ticket.content, try_local=False)
+        apply_enrichment(db_ticket, fields)
     
     db.add(db_ticket)
-    db.commit()
-    db.refresh(db_ticket)
+    await db.commit()
+    await db.refresh(db_ticket)
+    
+    if db_ticket.enrichment_status == ENRICHMENT_QUEUED:
+        enrichment_pool.notify()
     
     return db_ticket
 
+@router.post("/import", summary="批量导入工单")
+async def import_tickets(request: Request, format: str = None, analyze: bool = True):
+    """
+    批量导入历史工单
+    
+    以multipart文件（file字段）或请求体上传 JSON Lines / CSV，每条记录至少包含content。字段对应:
+    - content → 工单内容（必填）
+    - location_info → 详细位置及受理去重使用的市民提交位置
+    - location_district / location_street → 区域 / 街道
+    - user_id → 提交人；缺省时留空，工单不属于任何用户（不计入用户工单、不发通知）
+    - status → 状态，缺省为 pending
+    - created_at → 创建时间（ISO 8601），缺省为导入时间
+    format 为空时根据文件扩展名推断；analyze=false 时只入库，由后台补全协程池分析，
+    补全协程池未运行（ENRICHMENT_MODE=sync）时忽略该参数，导入过程中完成分析。
+    响应为逐行的处理进度（JSON Lines），最后一行为汇总（analyzed 表示是否在导入过程中完成了分析）
+    """
+    if format not in (None, "jsonl", "csv"):
+        raise HTTPException(status_code=400, detail="仅支持jsonl和csv格式")
+    
+    # 没有后台协程池处理时，以queued状态入库的工单永远不会被补全
+    if not analyze and not enrichment_pool.running:
+        analyze = True
+    
+    upload, filename = await spool_upload(request)
+    fmt = format or detect_format(filename, request.headers.get("content-type"))
+    return StreamingResponse(
+        run_import(upload, fmt, analyze, generate_ticket_no),
+        media_type="application/x-ndjson"
+    )
+
+@router.get("/enrichment/stats", summary="AI补全队列状态")
+async def get_enrichment_stats():
+    """后台补全协程池运行情况及积压数量"""
+    stats = enrichment_pool.stats()
+    stats["mode"] = settings.ENRICHMENT_MODE
+    stats["backlog"] = await asyncio.to_thread(count_backlog)
+    stats["max_backlog"] = settings.ENRICHMENT_MAX_BACKLOG
+    return stats
+
+@router.get("/{ticket_id}/enrichment", response_model=EnrichmentStatusResponse, summary="获取AI补全状态")
+async def get_enrichment_status(ticket_id: int, db: AsyncSession = Depends(get_async_db)):
+    """查询工单AI分析是否完成，供前端轮询"""
+    ticket = await _get_ticket_or_404(db, ticket_id)
+    
+    return EnrichmentStatusResponse(
+        ticket_id=ticket.id,
+        ticket_no=ticket.ticket_no,
+        status=ticket.status,
+        enrichment_status=ticket.enrichment_status,
+        attempts=ticket.enrichment_attempts or 0,
+        error=ticket.enrichment_error,
+        ready=ticket.enrichment_status in (None, ENRICHMENT_DONE)
+    )
+
+@router.get("/search", responses={200: {"model": List[TicketSearchResult]}}, summary="搜索工单")
+async def search_tickets(
+    response: Response,
+    keyword: str = None,
+    category: str = None,
+    status: str = None,
+    priority: str = None,
+    start_date: str = None,
+    end_date: str = None,
+    skip: int = 0,
+    limit: int = 50,
+    cursor: str = None,
+    fields: str = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    高级搜索工单
+    
+    keyword 在正文、摘要和关键词中检索，多个词用空格分隔（需同时命中）。
+    SQLite下走全文索引并按相关度排序，返回命中片段；其余筛选条件在索引结果上叠加。
+    分页同 GET /，传入上一页响应头 X-Next-Cursor 中的 cursor 时忽略 skip；返回字段同 GET /
+    """
+    names = parse_fields(fields)
+    # 命中片段从摘要、正文、关键词中截取，检索时额外查询这些列
+    selected = names + [n for n in ("summary", "content", "keywords") if keyword and n not in names]
+    match = search_index.build_match_query(keyword) if keyword and search_index.is_enabled() else None
+    
+    if match:
+        hits = search_index.search_subquery(match)
+        query = select(*columns(selected), hits.c.score).join(hits, hits.c.rowid == Ticket.id)
+    else:
+        query = select(*columns(selected))
+        if keyword:
+            query = query.where(
+                (Ticket.content.contains(keyword)) |
+                (Ticket.summary.contains(keyword)) |
+                (Ticket.keywords.contains(keyword))
+            )
+    
+    query = query.where(*ticket_filters(category, status, priority, start_date, end_date))
+    
+    position = decode_cursor(cursor) if cursor else None
+    if match:
+        if position:
+            created_at, last_id, score = position
+            query = query.where(after_scored_cursor(db, hits.c.score, score or 0.0, created_at, last_id))
+        query = query.order_by(hits.c.score, Ticket.created_at.desc(), Ticket.id.desc())
+    else:
+        if position:
+            query = query.where(after_cursor(db, position[0], position[1]))
+        query = query.order_by(Ticket.created_at.desc(), Ticket.id.desc())
+    if not position:
+        query = query.offset(skip)
+    rows = (await db.execute(query.limit(limit))).all()
+    
+    if rows:
+        await set_next_cursor(response, db, rows[-1], len(rows), limit, score=rows[-1].score if match else None)
+    
+    results = []
+    for row in rows:
+        item = to_dict(row, names)
+        # bm25分数越小越相关，取负值使其越大越相关
+        item["score"] = round(-row.score, 4) if match else None
+        item["highlight"] = search_index.highlight(row, keyword) if keyword else None
+        results.append(item)
+    return projection_response(results, response)
+
+@router.get("/{ticket_id}/cluster", response_model=TicketClusterResponse, summary="获取重复工单聚类")
+async def get_ticket_cluster(ticket_id: int, db: AsyncSession = Depends(get_async_db)):
+    """获取工单所属事件的父工单及全部重复工单，传入父工单或任一子工单均可"""
+    ticket = await _get_ticket_or_404(db, ticket_id)
+    
+    parent, *duplicates = await db.run_sync(get_cluster, ticket)
+    return TicketClusterResponse(parent=parent, duplicates=duplicates, size=1 + len(duplicates))
+
 @router.get("/{ticket_id}", response_model=TicketResponse, summary="获取工单详情")
-async def get_ticket(ticket_id: int, db: Session = Depends(get_db)):
+async def get_ticket(ticket_id: int, db: AsyncSession = Depends(get_async_db)):
     """获取指定工单的详细信息"""
-    ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
-    if not ticket:
-        raise HTTPException(status_code=404, detail="工单不存在")
-    return ticket
+    return await _get_ticket_or_404(db, ticket_id)
 
-@router.get("/", response_model=List[TicketResponse], summary="获取工单列表")
+@router.get("/", responses={200: {"model": List[TicketSummary]}}, summary="获取工单列表")
 async def list_tickets(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     status: str = None,
     category: str = None,
-    db: Session = Depends(get_db)
+    cursor: str = None,
+    fields: str = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取工单列表，支持分页和筛选
+    
+    按创建时间倒序。本页已满时响应头 X-Next-Cursor 返回下一页游标，传入 cursor 即可
+    翻页（游标分页，深翻页不变慢，翻页期间有新工单也不会重复或遗漏）；
+    不传 cursor 时按 skip/limit 分页。
+    默认只返回摘要字段（id、编号、摘要、类别、状态、优先级、创建时间），fields 指定
+    逗号分隔的其他字段（同 GET /{ticket_id}），如 fields=id,ticket_no,content,department
     """
-    query = db.query(Ticket)
+    names = parse_fields(fields)
+    query = select(*columns(names))
     
     if status:
-        query = query.filter(Ticket.status == status)
+        query = query.where(Ticket.status == status)
     if category:
-        query = query.filter(Ticket.category == category)
+        query = query.where(Ticket.category == category)
     
-    tickets = query.order_by(Ticket.created_at.desc()).offset(skip).limit(limit).all()
-    return tickets
+    rows = await _paginate(db, query, skip, limit, cursor)
+    await set_next_cursor(response, db, rows[-1] if rows else None, len(rows), limit)
+    return projection_response([to_dict(row, names) for row in rows], response)
 
 @router.put("/{ticket_id}", response_model=TicketResponse, summary="更新工单")
 async def update_ticket(
     ticket_id: int,
     ticket_update: TicketUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新工单状态或部门"""
-    ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
-    if not ticket:
-        raise HTTPException(status_code=404, detail="工单不存在")
+    ticket = await _get_ticket_or_404(db, ticket_id)
     
+    # 状态变更的通知在提交后生成（见 app.services.notification_service）
     if ticket_update.status:
         ticket.status = ticket_update.status
     if ticket_update.department:
         ticket.department = ticket_update.department
     
-    db.commit()
-    db.refresh(ticket)
+    await db.commit()
+    await db.refresh(ticket)
     return ticket
 
 @router.delete("/{ticket_id}", summary="删除工单")
-async def delete_ticket(ticket_id: int, db: Session = Depends(get_db)):
+async def delete_ticket(ticket_id: int, db: AsyncSession = Depends(get_async_db)):
     """删除指定工单"""
-    ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
-    if not ticket:
-        raise HTTPException(status_code=404, detail="工单不存在")
+    ticket = await _get_ticket_or_404(db, ticket_id)
     
-    db.delete(ticket)
-    db.commit()
+    # 删除事件工单时保留其余重复工单的聚类关系
+    await db.run_sync(promote_children, ticket)
+    await db.delete(ticket)
+    await db.commit()
     return {"message": "工单已删除", "ticket_no": ticket.ticket_no}
 
-@router.get("/user/{user_id}", response_model=List[TicketResponse], summary="获取用户工单")
+@router.get("/user/{user_id}", responses={200: {"model": List[TicketSummary]}}, summary="获取用户工单")
 async def get_user_tickets(
     user_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 20,
-    db: Session = Depends(get_db)
-):
-    """获取指定用户的所有工单"""
-    tickets = db.query(Ticket).filter(
-        Ticket.user_id == user_id
-    ).order_by(Ticket.created_at.desc()).offset(skip).limit(limit).all()
-    return tickets
-
-@router.get("/search", response_model=List[TicketResponse], summary="搜索工单")
-async def search_tickets(
-    keyword: str = None,
-    category: str = None,
-    status: str = None,
-    priority: str = None,
-    start_date: str = None,
-    end_date: str = None,
-    skip: int = 0,
-    limit: int = 50,
-    db: Session = Depends(get_db)
+    cursor: str = None,
+    fields: str = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """高级搜索工单"""
-    query = db.query(Ticket)
-    
-    if keyword:
-        query = query.filter(
-            (Ticket.content.contains(keyword)) |
-            (Ticket.summary.contains(keyword))
-        )
-    
-    if category:
-        query = query.filter(Ticket.category == category)
-    
-    if status:
-        query = query.filter(Ticket.status == status)
-    
-    if priority:
-        query = query.filter(Ticket.priority == priority)
-    
-    # 时间范围过滤
-    if start_date:
-        from datetime import datetime
-        start = datetime.fromisoformat(start_date)
-        query = query.filter(Ticket.created_at >= start)
-    
-    if end_date:
-        from datetime import datetime
-        end = datetime.fromisoformat(end_date)
-        query = query.filter(Ticket.created_at <= end)
-    
-    tickets = query.order_by(Ticket.created_at.desc()).offset(skip).limit(limit).all()
-    return tickets
+    """获取指定用户的所有工单，分页和返回字段同 GET /"""
+    names = parse_fields(fields)
+    query = select(*columns(names)).where(Ticket.user_id == user_id)
+    rows = await _paginate(db, query, skip, limit, cursor)
+    await set_next_cursor(response, db, rows[-1] if rows else None, len(rows), limit)
+    return projection_response([to_dict(row, names) for row in rows], response)
 
 @router.get("/{ticket_id}/similar", summary="查找相似工单")
-async def find_similar_tickets(ticket_id: int, db: Session = Depends(get_db)):
-    """查找与指定工单相似的历史工单"""
-    ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
-    if not ticket:
-        raise HTTPException(status_code=404, detail="工单不存在")
+async def find_similar_tickets(ticket_id: int, limit: int = 5, db: AsyncSession = Depends(get_async_db)):
+    """在全部历史工单中查找与指定工单相似的工单"""
+    ticket = await _get_ticket_or_404(db, ticket_id)
     
-    # 获取最近100条工单
-    recent_tickets = db.query(Ticket).filter(
-        Ticket.id != ticket_id
-    ).order_by(Ticket.created_at.desc()).limit(100).all()
+    # 首次查询时加载向量索引
+    await asyncio.to_thread(vector_index.ensure_loaded)
     
-    tickets_data = [{
-        "id": t.id,
-        "ticket_no": t.ticket_no,
-        "content": t.content,
-        "category": t.category,
-        "status": t.status
-    } for t in recent_tickets]
+    vector = vector_index.get(ticket_id)
+    if vector is None:
+        vector = embed(ticket.content)
+    hits = vector_index.search(
+        vector, k=limit, exclude_id=ticket_id, min_score=settings.SIMILARITY_MIN_SCORE
+    )
     
-    # 调用AI查找相似工单
-    similar = await qianfan_service.find_similar_tickets(ticket.content, tickets_data)
+    tickets = {
+        t.id: t for t in await db.execute(select(
+            Ticket.id, Ticket.ticket_no, Ticket.content, Ticket.category, Ticket.status
+        ).where(Ticket.id.in_([hit_id for hit_id, _ in hits])))
+    }
+    
+    similar = []
+    for hit_id, score in hits:
+        t = tickets.get(hit_id)
+        if t is None:
+            continue
+        similar.append({
+            "ticket": {
+                "id": t.id,
+                "ticket_no": t.ticket_no,
+                "content": t.content,
+                "category": t.category,
+                "status": t.status
+            },
+            "similarity": round(score, 2)
+        })
     
     return {
         "ticket_id": ticket_id,
         "similar_tickets": similar
     }
-
@@ -1,13 +1,16 @@
 """
 用户管理API
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.models.user import User, Comment, Rating, Notification
+from app.services.notification_broker import notification_dict, stream_notifications
 
 router = APIRouter()
 
@@ -21,16 +24,20 @@ class CommentCreate(BaseModel):
     ticket_id: int
     content: str
 
+class NotificationsRead(BaseModel):
+    user_id: int
+    ids: Optional[List[int]] = None  # 为空时标记该用户全部未读通知
+
 class RatingCreate(BaseModel):
     ticket_id: int
     score: int  # 1-5
     feedback: str = None
 
 @router.post("/register")
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """用户注册（简化版，无密码）"""
     # 检查用户名是否存在
-    existing = db.query(User).filter(User.username == user.username).first()
+    existing = await db.scalar(select(User).where(User.username == user.username).limit(1))
     if existing:
         raise HTTPException(status_code=400, detail="用户名已存在")
     
@@ -43,15 +50,15 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         role="citizen"
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return {"id": db_user.id, "username": db_user.username, "message": "注册成功"}
 
 @router.get("/profile/{user_id}")
-async def get_user_profile(user_id: int, db: Session = Depends(get_db)):
+async def get_user_profile(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """获取用户信息"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
     
@@ -65,7 +72,7 @@ async def get_user_profile(user_id: int, db: Session = Depends(get_db)):
     }
 
 @router.post("/comments")
-async def create_comment(comment: CommentCreate, db: Session = Depends(get_db)):
+async def create_comment(comment: CommentCreate, db: AsyncSession = Depends(get_async_db)):
     """添加评论"""
     db_comment = Comment(
         ticket_id=comment.ticket_id,
@@ -73,15 +80,15 @@ async def create_comment(comment: CommentCreate, db: Session = Depends(get_db)):
         content=comment.content
     )
     db.add(db_comment)
-    db.commit()
-    db.refresh(db_comment)
+    await db.commit()
+    await db.refresh(db_comment)
     
     return {"id": db_comment.id, "message": "评论成功"}
 
 @router.get("/comments/{ticket_id}")
-async def get_comments(ticket_id: int, db: Session = Depends(get_db)):
+async def get_comments(ticket_id: int, db: AsyncSession = Depends(get_async_db)):
     """获取工单评论"""
-    comments = db.query(Comment).filter(Comment.ticket_id == ticket_id).all()
+    comments = await db.scalars(select(Comment).where(Comment.ticket_id == ticket_id))
     return [{
         "id": c.id,
         "content": c.content,
@@ -89,10 +96,10 @@ async def get_comments(ticket_id: int, db: Session = Depends(get_db)):
     } for c in comments]
 
 @router.post("/ratings")
-async def create_rating(rating: RatingCreate, db: Session = Depends(get_db)):
+async def create_rating(rating: RatingCreate, db: AsyncSession = Depends(get_async_db)):
     """提交满意度评价"""
     # 检查是否已评价
-    existing = db.query(Rating).filter(Rating.ticket_id == rating.ticket_id).first()
+    existing = await db.scalar(select(Rating).where(Rating.ticket_id == rating.ticket_id).limit(1))
     if existing:
         raise HTTPException(status_code=400, detail="该工单已评价")
     
@@ -102,15 +109,15 @@ async def create_rating(rating: RatingCreate, db: Session = Depends(get_db)):
         feedback=rating.feedback
     )
     db.add(db_rating)
-    db.commit()
-    db.refresh(db_rating)
+    await db.commit()
+    await db.refresh(db_rating)
     
     return {"id": db_rating.id, "message": "评价成功"}
 
 @router.get("/ratings/{ticket_id}")
-async def get_rating(ticket_id: int, db: Session = Depends(get_db)):
+async def get_rating(ticket_id: int, db: AsyncSession = Depends(get_async_db)):
     """获取工单评价"""
-    rating = db.query(Rating).filter(Rating.ticket_id == ticket_id).first()
+    rating = await db.scalar(select(Rating).where(Rating.ticket_id == ticket_id).limit(1))
     if not rating:
         return None
     
@@ -121,30 +128,63 @@ async def get_rating(ticket_id: int, db: Session = Depends(get_db)):
     }
 
 @router.get("/notifications/{user_id}")
-async def get_notifications(user_id: int, db: Session = Depends(get_db)):
+async def get_notifications(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """获取用户通知"""
-    notifications = db.query(Notification).filter(
+    # 按 id 倒序即创建时间倒序，可直接按用户索引顺序读取
+    notifications = await db.scalars(select(Notification).where(
         Notification.user_id == user_id
-    ).order_by(Notification.created_at.desc()).limit(20).all()
+    ).order_by(Notification.id.desc()).limit(20))
     
-    return [{
-        "id": n.id,
-        "title": n.title,
-        "content": n.content,
-        "ticket_id": n.ticket_id,
-        "is_read": n.is_read,
-        "created_at": n.created_at.isoformat() if n.created_at else None
-    } for n in notifications]
+    return [notification_dict(n) for n in notifications]
+
+@router.get("/notifications/{user_id}/unread-count")
+async def get_unread_count(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    """获取用户未读通知数（只读 (user_id, is_read, id) 索引）"""
+    count = await db.scalar(select(func.count()).select_from(Notification).where(
+        Notification.user_id == user_id,
+        Notification.is_read == 0
+    ))
+    return {"user_id": user_id, "unread": count}
+
+@router.get("/notifications/{user_id}/stream")
+async def stream_user_notifications(
+    user_id: int,
+    last_event_id: int = None,
+    last_event_id_header: int = Header(None, alias="Last-Event-ID")
+):
+    """
+    订阅用户通知（Server-Sent Events）
+    
+    新通知提交后立即推送，事件ID为通知ID。断线重连时浏览器自动带上 Last-Event-ID 请求头，
+    服务端补发其后的通知；首次连接也可通过 last_event_id 参数指定（通常为列表中最新通知的ID）
+    """
+    after = last_event_id_header if last_event_id_header is not None else last_event_id
+    return StreamingResponse(
+        stream_notifications(user_id, after),
+        media_type="text/event-stream",
+        # 禁止代理缓冲，保证通知立即送达
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.put("/notifications/{notification_id}/read")
-async def mark_notification_read(notification_id: int, db: Session = Depends(get_db)):
+async def mark_notification_read(notification_id: int, db: AsyncSession = Depends(get_async_db)):
     """标记通知为已读"""
-    notification = db.query(Notification).filter(Notification.id == notification_id).first()
+    notification = await db.get(Notification, notification_id)
     if not notification:
         raise HTTPException(status_code=404, detail="通知不存在")
     
     notification.is_read = 1
-    db.commit()
+    await db.commit()
     
     return {"message": "已标记为已读"}
 
+@router.put("/notifications/read")
+async def mark_notifications_read(request: NotificationsRead, db: AsyncSession = Depends(get_async_db)):
+    """批量标记通知为已读，一条UPDATE完成"""
+    conditions = [Notification.user_id == request.user_id, Notification.is_read == 0]
+    if request.ids is not None:
+        conditions.append(Notification.id.in_(request.ids))
+    result = await db.execute(update(Notification).where(*conditions).values(is_read=1))
+    await db.commit()
+    
+    return {"message": "已标记为已读", "updated": result.rowcount}
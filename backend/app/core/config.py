@@ -10,13 +10,107 @@ class Settings(BaseSettings):
     # 百度千帆配置
     QIANFAN_AK: str = ""
     QIANFAN_SK: str = ""
+    QIANFAN_MAX_WORKERS: int = 8  # 千帆同步调用线程池大小
+    QIANFAN_COMBINED_ANALYSIS: bool = False  # 创建工单时用一次调用完成分析、关键词和解决方案
+    
+    # 千帆响应缓存配置
+    QIANFAN_CACHE_ENABLED: bool = True
+    QIANFAN_CACHE_BACKEND: str = "memory"  # memory: 仅进程内LRU; redis: 内存+REDIS_URL二级缓存
+    QIANFAN_CACHE_MAX_ENTRIES: int = 2048
+    QIANFAN_CACHE_TTL: int = 86400  # 秒
+
+    # 千帆调用保护配置
+    QIANFAN_GUARD_ENABLED: bool = True
+    QIANFAN_MAX_IN_FLIGHT: int = 8  # 同时进行中的模型调用上限（含调用方已超时放弃、线程仍在等待的调用）
+    QIANFAN_QUEUE_TIMEOUT_SECONDS: float = 2.0  # 等待调用名额的最长时间，超时直接使用本地降级结果
+    QIANFAN_MIN_TIMEOUT_SECONDS: float = 5.0  # 自适应调用时限的下限
+    QIANFAN_MAX_TIMEOUT_SECONDS: float = 30.0  # 自适应调用时限的上限（成功调用不足10次时使用）
+    QIANFAN_TIMEOUT_MULTIPLIER: float = 3.0  # 调用时限为最近成功调用P95耗时的倍数
+    QIANFAN_BREAKER_WINDOW: int = 20  # 熔断器统计的最近调用次数
+    QIANFAN_BREAKER_MIN_CALLS: int = 10  # 统计窗口内调用数达到该值才判断是否熔断
+    QIANFAN_BREAKER_ERROR_RATE: float = 0.5  # 失败（含超时）比例达到该值时熔断
+    QIANFAN_BREAKER_OPEN_SECONDS: float = 30.0  # 熔断持续时间，之后放行一次探测调用
+
+    # 本地分类器配置
+    LOCAL_CLASSIFIER_PATH: str = "./ticket_classifier.npz"  # 模型文件，不存在时所有工单都交给千帆分析
+    LOCAL_CLASSIFIER_MIN_CONFIDENCE: float = 0.9  # 分类、部门、优先级的预测概率都达到该值才不调用千帆
+    LOCAL_CLASSIFIER_DIM: int = 32768  # 训练时的特征哈希维度
     
     # 数据库配置
     DATABASE_URL: str = "sqlite:///./govhotline.db"
+    ASYNC_DATABASE_URL: Optional[str] = None  # API路由使用的异步连接，为空时由DATABASE_URL换成异步驱动
+    READ_DATABASE_URL: Optional[str] = None  # 数据分析接口的只读连接（如只读副本），为空时使用主库
+    
+    # 数据库连接池配置（SQLite内存库不适用）
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # 等待空闲连接的秒数
+    DB_POOL_RECYCLE: int = 1800  # 连接最长使用秒数，-1为不回收
+    DB_POOL_PRE_PING: bool = True  # 取出连接前检测是否可用（SQLite不适用）
+    
+    # SQLite调优配置
+    SQLITE_JOURNAL_MODE: str = "WAL"  # 为空时保持数据库原有模式；网络文件系统上不要使用WAL
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # WAL模式下NORMAL可保证一致性，断电时可能丢失最近的事务
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 268435456  # 内存映射读取的字节数，0为关闭
+    SQLITE_CACHE_SIZE_KB: int = 65536  # 每个连接的页缓存
     
     # Redis配置
     REDIS_URL: str = "redis://localhost:6379/0"
     
+    # 工单AI补全配置
+    ENRICHMENT_MODE: str = "sync"  # sync: 创建时同步分析; async: 先入库，后台协程池补全
+    ENRICHMENT_WORKERS: int = 4
+    ENRICHMENT_MAX_BACKLOG: int = 1000  # 待补全积压上限，超过后拒绝受理新工单
+    ENRICHMENT_MAX_RETRIES: int = 3
+    ENRICHMENT_RETRY_DELAY: int = 10  # 首次重试延迟（秒），之后指数退避
+    ENRICHMENT_POLL_INTERVAL: float = 2.0  # 空闲时轮询数据库的间隔（秒）
+    
+    # 批量导入配置
+    IMPORT_CHUNK_SIZE: int = 200  # 每个事务插入的工单数
+    IMPORT_BATCH_SIZE: int = 10  # 每次千帆请求分析的工单数
+    IMPORT_MAX_CONCURRENCY: int = 4  # 同时进行的千帆批量请求数
+    
+    # 相似工单检索配置
+    SIMILARITY_DIM: int = 1024  # 文本向量维度（内存索引每条工单占 4×维度 字节；修改后启动时自动重算向量）
+    SIMILARITY_MIN_SCORE: float = 0.3  # 相似度下限
+    
+    # 受理去重配置
+    DEDUP_ENABLED: bool = True
+    DEDUP_MAX_DISTANCE: int = 7  # SimHash汉明距离上限（64位；指纹分段索引保证不超过7时不漏检，话题相近的不同诉求距离可低至11）
+    DEDUP_WINDOW_HOURS: int = 24  # 只与该时间窗口内的事件工单比较
+    
+    # 统计缓存配置
+    STATISTICS_CACHE_TTL: int = 5  # 统计结果缓存时间（秒），工单写入后立即失效
+    
+    # 数据导出配置
+    EXPORT_CHUNK_SIZE: int = 1000  # 流式导出每次从数据库读取并写出的行数
+    
+    # 异常预警配置
+    ALERT_BUCKET_MINUTES: int = 10  # 计数分桶时长（分钟）
+    ALERT_WINDOW_BUCKETS: int = 6  # 检测窗口包含的桶数（默认最近1小时）
+    ALERT_HISTORY_DAYS: int = 28  # 保留的历史计数天数，用于计算基线
+    ALERT_EWMA_ALPHA: float = 0.1  # 基线指数加权平滑系数，越大越偏重近期
+    ALERT_SEASON_WEEKS: int = 4  # 同比基线参考的周数（前几周同一星期同一时段）
+    ALERT_Z_THRESHOLD: float = 3.0  # 偏离基线的标准差倍数达到该值时预警
+    ALERT_MIN_COUNT: int = 5  # 检测窗口内工单数低于该值时不预警
+    
+    # 通知推送配置
+    NOTIFICATION_HEARTBEAT_SECONDS: int = 15  # SSE连接空闲时发送心跳的间隔，防止代理断开空闲连接
+    NOTIFICATION_QUEUE_SIZE: int = 100  # 每个连接待发送通知的上限，超出时断开该连接，客户端重连后补发
+    NOTIFICATION_RETRY_MS: int = 3000  # 客户端断线后的重连等待时间
+    NOTIFICATION_FLUSH_INTERVAL_MS: int = 200  # 生成的通知缓冲后批量写入的间隔
+    NOTIFICATION_FLUSH_SIZE: int = 500  # 缓冲达到该条数时立即写入
+    
+    # 大屏推送配置
+    DASHBOARD_PUSH_INTERVAL_SECONDS: float = 2  # 检查数据变化并推送的间隔
+    DASHBOARD_REFRESH_SECONDS: int = 60  # 数据无变化时也重新计算的间隔（统计时间窗口随时间滑动）
+    
+    # HTTP压缩与条件请求配置
+    GZIP_MINIMUM_SIZE: int = 1024  # 响应体达到该字节数才压缩
+    GZIP_COMPRESS_LEVEL: int = 6  # gzip压缩级别（1-9），级别越高CPU开销越大，JSON在6之后收益很小
+    ETAG_TIME_BUCKET_SECONDS: int = 60  # 数据无变化时ETag也每隔该秒数变化一次（统计窗口和预警随时间滑动）
+    
     # 应用配置
     APP_HOST: str = "0.0.0.0"
     APP_PORT: int = 8000
@@ -0,0 +1,164 @@
+"""
+HTTP中间件
+
+- ConditionalGetMiddleware: 只读接口（工单、数据分析）的响应带弱 ETag，由数据库中持久化的
+  工单数据版本号（见 app.services.ticket_events）和时间段组成。客户端带 If-None-Match 再次请求时，
+  版本号未变则直接返回 304，只按主键读取一次版本号，不进入接口、不重新序列化。
+  版本号与工单写入在同一事务中递增（包括批量更新），多个 worker 和独立运行的导入进程的写入同样可见。
+  统计时间窗口和预警随时间滑动，ETag 中的时间段每 ETAG_TIME_BUCKET_SECONDS 变化一次。
+- CompressionMiddleware: 超过 GZIP_MINIMUM_SIZE 字节的响应按 gzip 压缩。流式响应（导出、
+  导入进度）每块压缩后立即发送；SSE推送（text/event-stream）不压缩，避免消息被缓冲。
+"""
+import gzip
+import io
+import time
+from typing import Awaitable, Callable, Iterable, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.ticket_events import persisted_version
+
+class ConditionalGetMiddleware:
+    """按数据版本号生成 ETag，未变化时返回 304"""
+
+    def __init__(self, app: ASGIApp, prefixes: Iterable[str], exclude: Iterable[str] = (),
+                 exclude_suffixes: Iterable[str] = (), time_bucket: int = 60, version: Callable[[], Awaitable[int]] = persisted_version):
+        self.app = app
+        self.prefixes = tuple(prefixes)
+        self.exclude = frozenset(exclude)
+        self.exclude_suffixes = tuple(exclude_suffixes)
+        self.time_bucket = time_bucket
+        self.version = version
+        self.not_modified = 0
+
+    async def current_etag(self) -> str:
+        # 先于接口读取版本号，计算期间有新的写入时下次请求会重新计算
+        return f'W/"{await self.version():x}-{int(time.time() // self.time_bucket)}"'
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get("path", "")
+        if (scope["type"] != "http" or scope["method"] not in ("GET", "HEAD")
+                or not path.startswith(self.prefixes) or path in self.exclude
+                or (self.exclude_suffixes and path.endswith(self.exclude_suffixes))):
+            await self.app(scope, receive, send)
+            return
+
+        etag = await self.current_etag()
+        if _etag_matches(Headers(scope=scope).get("if-none-match"), etag):
+            self.not_modified += 1
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(b"etag", etag.encode("latin-1")), (b"cache-control", b"no-cache")],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_etag(message: Message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = MutableHeaders(scope=message)
+                if "etag" not in headers and not headers.get("content-type", "").startswith("text/event-stream"):
+                    headers["ETag"] = etag
+                    # 浏览器每次都带 If-None-Match 重新验证，而不是按启发式规则直接使用本地缓存
+                    headers["Cache-Control"] = "no-cache"
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 按弱比较匹配"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+class CompressionMiddleware:
+    """gzip 压缩响应，跳过小响应和SSE"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, compresslevel: int = 6,
+                 exclude_media_types: Tuple[str, ...] = ("text/event-stream",)):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.exclude_media_types = exclude_media_types
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("accept-encoding", ""):
+            await _GZipResponder(self, send).run(scope, receive)
+            return
+        await self.app(scope, receive, send)
+
+class _GZipResponder:
+    """单个响应的压缩状态"""
+
+    def __init__(self, middleware: CompressionMiddleware, send: Send):
+        self.middleware = middleware
+        self.send = send
+        self.start_message: Message = None
+        self.passthrough = False
+        self.buffer = io.BytesIO()
+        self.gzip_file = None
+
+    async def run(self, scope: Scope, receive: Receive):
+        await self.middleware.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message):
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                "content-encoding" in headers
+                or headers.get("content-type", "").startswith(self.middleware.exclude_media_types)
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                # 等第一块响应体确定是否压缩后再发送响应头
+                self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start_message is not None:
+            start_message, self.start_message = self.start_message, None
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self.send(start_message)
+                await self.send(message)
+                return
+            headers = MutableHeaders(scope=start_message)
+            headers["Content-Encoding"] = "gzip"
+            headers.add_vary_header("Accept-Encoding")
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            self.gzip_file = gzip.GzipFile(mode="wb", fileobj=self.buffer, compresslevel=self.middleware.compresslevel)
+            body = self._compress(body, more_body)
+            if not more_body:
+                headers["Content-Length"] = str(len(body))
+            await self.send(start_message)
+        else:
+            body = self._compress(body, more_body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    def _compress(self, body: bytes, more_body: bool) -> bytes:
+        self.gzip_file.write(body)
+        if more_body:
+            # 流式响应每块都刷出，客户端无需等待压缩缓冲区写满
+            self.gzip_file.flush()
+        else:
+            self.gzip_file.close()
+        data = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
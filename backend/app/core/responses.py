@@ -0,0 +1,44 @@
+"""
+JSON序列化
+
+应用默认响应类（main.py 中的 default_response_class）使用 orjson 序列化，比标准库 json 快数倍，
+原生支持 datetime、date、UUID、numpy 数组和非字符串键；未安装 orjson 时退回标准库。
+已按响应结构组织好的数据（工单列表投影、大屏快照）直接构造 FastJSONResponse 返回，
+跳过 FastAPI 对返回值的校验和逐层转换。SSE推送和数据导出也使用同一序列化函数。
+"""
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    print("未安装orjson，JSON响应使用标准库序列化")
+
+def _default(value: Any) -> Any:
+    """orjson 不支持的类型: Pydantic 模型转为字典，其余（如 Decimal、set）交给 jsonable_encoder"""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    return jsonable_encoder(value)
+
+def dumps(content: Any) -> bytes:
+    """序列化为UTF-8编码的JSON"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+def dumps_text(content: Any) -> str:
+    """序列化为JSON字符串（SSE消息、JSON Lines）"""
+    return dumps(content).decode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """使用 orjson 序列化的JSON响应"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
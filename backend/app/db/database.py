@@ -1,21 +1,111 @@
 """
 数据库配置
 """
-from sqlalchemy import create_engine
+from typing import Any, Dict, List
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.core.config import settings
 
+# 各数据库对应的异步驱动
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "mysql": "aiomysql",
+    "postgresql": "asyncpg",
+}
+
+def async_database_url(url: str) -> str:
+    """把同步数据库URL换成对应的异步驱动，已是异步驱动时原样返回"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"不支持异步访问的数据库: {backend}")
+    if parsed.get_driver_name() in ASYNC_DRIVERS.values():
+        return url
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+def _engine_options(url: str, is_async: bool = False) -> Dict[str, Any]:
+    """引擎参数：连接池取自配置，SQLite内存库保留默认连接池"""
+    parsed = make_url(url)
+    options = {"echo": settings.DEBUG}
+    if parsed.get_backend_name() == "sqlite":
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}
+        if parsed.database in (None, "", ":memory:"):
+            return options
+        # aiosqlite 默认每次新建连接，复用连接才能保留页缓存和内存映射
+        options["poolclass"] = AsyncAdaptedQueuePool if is_async else QueuePool
+    else:
+        options["pool_pre_ping"] = settings.DB_POOL_PRE_PING
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE
+    )
+    return options
+
+def _sqlite_pragmas(read_only: bool = False) -> List[str]:
+    pragmas = [
+        f"PRAGMA busy_timeout = {settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE}",
+        # 负数表示以KiB为单位
+        f"PRAGMA cache_size = -{settings.SQLITE_CACHE_SIZE_KB}",
+    ]
+    if settings.SQLITE_JOURNAL_MODE:
+        pragmas.insert(0, f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}")
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+    return pragmas
+
+def configure_sqlite(engine: Engine, read_only: bool = False):
+    """
+    SQLite 每个新连接执行 PRAGMA
+    
+    WAL 模式下读不阻塞写、写不阻塞读，创建工单提交时统计查询不再等待；
+    read_only 的连接拒绝任何写入
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = _sqlite_pragmas(read_only)
+    
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
 # 创建数据库引擎
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
-    echo=settings.DEBUG
-)
+engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL))
+configure_sqlite(engine)
 
 # 创建会话
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步引擎和会话，供API路由使用，数据库IO不阻塞事件循环；
+# 后台线程（AI补全、批量导入、索引重建等）仍使用同步会话。
+# 进程退出前需 dispose（应用关闭时执行），连接池中的 aiosqlite 连接线程会阻止进程退出
+_async_url = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(_async_url, **_engine_options(_async_url, is_async=True))
+configure_sqlite(async_engine.sync_engine)
+
+# 提交后不过期对象，返回响应时读取属性不会触发隐式IO
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# 只读引擎和会话，供数据分析接口使用，使用独立的连接池，大屏统计查询不占用工单受理的连接；
+# READ_DATABASE_URL 可指向只读副本，为空时连接主库（SQLite下连接设为 query_only）
+_read_url = async_database_url(settings.READ_DATABASE_URL) if settings.READ_DATABASE_URL else _async_url
+async_read_engine = create_async_engine(_read_url, **_engine_options(_read_url, is_async=True))
+configure_sqlite(async_read_engine.sync_engine, read_only=True)
+
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
 # 创建基类
 Base = declarative_base()
 
@@ -28,3 +118,12 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """获取异步数据库会话"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    """获取只读异步数据库会话"""
+    async with AsyncReadSessionLocal() as db:
+        yield db
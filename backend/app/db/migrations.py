@@ -0,0 +1,72 @@
+"""
+数据库结构升级
+
+Base.metadata.create_all 只会创建不存在的表，不会修改已有的表。启动时调用 upgrade:
+- 创建缺失的表
+- 为已有的表补充模型中新增的列（ALTER TABLE ADD COLUMN，均为可空列）
+- 创建模型中声明但库中缺失的索引
+
+只做增量变更，不删除或修改已有的列和索引。
+
+手动执行（在backend目录下）:
+    python -m app.db.migrations
+"""
+from typing import List
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+
+from app.db.database import Base
+
+def _add_column_sql(engine: Engine, table, column) -> str:
+    preparer = engine.dialect.identifier_preparer
+    column_type = column.type.compile(dialect=engine.dialect)
+    sql = f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {column_type}"
+    if column.server_default is not None and isinstance(column.server_default.arg, str):
+        sql += f" DEFAULT '{column.server_default.arg}'"
+    return sql
+
+def upgrade(engine: Engine) -> List[str]:
+    """
+    把数据库结构升级到与模型一致
+    
+    Returns:
+        执行的变更说明列表
+    """
+    import app.models.ticket  # noqa: F401  确保模型已注册
+    import app.models.user  # noqa: F401
+    
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    applied = []
+    
+    Base.metadata.create_all(bind=engine)
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            applied.append(f"创建表 {table.name}")
+            continue
+        
+        existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+        with engine.begin() as conn:
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                conn.exec_driver_sql(_add_column_sql(engine, table, column))
+                applied.append(f"新增列 {table.name}.{column.name}")
+        
+        existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            index.create(bind=engine)
+            applied.append(f"创建索引 {index.name}")
+    
+    return applied
+
+if __name__ == "__main__":
+    from app.db.database import engine
+    
+    changes = upgrade(engine)
+    for change in changes:
+        print(change)
+    print(f"数据库结构已是最新，本次执行 {len(changes)} 项变更")
@@ -1,7 +1,9 @@
 """
 工单数据模型
 """
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, JSON
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, Text, Float, Date, DateTime, JSON, LargeBinary, Index, UniqueConstraint
+)
 from sqlalchemy.sql import func
 from app.db.database import Base
 
@@ -22,17 +24,92 @@ class Ticket(Base):
     location_district = Column(String(50), comment="区域")
     location_street = Column(String(100), comment="街道")
     location_detail = Column(Text, comment="详细位置")
+    location_reported = Column(Text, comment="市民提交的位置（不随AI分析结果变化，用于受理去重）")
     status = Column(String(20), default="pending", comment="状态: pending/processing/resolved/closed")
     keywords = Column(Text, comment="关键词（逗号分隔）")
     solution_suggestion = Column(Text, comment="AI建议的解决方案")
     response_time = Column(Integer, comment="响应时间（秒）")
     ai_analysis = Column(JSON, comment="AI分析完整结果")
+    enrichment_status = Column(String(20), default="done", index=True, comment="AI补全状态: queued/processing/done/failed")
+    enrichment_attempts = Column(Integer, default=0, comment="AI补全尝试次数")
+    enrichment_error = Column(Text, comment="AI补全最近一次错误")
+    enrichment_next_at = Column(DateTime, comment="下次重试时间")
+    parent_id = Column(Integer, comment="所属事件的父工单ID（重复工单）")
+    simhash = Column(BigInteger, comment="内容SimHash指纹")
+    # SimHash按8位分为8段，受理去重先按段精确匹配缩小候选范围
+    simhash_band0 = Column(Integer, comment="SimHash第0段（0-7位）")
+    simhash_band1 = Column(Integer, comment="SimHash第1段（8-15位）")
+    simhash_band2 = Column(Integer, comment="SimHash第2段（16-23位）")
+    simhash_band3 = Column(Integer, comment="SimHash第3段（24-31位）")
+    simhash_band4 = Column(Integer, comment="SimHash第4段（32-39位）")
+    simhash_band5 = Column(Integer, comment="SimHash第5段（40-47位）")
+    simhash_band6 = Column(Integer, comment="SimHash第6段（48-55位）")
+    simhash_band7 = Column(Integer, comment="SimHash第7段（56-63位）")
     created_at = Column(DateTime, server_default=func.now(), comment="创建时间")
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), comment="更新时间")
     
+    __table_args__ = (
+        # 列表按 (created_at, id) 倒序的游标分页；统计接口按 created_at 时间窗口过滤
+        Index("ix_tickets_created_at_id", "created_at", "id"),
+        Index("ix_tickets_user_created_at_id", "user_id", "created_at", "id"),
+        # 列表/搜索按状态、类别筛选后按时间倒序
+        Index("ix_tickets_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_tickets_category_created_at_id", "category", "created_at", "id"),
+        # 重复工单聚类、删除父工单时按 parent_id 查找子工单
+        Index("ix_tickets_parent_created_at", "parent_id", "created_at"),
+        # 受理去重按任一段相同查找候选
+        *(Index(f"ix_tickets_simhash_band{i}_created_at", f"simhash_band{i}", "created_at") for i in range(8)),
+    )
+    
     def __repr__(self):
         return f"<Ticket {self.ticket_no}: {self.category}>"
 
+class TicketVector(Base):
+    """工单文本向量表"""
+    __tablename__ = "ticket_vectors"
+    
+    ticket_id = Column(Integer, primary_key=True, comment="工单ID")
+    vector = Column(LargeBinary, comment="字符n-gram哈希向量（float16）")
+    dim = Column(Integer, comment="向量维度（与 SIMILARITY_DIM 不一致时重新计算）")
+    
+    def __repr__(self):
+        return f"<TicketVector {self.ticket_id}>"
+
+class TicketRollup(Base):
+    """工单日汇总表（按 日期×类别×区域×部门×状态×情绪×优先级 预聚合），空维度以空字符串存储"""
+    __tablename__ = "ticket_rollups"
+    __table_args__ = (
+        UniqueConstraint("day", "category", "district", "department", "status", "sentiment", "priority",
+                         name="uq_ticket_rollups_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False, index=True, comment="日期")
+    category = Column(String(50), nullable=False, default="", comment="分类")
+    district = Column(String(50), nullable=False, default="", comment="区域")
+    department = Column(String(50), nullable=False, default="", comment="负责部门")
+    status = Column(String(20), nullable=False, default="", comment="状态")
+    sentiment = Column(String(20), nullable=False, default="", comment="情绪")
+    priority = Column(String(20), nullable=False, default="", comment="优先级")
+    ticket_count = Column(Integer, nullable=False, default=0, comment="工单数")
+    response_time_sum = Column(BigInteger, nullable=False, default=0, comment="响应时间合计（不含0）")
+    response_time_count = Column(Integer, nullable=False, default=0, comment="有响应时间的工单数")
+    sentiment_score_sum = Column(Float, nullable=False, default=0, comment="情绪分数合计（不含0）")
+    sentiment_score_count = Column(Integer, nullable=False, default=0, comment="有情绪分数的工单数")
+    
+    def __repr__(self):
+        return f"<TicketRollup {self.day} {self.category}: {self.ticket_count}>"
+
+class DataVersion(Base):
+    """数据版本号表：各进程在写入工单的同一事务中递增，条件请求据此判断数据是否变化"""
+    __tablename__ = "data_versions"
+    
+    name = Column(String(50), primary_key=True, comment="数据名称")
+    version = Column(BigInteger, nullable=False, comment="版本号")
+    
+    def __repr__(self):
+        return f"<DataVersion {self.name}: {self.version}>"
+
 class AnalyticsRecord(Base):
     """分析记录表"""
     __tablename__ = "analytics"
@@ -1,7 +1,7 @@
 """
 用户数据模型
 """
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index
 from sqlalchemy.sql import func
 from app.db.database import Base
 
@@ -60,6 +60,11 @@ class Notification(Base):
     is_read = Column(Integer, default=0, comment="是否已读: 0未读/1已读")
     created_at = Column(DateTime, server_default=func.now())
     
+    __table_args__ = (
+        # 未读数只读索引不回表；按用户列出最新通知、断线补发按 id 顺序读取
+        Index("ix_notifications_user_read_id", "user_id", "is_read", "id"),
+    )
+    
     def __repr__(self):
         return f"<Notification for user {self.user_id}>"
 
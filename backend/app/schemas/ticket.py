@@ -2,7 +2,7 @@
 工单数据模型
 """
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 class TicketCreate(BaseModel):
@@ -36,12 +36,45 @@ class TicketResponse(BaseModel):
     solution_suggestion: Optional[str]
     response_time: Optional[int]
     ai_analysis: Optional[Dict[str, Any]]
+    enrichment_status: Optional[str] = None
+    parent_id: Optional[int] = None
     created_at: datetime
     updated_at: datetime
 
     class Config:
         from_attributes = True
 
+class TicketSummary(BaseModel):
+    """工单列表项（列表接口默认字段，其余字段通过 fields 参数指定）"""
+    id: int
+    ticket_no: str
+    summary: Optional[str]
+    category: Optional[str]
+    status: str
+    priority: Optional[str]
+    created_at: datetime
+
+class TicketSearchResult(TicketSummary):
+    """工单搜索结果"""
+    score: Optional[float] = Field(None, description="相关度，越大越相关")
+    highlight: Optional[str] = Field(None, description="命中片段，命中词用<mark>标记")
+
+class TicketClusterResponse(BaseModel):
+    """重复工单聚类响应"""
+    parent: TicketResponse
+    duplicates: List[TicketResponse] = Field(default_factory=list, description="挂在父工单下的重复工单")
+    size: int = Field(..., description="事件工单总数（含父工单）")
+
+class EnrichmentStatusResponse(BaseModel):
+    """AI补全状态响应"""
+    ticket_id: int
+    ticket_no: str
+    status: str
+    enrichment_status: Optional[str]
+    attempts: int = 0
+    error: Optional[str] = None
+    ready: bool = Field(False, description="AI分析结果是否已可用")
+
 class StatisticsResponse(BaseModel):
     """统计数据响应"""
     total_tickets: int
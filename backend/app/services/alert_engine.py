@@ -0,0 +1,311 @@
+"""
+工单异常预警引擎
+
+按类别、区域维护时间分桶的工单计数（环形缓冲，默认10分钟一桶、保留28天），
+工单写入提交后增量更新计数，并立即对受影响的类别/区域做检测:
+- 观测值: 最近 ALERT_WINDOW_BUCKETS 个桶（默认1小时）的工单数
+- 基线: 历史上各个等长窗口工单数的EWMA均值和方差；有两周以上历史时，
+  再取前几周同一星期同一时段的均值，两者取较大者作为期望值（避免每周固定的高峰误报）
+- 观测值超出期望值 ALERT_Z_THRESHOLD 个标准差（按泊松分布下限取标准差，低计数时更稳健）
+  且不少于 ALERT_MIN_COUNT 件时预警
+
+检测只读取内存中的计数，复杂度与桶数成正比，与工单总量无关。首次使用时从数据库加载
+历史计数；计数只反映本进程提交的变更，多进程部署时其它进程的写入要等重新加载后才计入。
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.ticket import Ticket
+
+# 计数维度: 维度名 -> (工单字段, 预警类型, 数据字段名)
+DIMENSIONS = {
+    "category": ("category", "category_surge", "category"),
+    "district": ("location_district", "location_concentration", "location"),
+}
+
+AlertKey = Tuple[str, str]
+
+def _timestamp(value: Optional[datetime]) -> float:
+    """数据库中的创建时间为不带时区的UTC时间（CURRENT_TIMESTAMP），按UTC换算，不能按本地时区"""
+    if value is None:
+        return time.time()
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+class AlertEngine:
+    """按类别/区域分桶计数的滑动窗口异常检测"""
+
+    def __init__(self, bucket_minutes: int, window_buckets: int, history_days: int):
+        self.bucket_seconds = bucket_minutes * 60
+        self.window = window_buckets
+        self.week_buckets = 7 * 86400 // self.bucket_seconds
+        self.size = history_days * 86400 // self.bucket_seconds + window_buckets
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._counts: Dict[AlertKey, np.ndarray] = {}
+        self._head: Optional[int] = None
+        self._origin: Optional[int] = None
+        self._active: Dict[AlertKey, Dict[str, Any]] = {}
+        self._subscribers: List[Callable[[Dict[str, Any]], None]] = []
+        self._loaded = False
+        self._loading = False
+        self._loaded_max_id = 0
+        self._pending: List[Tuple[int, float, AlertKey, int]] = []
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]):
+        """订阅新触发的预警，回调在提交事务的线程中同步执行，应尽快返回"""
+        self._subscribers.append(callback)
+
+    def ensure_loaded(self):
+        """首次使用时从数据库加载历史窗口内的工单计数"""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            with self._lock:
+                self._loading = True
+            try:
+                since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(
+                    seconds=self.size * self.bucket_seconds
+                )
+                db = SessionLocal()
+                try:
+                    max_id, first_created = db.query(func.max(Ticket.id), func.min(Ticket.created_at)).one()
+                    rows = db.execute(
+                        select(Ticket.category, Ticket.location_district, Ticket.created_at)
+                        .where(Ticket.created_at >= since, Ticket.id <= (max_id or 0))
+                    ).yield_per(5000)
+                    with self._lock:
+                        self._advance(self._bucket(time.time()))
+                        if first_created is not None:
+                            self._origin = self._bucket(_timestamp(first_created))
+                        self._loaded_max_id = max_id or 0
+                    for category, district, created_at in rows:
+                        bucket = self._bucket(_timestamp(created_at))
+                        with self._lock:
+                            for key in _keys(category, district):
+                                self._add(key, bucket, 1)
+                finally:
+                    db.close()
+            finally:
+                with self._lock:
+                    self._loading = False
+                    self._loaded = True
+                    # 加载期间提交的新工单（加载只统计到当时的最大ID）
+                    pending = [change for change in self._pending if change[0] > self._loaded_max_id]
+                    self._pending.clear()
+                self.apply(pending)
+
+    def apply(self, changes: List[Tuple[int, float, AlertKey, int]]):
+        """
+        应用已提交的计数变更并检测受影响的类别/区域
+
+        Args:
+            changes: (工单ID, 创建时间戳, 维度键, 增量) 列表
+        """
+        fired = []
+        with self._lock:
+            if self._loading:
+                self._pending.extend(changes)
+                return
+            if not self._loaded or not changes:
+                return
+            now = time.time()
+            self._advance(self._bucket(now))
+            touched = set()
+            for _, created, key, delta in changes:
+                bucket = self._bucket(created)
+                if self._origin is None or bucket < self._origin:
+                    self._origin = bucket
+                self._add(key, bucket, delta)
+                touched.add(key)
+            for key in touched:
+                alert = self._evaluate(key, now)
+                if alert is None:
+                    self._active.pop(key, None)
+                elif key not in self._active:
+                    self._active[key] = alert
+                    fired.append(alert)
+                else:
+                    self._active[key] = alert
+        for alert in fired:
+            print(f"工单异常预警: {alert['title']}")
+            for callback in self._subscribers:
+                try:
+                    callback(alert)
+                except Exception as e:
+                    print(f"预警订阅处理失败: {e}")
+
+    def current_alerts(self) -> List[Dict[str, Any]]:
+        """检测全部类别/区域，返回当前的预警（按偏离程度从高到低）"""
+        with self._lock:
+            now = time.time()
+            self._advance(self._bucket(now))
+            alerts = {}
+            for key in self._counts:
+                alert = self._evaluate(key, now)
+                if alert is not None:
+                    alerts[key] = alert
+            self._active = alerts
+            return sorted(alerts.values(), key=lambda a: a["data"]["z_score"], reverse=True)
+
+    def _bucket(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds)
+
+    def _advance(self, bucket: int):
+        """时间前进到bucket，清空环形缓冲中被覆盖的旧桶"""
+        if self._head is None:
+            self._head = bucket
+            return
+        if bucket <= self._head:
+            return
+        steps = min(bucket - self._head, self.size)
+        slots = [(self._head + i) % self.size for i in range(1, steps + 1)]
+        for counts in self._counts.values():
+            counts[slots] = 0
+        self._head = bucket
+
+    def _add(self, key: AlertKey, bucket: int, delta: int):
+        # 晚于当前时间的记为当前桶，早于保留范围的丢弃
+        bucket = min(bucket, self._head)
+        if self._head - bucket >= self.size:
+            return
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = np.zeros(self.size, dtype=np.int32)
+        counts[bucket % self.size] += delta
+
+    def _series(self, key: AlertKey) -> np.ndarray:
+        """按时间顺序排列的计数，最后一个元素为当前桶；早于首个工单的桶不参与基线"""
+        counts = self._counts[key]
+        start = (self._head + 1) % self.size
+        series = np.concatenate((counts[start:], counts[:start]))
+        if self._origin is not None:
+            available = self._head - self._origin + 1
+            if available < self.size:
+                series = series[self.size - max(available, 0):]
+        return series
+
+    def _evaluate(self, key: AlertKey, now: float) -> Optional[Dict[str, Any]]:
+        series = self._series(key)
+        observed = int(series[-self.window:].sum())
+        if observed < settings.ALERT_MIN_COUNT:
+            return None
+
+        # 历史上等长窗口的工单数（从旧到新）
+        history = series[:-self.window]
+        blocks = len(history) // self.window
+        if blocks == 0:
+            return None
+        sums = history[len(history) - blocks * self.window:].reshape(blocks, self.window).sum(axis=1)
+        weights = (1 - settings.ALERT_EWMA_ALPHA) ** np.arange(blocks - 1, -1, -1)
+        mean = float(np.average(sums, weights=weights))
+        variance = float(np.average((sums - mean) ** 2, weights=weights))
+
+        # 前几周同一星期、同一时段
+        seasonal = []
+        for week in range(1, settings.ALERT_SEASON_WEEKS + 1):
+            end = len(series) - week * self.week_buckets
+            if end - self.window < 0:
+                break
+            seasonal.append(int(series[end - self.window:end].sum()))
+        expected = max(mean, float(np.mean(seasonal))) if len(seasonal) >= 2 else mean
+
+        sigma = max(variance, expected, 1.0) ** 0.5
+        z_score = (observed - expected) / sigma
+        if z_score < settings.ALERT_Z_THRESHOLD:
+            return None
+        return self._build_alert(key, observed, expected, z_score, now)
+
+    def _build_alert(self, key: AlertKey, observed: int, expected: float, z_score: float,
+                     now: float) -> Dict[str, Any]:
+        dimension, value = key
+        _, alert_type, data_field = DIMENSIONS[dimension]
+        minutes = self.window * self.bucket_seconds // 60
+        window_text = f"{minutes // 60}小时" if minutes % 60 == 0 else f"{minutes}分钟"
+        subject = f"{value}类工单" if dimension == "category" else f"{value}区域工单"
+        return {
+            "type": alert_type,
+            "level": "high" if z_score >= 2 * settings.ALERT_Z_THRESHOLD else "medium",
+            "title": f"{subject}激增",
+            "description": f"最近{window_text}{subject}{observed}件，常态约{expected:.1f}件，建议重点关注",
+            "data": {
+                data_field: value,
+                "count": observed,
+                "expected": round(expected, 1),
+                "z_score": round(z_score, 2),
+                "window_minutes": minutes,
+            },
+            "created_at": datetime.fromtimestamp(now),
+        }
+
+def _keys(category: Optional[str], district: Optional[str]) -> List[AlertKey]:
+    keys = []
+    if category:
+        keys.append(("category", category))
+    if district:
+        keys.append(("district", district))
+    return keys
+
+def _queue_change(session: Session, ticket_id: int, created_at: Optional[datetime],
+                  category: Optional[str], district: Optional[str], delta: int):
+    changes = session.info.setdefault("alert_changes", [])
+    for key in _keys(category, district):
+        changes.append((ticket_id, _timestamp(created_at), key, delta))
+
+def _stored_values(connection, ticket_id: int):
+    return connection.execute(
+        select(Ticket.category, Ticket.location_district, Ticket.created_at).where(Ticket.id == ticket_id)
+    ).first()
+
+@event.listens_for(Ticket, "after_insert")
+def _alert_inserted(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        _queue_change(session, target.id, target.__dict__.get("created_at"),
+                      target.category, target.location_district, 1)
+
+@event.listens_for(Ticket, "before_update")
+def _alert_updated(mapper, connection, target):
+    session = object_session(target)
+    state = inspect(target)
+    if session is None or not (state.attrs.category.history.has_changes()
+                               or state.attrs.location_district.history.has_changes()):
+        return
+    old = _stored_values(connection, target.id)
+    if old is None:
+        return
+    _queue_change(session, target.id, old.created_at, old.category, old.location_district, -1)
+    _queue_change(session, target.id, old.created_at, target.category, target.location_district, 1)
+
+@event.listens_for(Ticket, "before_delete")
+def _alert_deleted(mapper, connection, target):
+    session = object_session(target)
+    old = _stored_values(connection, target.id) if session is not None else None
+    if old is not None:
+        _queue_change(session, target.id, old.created_at, old.category, old.location_district, -1)
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session):
+    changes = session.info.pop("alert_changes", None)
+    if changes:
+        alert_engine.apply(changes)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop("alert_changes", None)
+
+# 创建全局实例
+alert_engine = AlertEngine(
+    settings.ALERT_BUCKET_MINUTES, settings.ALERT_WINDOW_BUCKETS, settings.ALERT_HISTORY_DAYS
+)
@@ -0,0 +1,119 @@
+"""
+千帆响应缓存
+
+以 规范化内容 + prompt模板 + 模型 + 采样参数 作为键缓存模型返回结果:
+- 一级缓存: 进程内LRU，带TTL
+- 二级缓存: 可选Redis（REDIS_URL），多进程/多实例共享，进程重启后仍然有效
+"""
+import hashlib
+import json
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+# 中文文本中的空白和句末标点不影响语义，规范化时去掉
+_TRAILING_PUNCT = re.compile(r"[\s。．.!！?？~～,，;；、]+$")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_content(content: str) -> str:
+    """规范化市民反馈内容，使近似重复的文本得到相同的缓存键"""
+    text = unicodedata.normalize("NFKC", content or "").strip().lower()
+    text = _WHITESPACE.sub("", text)
+    return _TRAILING_PUNCT.sub("", text)
+
+def make_cache_key(template: str, content: str, **params) -> str:
+    """生成缓存键"""
+    param_str = ",".join(f"{k}={params[k]}" for k in sorted(params))
+    raw = f"{template}|{param_str}|{normalize_content(content)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """内存LRU + 可选Redis的两级缓存"""
+
+    def __init__(self, max_entries: int, ttl: int, redis_url: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._redis = None
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.errors = 0
+
+        if redis_url:
+            try:
+                import redis.asyncio as aioredis
+                self._redis = aioredis.from_url(redis_url)
+            except ImportError:
+                print("未安装redis，千帆缓存仅使用内存")
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，未命中返回None"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        if self._redis is not None:
+            try:
+                raw = await self._redis.get(self._redis_key(key))
+                if raw:
+                    value = json.loads(raw)
+                    self._set_local(key, value)
+                    self.redis_hits += 1
+                    return value
+            except Exception as e:
+                self.errors += 1
+                print(f"读取Redis缓存失败: {e}")
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        """写入缓存"""
+        self._set_local(key, value)
+        if self._redis is not None:
+            try:
+                await self._redis.set(
+                    self._redis_key(key),
+                    json.dumps(value, ensure_ascii=False),
+                    ex=self.ttl
+                )
+            except Exception as e:
+                self.errors += 1
+                print(f"写入Redis缓存失败: {e}")
+
+    def clear(self):
+        """清空内存缓存（Redis中的条目依赖TTL过期）"""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计"""
+        total = self.hits + self.redis_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "backend": "memory+redis" if self._redis is not None else "memory",
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round((self.hits + self.redis_hits) / total, 4) if total else 0
+        }
+
+    def _set_local(self, key: str, value: Dict[str, Any]):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _redis_key(key: str) -> str:
+        return f"qianfan:resp:{key}"
@@ -0,0 +1,141 @@
+"""
+大屏数据推送
+
+同一统计时间范围（days）的所有大屏共用一个发布协程: 每 DASHBOARD_PUSH_INTERVAL_SECONDS 检查一次，
+工单数据版本变化（或距上次计算超过 DASHBOARD_REFRESH_SECONDS，时间窗口滑动）时重新计算一次
+组合快照，只把发生变化的部分（delta）推送给全部订阅的连接。N 个大屏只计算一次，消息只序列化一次。
+- 新连接先收到最新的完整快照（event: snapshot），之后只收到变化部分（event: delta）
+- 连接处理不过来（队列满）时断开，客户端重连后重新收到完整快照
+- 没有订阅者时停止该时间范围的发布协程
+"""
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+from app.core.config import settings
+from app.core.responses import dumps_text
+from app.services.ticket_events import data_version
+
+# 每个连接待发送消息的上限
+QUEUE_SIZE = 16
+# 没有数据变化时发送心跳的间隔（秒）
+HEARTBEAT_SECONDS = 15
+
+def _sse(kind: str, seq: int, data: Dict[str, Any]) -> str:
+    return f"id: {seq}\nevent: {kind}\ndata: {dumps_text(data)}\n\n"
+
+class _Channel:
+    """一个统计时间范围的订阅者和最新快照"""
+
+    def __init__(self):
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.snapshot: Dict[str, Any] = {}
+        self.snapshot_message: Optional[str] = None
+        self.seq = 0
+        self.data_version: Optional[int] = None
+        self.computed_at = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+class DashboardPublisher:
+    """按统计时间范围共享计算、增量推送的大屏发布器"""
+
+    def __init__(self, compute: Callable[[int], Awaitable[Dict[str, Any]]], interval: float, refresh: float):
+        self.compute = compute
+        self.interval = interval
+        self.refresh = refresh
+        self.computations = 0
+        self._channels: Dict[int, _Channel] = {}
+
+    def subscribe(self, days: int) -> asyncio.Queue:
+        """订阅某个时间范围，返回接收SSE消息的队列（收到 None 表示连接应断开）"""
+        channel = self._channels.get(days)
+        if channel is None:
+            channel = self._channels[days] = _Channel()
+            channel.task = asyncio.create_task(self._run(days, channel), name=f"dashboard-{days}")
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        if channel.snapshot_message is not None:
+            queue.put_nowait(channel.snapshot_message)
+        channel.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, days: int, queue: asyncio.Queue):
+        channel = self._channels.get(days)
+        if channel is None:
+            return
+        channel.subscribers.discard(queue)
+        if not channel.subscribers:
+            channel.task.cancel()
+            del self._channels[days]
+
+    def close(self):
+        """断开全部连接并停止发布协程（应用关闭时调用）"""
+        for days, channel in list(self._channels.items()):
+            for queue in list(channel.subscribers):
+                self._disconnect(days, queue)
+
+    def connection_count(self) -> int:
+        return sum(len(channel.subscribers) for channel in self._channels.values())
+
+    async def latest(self, days: int) -> Dict[str, Any]:
+        """最新快照；该时间范围有大屏在推送时直接返回，否则计算一次"""
+        channel = self._channels.get(days)
+        if channel is not None and channel.snapshot:
+            return channel.snapshot
+        self.computations += 1
+        return await self.compute(days)
+
+    async def stream(self, days: int) -> AsyncIterator[str]:
+        """大屏SSE流"""
+        queue = self.subscribe(days)
+        try:
+            yield f"retry: {settings.NOTIFICATION_RETRY_MS}\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if message is None:
+                    break
+                yield message
+        finally:
+            self.unsubscribe(days, queue)
+
+    async def _run(self, days: int, channel: _Channel):
+        while True:
+            version = data_version()
+            if version != channel.data_version or time.monotonic() - channel.computed_at >= self.refresh:
+                try:
+                    await self._publish(days, channel, version)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"大屏数据计算失败: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def _publish(self, days: int, channel: _Channel, version: int):
+        snapshot = await self.compute(days)
+        self.computations += 1
+        channel.data_version = version
+        channel.computed_at = time.monotonic()
+
+        changed = {key: value for key, value in snapshot.items() if channel.snapshot.get(key) != value}
+        first = not channel.snapshot
+        channel.snapshot = snapshot
+        if not changed:
+            return
+        channel.seq += 1
+        channel.snapshot_message = _sse("snapshot", channel.seq, snapshot)
+        message = channel.snapshot_message if first else _sse("delta", channel.seq, changed)
+        for queue in list(channel.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # 断开处理不过来的连接，重连后重新收到完整快照
+                self._disconnect(days, queue)
+
+    def _disconnect(self, days: int, queue: asyncio.Queue):
+        self.unsubscribe(days, queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
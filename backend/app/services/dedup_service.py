@@ -0,0 +1,210 @@
+"""
+工单受理去重服务
+
+突发事件（爆管、停电）期间会集中收到大量描述同一事件的工单。受理时先对内容计算
+64位 SimHash 指纹，在时间窗口内查找指纹汉明距离不超过 DEDUP_MAX_DISTANCE 的已有事件工单，
+并且双方市民提交的位置一致（任一方未提供位置时要求内容完全相同）:
+- 命中则把新工单挂到该"父工单"下（parent_id），直接复用父工单的AI分析结果，不再调用千帆
+- 未命中则作为新的事件工单正常分析
+
+指纹按8位分为8段分别存储并建索引。汉明距离不超过7的两个指纹至少有一段完全相同，
+因此先在SQL中按"任一段相同"取候选，再逐个计算距离，不必比较窗口内的全部工单。
+
+位置取 location_reported（受理/导入时市民提交的位置），而不是 location_detail:
+后者会被AI分析结果中的位置（降级时为"待确认"）覆盖。
+
+指纹和分段通过 ORM 写入事件在插入/更新工单时自动计算，历史工单由 backfill_bands 补齐。
+"""
+import hashlib
+import re
+import unicodedata
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import event, inspect, select, text, union
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.ticket import Ticket
+
+SIMHASH_BITS = 64
+BAND_BITS = 8
+BAND_COUNT = SIMHASH_BITS // BAND_BITS
+
+_NON_TEXT = re.compile(r"[^\w]+")
+
+# 从父工单复用的分析字段
+REUSED_FIELDS = ("summary", "category", "department", "priority", "sentiment",
+                 "sentiment_score", "keywords", "solution_suggestion")
+
+def _normalize(value: Optional[str]) -> str:
+    return _NON_TEXT.sub("", unicodedata.normalize("NFKC", value or "").lower())
+
+def simhash(text: Optional[str]) -> Optional[int]:
+    """
+    计算文本的64位SimHash指纹（字符二元组为特征，词频为权重）
+
+    Returns:
+        有符号64位整数（便于存入数据库BIGINT），文本为空时返回None
+    """
+    value = _normalize(text)
+    if not value:
+        return None
+    grams = Counter(value[i:i + 2] for i in range(len(value) - 1)) if len(value) > 1 else Counter([value])
+
+    weights = [0] * SIMHASH_BITS
+    for gram, count in grams.items():
+        h = int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += count if h >> bit & 1 else -count
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    if fingerprint >= 1 << (SIMHASH_BITS - 1):
+        fingerprint -= 1 << SIMHASH_BITS
+    return fingerprint
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个指纹的汉明距离"""
+    return bin((a ^ b) & ((1 << SIMHASH_BITS) - 1)).count("1")
+
+def simhash_bands(fingerprint: Optional[int]) -> List[Optional[int]]:
+    """指纹按8位分段，低位在前"""
+    if fingerprint is None:
+        return [None] * BAND_COUNT
+    mask = (1 << BAND_BITS) - 1
+    return [fingerprint >> (BAND_BITS * i) & mask for i in range(BAND_COUNT)]
+
+def _band_columns():
+    return [getattr(Ticket, f"simhash_band{i}") for i in range(BAND_COUNT)]
+
+def same_location(a: Optional[str], b: Optional[str]) -> bool:
+    """位置一致性判断：双方都提供位置时要求一方包含另一方，任一方未提供时视为不一致"""
+    a, b = _normalize(a), _normalize(b)
+    if not a or not b:
+        return False
+    return a in b or b in a
+
+def same_event(content: str, location: Optional[str], candidate_content: Optional[str],
+               candidate_location: Optional[str]) -> bool:
+    """指纹相近的两条工单是否描述同一事件：位置一致，或无位置可比时内容完全相同"""
+    if _normalize(location) and _normalize(candidate_location):
+        return same_location(location, candidate_location)
+    return _normalize(content) == _normalize(candidate_content)
+
+def find_duplicate_parent(db: Session, content: str, location: Optional[str] = None,
+                          now: Optional[datetime] = None) -> Optional[Ticket]:
+    """
+    在时间窗口内查找与新工单描述同一事件的父工单
+
+    候选由指纹分段索引取出，只与其中的事件工单（parent_id为空）比较，距离相同时取最早的工单
+
+    Args:
+        location: 新工单市民提交的位置，与候选工单的 location_reported 比较
+
+    Returns:
+        匹配的父工单，没有则返回None
+    """
+    fingerprint = simhash(content)
+    if fingerprint is None:
+        return None
+
+    since = (now or datetime.now()) - timedelta(hours=settings.DEDUP_WINDOW_HOURS)
+    # 每段单独查询再合并，保证各自使用（分段, 创建时间）索引；
+    # 是否为事件工单在取出后判断，避免按parent_id索引遍历全部事件工单
+    matched_ids = union(*(
+        select(Ticket.id).where(column == band, Ticket.created_at >= since)
+        for column, band in zip(_band_columns(), simhash_bands(fingerprint))
+    )).subquery()
+    candidates = db.query(
+        Ticket.id, Ticket.parent_id, Ticket.simhash, Ticket.content, Ticket.location_reported
+    ).filter(Ticket.id.in_(select(matched_ids.c.id))).all()
+
+    best_id, best_distance = None, None
+    for ticket_id, parent_id, candidate_hash, candidate_content, candidate_location in candidates:
+        if parent_id is not None:
+            continue
+        distance = hamming_distance(fingerprint, candidate_hash)
+        if distance > settings.DEDUP_MAX_DISTANCE:
+            continue
+        if not same_event(content, location, candidate_content, candidate_location):
+            continue
+        if best_distance is None or (distance, ticket_id) < (best_distance, best_id):
+            best_id, best_distance = ticket_id, distance
+
+    if best_id is None:
+        return None
+    return db.query(Ticket).filter(Ticket.id == best_id).first()
+
+def backfill_bands(engine: Engine) -> int:
+    """
+    为时间窗口内已有指纹、尚无分段的工单补齐指纹分段（升级前入库的工单）
+
+    Returns:
+        补齐的工单数
+    """
+    since = datetime.now() - timedelta(hours=settings.DEDUP_WINDOW_HOURS)
+    mask = (1 << BAND_BITS) - 1
+    assignments = ", ".join(
+        f"simhash_band{i} = (simhash >> {BAND_BITS * i}) & {mask}" for i in range(BAND_COUNT)
+    )
+    with engine.begin() as conn:
+        result = conn.execute(
+            text(f"UPDATE tickets SET {assignments} "
+                 "WHERE simhash IS NOT NULL AND simhash_band0 IS NULL AND created_at >= :since"),
+            {"since": since}
+        )
+    return result.rowcount
+
+def can_reuse_analysis(parent: Ticket) -> bool:
+    """父工单已完成补全且不是降级结果时才可复用"""
+    if parent.enrichment_status not in (None, "done"):
+        return False
+    return bool(parent.ai_analysis) and not parent.ai_analysis.get("is_fallback")
+
+def reuse_parent_analysis(parent: Ticket) -> Dict[str, Any]:
+    """把父工单的AI分析结果转换为子工单字段"""
+    fields = {field: getattr(parent, field) for field in REUSED_FIELDS}
+    fields["response_time"] = 0
+    fields["ai_analysis"] = dict(parent.ai_analysis or {}, duplicate_of=parent.id)
+    return fields
+
+def get_cluster(db: Session, ticket: Ticket) -> List[Ticket]:
+    """返回工单所在事件的全部工单，父工单在前，其余按创建时间排序"""
+    parent_id = ticket.parent_id or ticket.id
+    members = db.query(Ticket).filter(
+        (Ticket.id == parent_id) | (Ticket.parent_id == parent_id)
+    ).order_by(Ticket.created_at, Ticket.id).all()
+    return sorted(members, key=lambda t: t.id != parent_id)
+
+def promote_children(db: Session, ticket: Ticket):
+    """删除父工单前，把最早的子工单提升为新的父工单"""
+    if ticket.parent_id is not None:
+        return
+    children = db.query(Ticket).filter(
+        Ticket.parent_id == ticket.id
+    ).order_by(Ticket.created_at, Ticket.id).all()
+    if not children:
+        return
+    new_parent = children[0]
+    new_parent.parent_id = None
+    for child in children[1:]:
+        child.parent_id = new_parent.id
+
+def _set_fingerprint(target: Ticket):
+    target.simhash = simhash(target.content)
+    for i, band in enumerate(simhash_bands(target.simhash)):
+        setattr(target, f"simhash_band{i}", band)
+
+@event.listens_for(Ticket, "before_insert")
+def _fingerprint_inserted(mapper, connection, target):
+    _set_fingerprint(target)
+
+@event.listens_for(Ticket, "before_update")
+def _fingerprint_updated(mapper, connection, target):
+    if inspect(target).attrs.content.history.has_changes():
+        _set_fingerprint(target)
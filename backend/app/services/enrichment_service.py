@@ -0,0 +1,305 @@
+"""
+工单AI补全服务
+
+负责调用千帆完成意图分析、关键词提取和解决方案生成，并把结果回填到工单。
+本地分类器（见 app.services.local_classifier）有把握的工单直接使用本地结果，不调用千帆。
+支持两种模式:
+- sync: 创建工单时同步完成分析（默认）
+- async: 工单先以 enrichment_status="queued" 入库立即返回，由后台协程池从数据库中
+  领取待处理工单完成分析。数据库本身就是持久化队列，进程重启后未完成的工单会被重新领取
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.ticket import Ticket
+from app.services.local_classifier import local_classifier
+from app.services.qianfan_service import qianfan_service
+
+# 补全状态
+ENRICHMENT_QUEUED = "queued"
+ENRICHMENT_PROCESSING = "processing"
+ENRICHMENT_DONE = "done"
+ENRICHMENT_FAILED = "failed"
+
+async def _timed(stage: str, coro, timings: Dict[str, int]):
+    """执行协程并记录该阶段耗时（毫秒）"""
+    start = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        timings[stage] = int((time.perf_counter() - start) * 1000)
+
+def classify_locally(content: str) -> Optional[Dict[str, Any]]:
+    """本地分类器有把握时返回可直接写入 Ticket 的字段字典，否则返回None"""
+    start_time = time.perf_counter()
+    analysis_result = local_classifier.classify(content)
+    if analysis_result is None:
+        return None
+    response_time = int((time.perf_counter() - start_time) * 1000)
+    return build_ticket_fields(
+        analysis_result, analysis_result["keywords"], analysis_result["solution_suggestion"], response_time
+    )
+
+async def analyze_ticket_content(content: str, try_local: bool = True) -> Dict[str, Any]:
+    """
+    对工单内容进行完整的AI分析
+
+    本地分类器有把握时直接返回本地结果。QIANFAN_COMBINED_ANALYSIS 开启时用一次模型调用
+    得到全部结果；否则意图分析、关键词提取和解决方案生成三者并发执行，响应时间取决于最慢的一次调用
+
+    Args:
+        try_local: 为False时跳过本地分类器（调用方已经判断过）
+
+    Returns:
+        可直接写入 Ticket 的字段字典
+    """
+    if try_local:
+        fields = classify_locally(content)
+        if fields is not None:
+            return fields
+
+    start_time = time.perf_counter()
+    stage_timings = {}
+
+    if settings.QIANFAN_COMBINED_ANALYSIS:
+        analysis_result = await _timed(
+            "analyze_combined", qianfan_service.analyze_combined(content), stage_timings
+        )
+        keywords_list = analysis_result.get("keywords", [])
+        solution = analysis_result.get("solution_suggestion", "")
+    else:
+        analysis_result, extracted_keywords, solution = await asyncio.gather(
+            _timed("analyze_intent", qianfan_service.analyze_intent(content), stage_timings),
+            _timed("extract_keywords", qianfan_service.extract_keywords(content), stage_timings),
+            _timed("generate_solution", qianfan_service.generate_solution(content), stage_timings)
+        )
+        # 优先使用分析结果中的关键词
+        keywords_list = analysis_result.get("keywords") or extracted_keywords
+
+    # 计算响应时间（关键路径耗时）
+    response_time = int((time.perf_counter() - start_time) * 1000)  # 毫秒
+    analysis_result["stage_timings"] = stage_timings
+
+    return build_ticket_fields(analysis_result, keywords_list, solution, response_time)
+
+def build_ticket_fields(analysis_result: Dict[str, Any], keywords_list: List[str],
+                        solution: str, response_time: int) -> Dict[str, Any]:
+    """把千帆（或本地分类器）分析结果转换为 Ticket 字段"""
+    fields = {
+        "summary": analysis_result.get("summary", ""),
+        "category": analysis_result.get("suggested_category", "其他"),
+        "department": analysis_result.get("suggested_department", "综合服务部"),
+        "priority": analysis_result.get("priority", "medium"),
+        "sentiment": analysis_result.get("sentiment", {}).get("type", "neutral"),
+        "sentiment_score": analysis_result.get("sentiment", {}).get("intensity", 0.5),
+        "keywords": ",".join(keywords_list),
+        "solution_suggestion": solution,
+        "response_time": response_time,
+        "ai_analysis": analysis_result
+    }
+
+    # 提取位置信息
+    entities = analysis_result.get("entities", {})
+    if "location" in entities:
+        fields["location_detail"] = entities["location"]
+
+    return fields
+
+def apply_enrichment(ticket: Ticket, fields: Dict[str, Any]):
+    """把分析结果回填到工单"""
+    for key, value in fields.items():
+        setattr(ticket, key, value)
+    ticket.enrichment_status = ENRICHMENT_DONE
+    ticket.enrichment_error = None
+
+def count_backlog() -> int:
+    """统计待补全工单数量"""
+    db = SessionLocal()
+    try:
+        return db.query(Ticket).filter(
+            Ticket.enrichment_status.in_([ENRICHMENT_QUEUED, ENRICHMENT_PROCESSING])
+        ).count()
+    finally:
+        db.close()
+
+class EnrichmentWorkerPool:
+    """后台补全协程池"""
+
+    def __init__(self, workers: int, poll_interval: float):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._running = False
+        self.processed = 0
+        self.retried = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def start(self):
+        """启动工作协程"""
+        if self._running:
+            return
+        self._running = True
+        self._wakeup = asyncio.Event()
+        # 上次退出时处理中的工单重新入队
+        await asyncio.to_thread(self._requeue_interrupted)
+        self._tasks = [
+            asyncio.create_task(self._worker_loop(i), name=f"enrichment-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self):
+        """停止工作协程"""
+        self._running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """有新工单入队时唤醒空闲的工作协程"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """运行统计"""
+        return {
+            "running": self._running,
+            "workers": self.workers,
+            "processed": self.processed,
+            "retried": self.retried,
+            "failed": self.failed
+        }
+
+    async def _worker_loop(self, index: int):
+        while self._running:
+            ticket_id = await asyncio.to_thread(self._claim_next)
+            if ticket_id is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._process(ticket_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"工单{ticket_id}补全失败: {e}")
+                await asyncio.to_thread(self._record_failure, ticket_id, str(e))
+
+    async def _process(self, ticket_id: int):
+        content = await asyncio.to_thread(self._load_content, ticket_id)
+        if content is None:
+            return
+
+        fields = await analyze_ticket_content(content)
+
+        # 千帆不可用时返回的是降级结果，还有重试次数则稍后重试
+        if fields["ai_analysis"].get("is_fallback"):
+            if await asyncio.to_thread(self._schedule_retry, ticket_id, "千帆分析失败，已使用降级结果"):
+                return
+
+        await asyncio.to_thread(self._save_result, ticket_id, fields)
+        self.processed += 1
+
+    def _requeue_interrupted(self):
+        db = SessionLocal()
+        try:
+            db.query(Ticket).filter(
+                Ticket.enrichment_status == ENRICHMENT_PROCESSING
+            ).update({Ticket.enrichment_status: ENRICHMENT_QUEUED}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _claim_next(self) -> Optional[int]:
+        """领取一个到期的待处理工单，条件更新保证多个消费者不会重复领取"""
+        db = SessionLocal()
+        try:
+            now = datetime.now()
+            candidates = db.query(Ticket.id).filter(
+                Ticket.enrichment_status == ENRICHMENT_QUEUED,
+                (Ticket.enrichment_next_at.is_(None)) | (Ticket.enrichment_next_at <= now)
+            ).order_by(Ticket.id).limit(self.workers).all()
+
+            for (ticket_id,) in candidates:
+                claimed = db.query(Ticket).filter(
+                    Ticket.id == ticket_id,
+                    Ticket.enrichment_status == ENRICHMENT_QUEUED
+                ).update({
+                    Ticket.enrichment_status: ENRICHMENT_PROCESSING,
+                    Ticket.enrichment_attempts: Ticket.enrichment_attempts + 1
+                }, synchronize_session=False)
+                db.commit()
+                if claimed:
+                    return ticket_id
+            return None
+        finally:
+            db.close()
+
+    def _load_content(self, ticket_id: int) -> Optional[str]:
+        db = SessionLocal()
+        try:
+            row = db.query(Ticket.content).filter(Ticket.id == ticket_id).first()
+            return row[0] if row else None
+        finally:
+            db.close()
+
+    def _save_result(self, ticket_id: int, fields: Dict[str, Any]):
+        db = SessionLocal()
+        try:
+            ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
+            if not ticket:
+                return
+            apply_enrichment(ticket, fields)
+            db.commit()
+        finally:
+            db.close()
+
+    def _schedule_retry(self, ticket_id: int, error: str) -> bool:
+        """还有剩余重试次数则按指数退避重新入队，返回是否已重新入队"""
+        db = SessionLocal()
+        try:
+            ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
+            if not ticket or (ticket.enrichment_attempts or 0) >= settings.ENRICHMENT_MAX_RETRIES:
+                return False
+            delay = settings.ENRICHMENT_RETRY_DELAY * (2 ** ((ticket.enrichment_attempts or 1) - 1))
+            ticket.enrichment_status = ENRICHMENT_QUEUED
+            ticket.enrichment_error = error
+            ticket.enrichment_next_at = datetime.now() + timedelta(seconds=delay)
+            db.commit()
+            self.retried += 1
+            return True
+        finally:
+            db.close()
+
+    def _record_failure(self, ticket_id: int, error: str):
+        if self._schedule_retry(ticket_id, error):
+            return
+        db = SessionLocal()
+        try:
+            db.query(Ticket).filter(Ticket.id == ticket_id).update({
+                Ticket.enrichment_status: ENRICHMENT_FAILED,
+                Ticket.enrichment_error: error
+            }, synchronize_session=False)
+            db.commit()
+            self.failed += 1
+        finally:
+            db.close()
+
+# 创建全局实例
+enrichment_pool = EnrichmentWorkerPool(
+    workers=settings.ENRICHMENT_WORKERS,
+    poll_interval=settings.ENRICHMENT_POLL_INTERVAL
+)
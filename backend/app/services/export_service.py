@@ -0,0 +1,113 @@
+"""
+数据导出服务
+
+工单明细按 id 顺序通过服务端游标分块读取（yield_per），每块格式化后立即写出，
+内存占用与导出行数无关。支持的格式:
+- csv: 带BOM的UTF-8 CSV，Excel可直接打开
+- jsonl: 每行一个工单JSON对象
+- columnar: 列式JSON Lines，首行为列名和类型，之后每行是一块数据按列组织的取值数组，
+  列名不随每行重复，体积小于jsonl，可按列直接载入 pandas / Arrow
+
+统计报告（汇总数据量小）按章节逐段输出。
+"""
+import csv
+import io
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Sequence
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.responses import dumps_text
+from app.db.database import AsyncReadSessionLocal
+from app.models.ticket import Ticket
+
+# 格式 -> (Content-Type, 文件扩展名)
+TICKET_EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "columnar": ("application/x-ndjson", "columnar.jsonl"),
+}
+REPORT_EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+}
+
+# 导出的工单字段（不含完整AI分析结果和补全过程字段）
+EXPORT_COLUMNS = (
+    Ticket.id, Ticket.ticket_no, Ticket.user_id, Ticket.content, Ticket.summary,
+    Ticket.category, Ticket.department, Ticket.priority, Ticket.sentiment, Ticket.sentiment_score,
+    Ticket.location_district, Ticket.location_street, Ticket.location_detail, Ticket.status,
+    Ticket.keywords, Ticket.solution_suggestion, Ticket.response_time, Ticket.parent_id,
+    Ticket.created_at, Ticket.updated_at,
+)
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _csv_text(rows: Iterable[Sequence[Any]]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["" if value is None else _json_value(value) for value in row])
+    return buffer.getvalue()
+
+def _dumps(data: Any) -> str:
+    return dumps_text(data) + "\n"
+
+def _format_chunk(rows: List[Sequence[Any]], names: List[str], fmt: str) -> str:
+    if fmt == "csv":
+        return _csv_text(rows)
+    if fmt == "columnar":
+        return _dumps({"rows": len(rows), "data": [[row[i] for row in rows] for i in range(len(names))]})
+    return "".join(_dumps(dict(zip(names, row))) for row in rows)
+
+async def stream_tickets(conditions: List, fmt: str, chunk_size: int = None) -> AsyncIterator[str]:
+    """
+    按筛选条件流式导出工单明细
+    
+    在生成器内部打开只读会话：流式响应开始发送时，路由依赖注入的会话已经关闭
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    names = [column.key for column in EXPORT_COLUMNS]
+    
+    if fmt == "csv":
+        yield "\ufeff" + _csv_text([names])
+    elif fmt == "columnar":
+        types = [column.type.python_type.__name__ for column in EXPORT_COLUMNS]
+        yield _dumps({"columns": names, "types": types})
+    
+    async with AsyncReadSessionLocal() as db:
+        result = await db.stream(
+            select(*EXPORT_COLUMNS).where(*conditions).order_by(Ticket.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        async for rows in result.partitions():
+            yield _format_chunk(rows, names, fmt)
+
+def _flatten(prefix: str, value: Any) -> Iterable[Sequence[Any]]:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten(f"{prefix}.{key}" if prefix else str(key), item)
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            yield from _flatten(f"{prefix}.{index}", item)
+    else:
+        yield prefix, value
+
+async def stream_report(report: Dict[str, Any], fmt: str) -> AsyncIterator[str]:
+    """
+    按章节输出统计报告
+    
+    jsonl 每行一个章节 {"section": 名称, "data": 内容}；
+    csv 为 section,name,value 三列，嵌套内容的名称以点号连接
+    """
+    if fmt == "csv":
+        yield "\ufeff" + _csv_text([("section", "name", "value")])
+    for section, data in report.items():
+        if fmt == "csv":
+            yield _csv_text((section, name, value) for name, value in _flatten("", data))
+        else:
+            yield _dumps({"section": section, "data": data})
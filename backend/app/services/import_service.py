@@ -0,0 +1,323 @@
+"""
+工单批量导入服务
+
+用于夜间回灌电话系统的历史工单:
+- 上传内容（multipart文件或直接以请求体发送）边接收边落盘，再按块流式解析，支持 JSON Lines 和 CSV
+- 多条工单合并为一次千帆请求进行分析，批次之间并发受信号量限制
+- 按块批量插入，每块一个事务
+- 逐行返回处理进度（JSON Lines），不在内存中缓冲整个结果
+"""
+import asyncio
+import codecs
+import csv
+import json
+import tempfile
+import time
+from datetime import datetime
+from typing import AsyncIterator, BinaryIO, Callable, Dict, Any, Iterator, List, Optional, Tuple
+
+from fastapi import Request
+from multipart.multipart import MultipartParser, parse_options_header
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.ticket import Ticket
+from app.services.ticket_hooks import SUPPRESS_NOTIFICATIONS
+from app.services import ticket_events  # noqa: F401  注册工单变更事件（独立运行的导入同样递增数据版本号）
+from app.services.enrichment_service import (
+    ENRICHMENT_QUEUED, ENRICHMENT_DONE, build_ticket_fields, classify_locally, enrichment_pool
+)
+from app.services.qianfan_service import qianfan_service
+
+SPOOL_MAX_MEMORY = 1024 * 1024  # 上传内容超过1MB后写入磁盘
+READ_CHUNK_SIZE = 64 * 1024
+
+# 导入时允许携带的原始字段
+IMPORT_FIELDS = ("content", "location_info", "location_district", "location_street",
+                 "user_id", "status", "created_at")
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> str:
+    """根据文件名或Content-Type判断导入格式"""
+    name = (filename or "").lower()
+    ctype = (content_type or "").lower()
+    if name.endswith(".csv") or "csv" in ctype:
+        return "csv"
+    return "jsonl"
+
+async def spool_upload(request: Request) -> Tuple[BinaryIO, Optional[str]]:
+    """
+    把上传内容边接收边写入临时文件（超过阈值后落盘，内存占用恒定）
+
+    multipart/form-data 请求用 python-multipart 的增量解析器只保留第一个文件字段；
+    其他请求直接把请求体当作文件内容。必须在返回流式响应之前完成，
+    因为响应开始后Starlette会接管请求的receive通道
+
+    Returns:
+        (已定位到开头的临时文件, 上传文件名)
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/form-data"):
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        return spool, None
+
+    _, params = parse_options_header(content_type)
+    state = {"headers": b"", "field": b"", "in_file": False, "done": False, "filename": None}
+
+    def on_header_field(data, start, end):
+        state["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        if state["field"].lower() == b"content-disposition":
+            state["headers"] += data[start:end]
+
+    def on_header_end():
+        state["field"] = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"])
+        filename = disposition.get(b"filename")
+        state["in_file"] = filename is not None and not state["done"]
+        if state["in_file"]:
+            state["filename"] = filename.decode("utf-8", "ignore")
+        state["headers"] = b""
+
+    def on_part_data(data, start, end):
+        if state["in_file"]:
+            spool.write(data[start:end])
+
+    def on_part_end():
+        if state["in_file"]:
+            state["done"] = True
+        state["in_file"] = False
+
+    parser = MultipartParser(params.get(b"boundary"), {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    async for chunk in request.stream():
+        parser.write(chunk)
+    parser.finalize()
+
+    spool.seek(0)
+    return spool, state["filename"]
+
+def iter_upload_records(upload: BinaryIO, fmt: str) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    按块流式解析上传的工单记录
+
+    Yields:
+        (行号, 记录, 错误信息)，解析失败时记录为None
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    header: Optional[List[str]] = None
+    pending_csv = ""
+    row = 0
+
+    def parse_line(line: str):
+        nonlocal header, pending_csv
+        if fmt == "csv":
+            # 引号内可能包含换行，引号配对后才是一条完整记录
+            pending_csv += line
+            if pending_csv.count('"') % 2 == 1:
+                pending_csv += "\n"
+                return None
+            text, pending_csv = pending_csv, ""
+            if not text.strip():
+                return None
+            values = next(csv.reader([text]))
+            if header is None:
+                header = [h.strip() for h in values]
+                return None
+            return dict(zip(header, values)), None
+        if not line.strip():
+            return None
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            return None, f"JSON解析失败: {e.msg}"
+        if not isinstance(record, dict):
+            return None, "每行必须是一个JSON对象"
+        return record, None
+
+    while True:
+        chunk = upload.read(READ_CHUNK_SIZE)
+        final = not chunk
+        buffer += decoder.decode(chunk, final=final)
+        if final:
+            lines, buffer = buffer.split("\n"), ""
+        else:
+            *lines, buffer = buffer.split("\n")
+        for line in lines:
+            parsed = parse_line(line.rstrip("\r"))
+            if parsed is not None:
+                row += 1
+                yield (row, *parsed)
+        if final:
+            break
+
+    if pending_csv.strip():
+        row += 1
+        yield row, None, "CSV引号不匹配"
+
+def _validate_record(record: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """校验并规范化一条导入记录"""
+    data = {k: record.get(k) for k in IMPORT_FIELDS if record.get(k) not in (None, "")}
+    content = str(data.get("content", "")).strip()
+    if not content:
+        return None, "缺少content字段"
+    data["content"] = content
+
+    try:
+        if "user_id" in data:
+            data["user_id"] = int(data["user_id"])
+        if "created_at" in data:
+            data["created_at"] = datetime.fromisoformat(str(data["created_at"]))
+    except ValueError as e:
+        return None, f"字段格式错误: {e}"
+    return data, None
+
+async def analyze_records(records: List[Dict[str, Any]], semaphore: asyncio.Semaphore) -> List[Dict[str, Any]]:
+    """
+    返回与records对应的工单字段
+
+    本地分类器有把握的记录直接使用本地结果，其余按 IMPORT_BATCH_SIZE 条一组调用千帆批量分析
+    """
+    size = settings.IMPORT_BATCH_SIZE
+    results: List[Optional[Dict[str, Any]]] = [classify_locally(r["content"]) for r in records]
+    pending = [i for i, fields in enumerate(results) if fields is None]
+
+    async def run(batch: List[int]):
+        async with semaphore:
+            start = time.perf_counter()
+            analyses = await qianfan_service.analyze_batch([records[i]["content"] for i in batch])
+            elapsed = int((time.perf_counter() - start) * 1000)
+        for i, a in zip(batch, analyses):
+            results[i] = build_ticket_fields(a, a.get("keywords", []), a.get("solution_suggestion", ""), elapsed)
+
+    await asyncio.gather(*(run(pending[i:i + size]) for i in range(0, len(pending), size)))
+    return results
+
+def _insert_chunk(tickets: List[Ticket], ticket_no_factory: Callable[[], str],
+                  used_nos: set) -> List[Tuple[int, str]]:
+    """一个事务内批量插入一块工单，工单编号冲突时重新生成编号重试一次"""
+    for attempt in range(2):
+        db = SessionLocal()
+        # 导入的是历史工单，不给提交人发送受理通知
+        db.info[SUPPRESS_NOTIFICATIONS] = True
+        try:
+            db.add_all(tickets)
+            db.flush()
+            inserted = [(t.id, t.ticket_no) for t in tickets]
+            db.commit()
+            return inserted
+        except IntegrityError:
+            db.rollback()
+            if attempt:
+                raise
+            for t in tickets:
+                t.ticket_no = _unique_ticket_no(ticket_no_factory, used_nos)
+        finally:
+            db.close()
+
+def _unique_ticket_no(ticket_no_factory: Callable[[], str], used_nos: set) -> str:
+    ticket_no = ticket_no_factory()
+    while ticket_no in used_nos:
+        ticket_no = ticket_no_factory()
+    used_nos.add(ticket_no)
+    return ticket_no
+
+async def run_import(upload: BinaryIO, fmt: str, analyze: bool,
+                     ticket_no_factory: Callable[[], str]) -> AsyncIterator[str]:
+    """
+    执行批量导入，逐行输出处理进度（JSON Lines），结束后关闭上传文件
+
+    Args:
+        upload: spool_upload 得到的上传文件
+        fmt: jsonl/csv
+        analyze: 为True时导入过程中批量调用千帆分析；为False时工单以queued状态入库，
+                 由后台补全协程池处理（调用方需确认协程池正在运行）
+        ticket_no_factory: 工单编号生成函数
+    """
+    start = time.perf_counter()
+    semaphore = asyncio.Semaphore(settings.IMPORT_MAX_CONCURRENCY)
+    used_nos: set = set()
+    stats = {"total": 0, "created": 0, "failed": 0, "analyzed": analyze}
+    chunk: List[Tuple[int, Dict[str, Any]]] = []
+
+    def line(data: Dict[str, Any]) -> str:
+        return json.dumps(data, ensure_ascii=False) + "\n"
+
+    async def flush() -> List[str]:
+        rows = [r for r, _ in chunk]
+        records = [rec for _, rec in chunk]
+        chunk.clear()
+
+        fields_list = await analyze_records(records, semaphore) if analyze else [{} for _ in records]
+        tickets = []
+        for record, fields in zip(records, fields_list):
+            ticket = Ticket(
+                ticket_no=_unique_ticket_no(ticket_no_factory, used_nos),
+                # 来源记录没有提交人时留空，不归到任何用户名下
+                user_id=record.get("user_id"),
+                content=record["content"],
+                location_detail=record.get("location_info", ""),
+                location_reported=record.get("location_info", ""),
+                location_district=record.get("location_district"),
+                location_street=record.get("location_street"),
+                status=record.get("status", "pending"),
+                enrichment_status=ENRICHMENT_DONE if analyze else ENRICHMENT_QUEUED,
+                enrichment_attempts=0
+            )
+            if "created_at" in record:
+                ticket.created_at = record["created_at"]
+                ticket.updated_at = record["created_at"]
+            for key, value in fields.items():
+                setattr(ticket, key, value)
+            tickets.append(ticket)
+
+        try:
+            inserted = await asyncio.to_thread(_insert_chunk, tickets, ticket_no_factory, used_nos)
+        except Exception as e:
+            stats["failed"] += len(rows)
+            return [line({"row": r, "status": "error", "error": f"写入失败: {e}"}) for r in rows]
+
+        stats["created"] += len(inserted)
+        if not analyze:
+            enrichment_pool.notify()
+        return [
+            line({"row": r, "status": "created", "ticket_id": ticket_id, "ticket_no": ticket_no})
+            for r, (ticket_id, ticket_no) in zip(rows, inserted)
+        ]
+
+    try:
+        for row, record, error in iter_upload_records(upload, fmt):
+            stats["total"] += 1
+            if record is not None:
+                record, error = _validate_record(record)
+            if error:
+                stats["failed"] += 1
+                yield line({"row": row, "status": "error", "error": error})
+                continue
+
+            chunk.append((row, record))
+            if len(chunk) >= settings.IMPORT_CHUNK_SIZE:
+                for out in await flush():
+                    yield out
+
+        if chunk:
+            for out in await flush():
+                yield out
+    finally:
+        upload.close()
+
+    stats["elapsed_ms"] = int((time.perf_counter() - start) * 1000)
+    yield line({"status": "finished", **stats})
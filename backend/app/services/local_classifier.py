@@ -0,0 +1,441 @@
+"""
+本地工单分类器
+
+多数工单集中在少数几个类别，内容一目了然，没有必要每条都请求千帆。本地分类器用历史工单
+（content → category/department/priority/sentiment）离线训练，不依赖网络:
+- 特征为字符一元/二元/三元组，哈希到固定维度，词频取对数后做L2归一化
+- 每个字段一个多项逻辑回归（softmax），Adagrad 小批量训练；权重以 float16 存为 npz 文件
+- 推理只对工单中出现的 n 元组查表求和，单条耗时约0.15毫秒（千帆调用为数百毫秒到数秒）
+
+分类、部门和优先级的预测概率都达到 LOCAL_CLASSIFIER_MIN_CONFIDENCE 时直接使用本地结果，
+不调用千帆；其余工单仍交给千帆分析。本地结果的 ai_analysis.source 为 "local_classifier"，
+摘要取原文开头，关键词取原文中对预测类别贡献大的片段；这类工单及千帆降级结果不参与训练。
+模型文件不存在时分类器不生效，行为与原来一致。
+
+训练与评估（在backend目录下）:
+    python -m app.services.local_classifier train      # 工单ID尾号为0的工单留作评估集，其余用于训练
+    python -m app.services.local_classifier evaluate   # 评估集上各字段准确率，不同置信度阈值下的覆盖率、准确率和耗时
+"""
+import json
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.ticket import Ticket
+
+HEADS = ("category", "department", "priority", "sentiment")
+# 预测概率都达到阈值才在本地处理的字段（情绪只用于统计，不参与判断）
+GATED_HEADS = ("category", "department", "priority")
+NGRAM_SIZES = (1, 2, 3)
+SOURCE = "local_classifier"
+# 训练集中出现次数少于该值的标签不学习，这类工单总是交给千帆
+MIN_LABEL_COUNT = 5
+
+_NON_TEXT = re.compile(r"[^\w]+")
+
+# 一条训练/评估样本: (内容, 各字段标签, 情绪分数)
+Sample = Tuple[str, Dict[str, Optional[str]], Optional[float]]
+
+def _grams(text: Optional[str]) -> Counter:
+    value = _NON_TEXT.sub("", unicodedata.normalize("NFKC", text or "").lower())
+    return Counter(value[i:i + n] for n in NGRAM_SIZES for i in range(len(value) - n + 1))
+
+def featurize(text: Optional[str], dim: int) -> Tuple[np.ndarray, np.ndarray]:
+    """把文本转换为稀疏特征: (特征下标, L2归一化的特征值)"""
+    features: Dict[int, float] = {}
+    for gram, count in _grams(text).items():
+        h = zlib.crc32(gram.encode("utf-8")) % dim
+        features[h] = features.get(h, 0.0) + 1.0 + math.log(count)
+    if not features:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    indices = np.fromiter(features.keys(), dtype=np.int64, count=len(features))
+    values = np.fromiter(features.values(), dtype=np.float32, count=len(features))
+    return indices, values / np.linalg.norm(values)
+
+class TicketClassifier:
+    """按字段的多项逻辑回归模型"""
+
+    def __init__(self, dim: int, heads: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]], meta: Dict[str, Any]):
+        """
+        Args:
+            heads: 字段 → (标签数组, 权重矩阵 dim×标签数, 偏置)
+            meta: 训练信息（样本数、训练时间、情绪分数均值等）
+        """
+        self.dim = dim
+        self.heads = heads
+        self.meta = meta
+
+    def predict(self, content: str) -> Optional[Dict[str, Tuple[str, float]]]:
+        """各字段的预测标签和概率，内容为空时返回None"""
+        indices, values = featurize(content, self.dim)
+        if not len(indices):
+            return None
+        result = {}
+        for head, (labels, weights, bias) in self.heads.items():
+            scores = values @ weights[indices] + bias
+            scores = np.exp(scores - scores.max())
+            best = int(scores.argmax())
+            result[head] = (str(labels[best]), float(scores[best] / scores.sum()))
+        return result
+
+    def keywords(self, content: str, label: str, limit: int = 5) -> List[str]:
+        """
+        原文中对预测类别贡献大的片段
+
+        二元/三元组的得分为该类别权重减去其他类别权重的最大值，得分达到最高分一半的
+        n 元组所覆盖的连续字符合并为一个片段，按片段内最高得分排序
+        """
+        labels, weights, _ = self.heads["category"]
+        column = int(np.flatnonzero(labels == label)[0])
+        spans = []  # (各字符得分, 片段)
+        # 按标点分段，片段不跨越标点
+        for segment in _NON_TEXT.split(unicodedata.normalize("NFKC", content or "").lower()):
+            positions = [(i, n) for n in NGRAM_SIZES[1:] for i in range(len(segment) - n + 1)]
+            if not positions:
+                continue
+            rows = weights[[zlib.crc32(segment[i:i + n].encode("utf-8")) % self.dim for i, n in positions]]
+            # 与其他类别权重最大值的差，只保留区分该类别的片段
+            others = rows.copy()
+            others[:, column] = -np.inf
+            margins = (rows[:, column] - others.max(axis=1)).tolist()
+            scores = [0.0] * len(segment)
+            for (i, n), margin in zip(positions, margins):
+                for j in range(i, i + n):
+                    scores[j] = max(scores[j], margin)
+            spans.append((scores, segment))
+        peak = max((max(scores, default=0.0) for scores, _ in spans), default=0.0)
+        if peak <= 0:
+            return []
+
+        ranked = []
+        for scores, segment in spans:
+            start = None
+            for i, score in enumerate(scores + [0.0]):
+                if score >= peak / 2 and start is None:
+                    start = i
+                elif score < peak / 2 and start is not None:
+                    if i - start >= 2:
+                        ranked.append((max(scores[start:i]), segment[start:i]))
+                    start = None
+        ranked.sort(reverse=True)
+        keywords = []
+        for _, text in ranked:
+            if text not in keywords:
+                keywords.append(text)
+        return keywords[:limit]
+
+    def save(self, path: str):
+        arrays = {"meta": np.array(json.dumps(dict(self.meta, dim=self.dim), ensure_ascii=False))}
+        for head, (labels, weights, bias) in self.heads.items():
+            arrays[f"{head}_labels"] = labels
+            arrays[f"{head}_weights"] = weights.astype(np.float16)
+            arrays[f"{head}_bias"] = bias.astype(np.float16)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TicketClassifier":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            heads = {
+                head: (
+                    data[f"{head}_labels"],
+                    data[f"{head}_weights"].astype(np.float32),
+                    data[f"{head}_bias"].astype(np.float32),
+                )
+                for head in HEADS if f"{head}_labels" in data
+            }
+        return cls(meta.pop("dim"), heads, meta)
+
+def train(samples: List[Sample], dim: int, epochs: int = 6, batch_size: int = 256,
+          learning_rate: float = 0.5, l2: float = 1e-6, seed: int = 0) -> TicketClassifier:
+    """在样本上训练各字段的多项逻辑回归"""
+    rng = np.random.default_rng(seed)
+    features = [featurize(content, dim) for content, _, _ in samples]
+    keep = [i for i, (indices, _) in enumerate(features) if len(indices)]
+    features = [features[i] for i in keep]
+    samples = [samples[i] for i in keep]
+
+    # 各字段的标签编号，缺失或过少的标签为 -1（不参与该字段的损失）
+    targets = {}
+    label_arrays = {}
+    for head in HEADS:
+        counts = Counter(labels.get(head) for _, labels, _ in samples)
+        names = sorted(name for name, count in counts.items() if name and count >= MIN_LABEL_COUNT)
+        if len(names) < 2:
+            continue
+        position = {name: i for i, name in enumerate(names)}
+        label_arrays[head] = np.array(names)
+        targets[head] = np.array([position.get(labels.get(head), -1) for _, labels, _ in samples], dtype=np.int64)
+
+    params = {
+        head: [np.zeros((dim, len(names)), dtype=np.float32), np.zeros(len(names), dtype=np.float32),
+               np.zeros((dim, len(names)), dtype=np.float32), np.zeros(len(names), dtype=np.float32)]
+        for head, names in label_arrays.items()
+    }
+    lengths = np.array([len(indices) for indices, _ in features])
+    for _ in range(epochs):
+        order = rng.permutation(len(features))
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            indices = np.concatenate([features[i][0] for i in rows])
+            values = np.concatenate([features[i][1] for i in rows])[:, None]
+            offsets = np.concatenate(([0], np.cumsum(lengths[rows])[:-1]))
+            row_of = np.repeat(np.arange(len(rows)), lengths[rows])
+            # 同一特征下标的梯度按排序后分段求和
+            by_index = np.argsort(indices, kind="stable")
+            sorted_indices = indices[by_index]
+            segments = np.flatnonzero(np.concatenate(([True], sorted_indices[1:] != sorted_indices[:-1])))
+            touched = sorted_indices[segments]
+
+            for head, (weights, bias, weights_acc, bias_acc) in params.items():
+                y = targets[head][rows]
+                valid = y >= 0
+                if not valid.any():
+                    continue
+                scores = np.add.reduceat(weights[indices] * values, offsets, axis=0) + bias
+                scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+                grad = scores / scores.sum(axis=1, keepdims=True)
+                grad[np.flatnonzero(valid), y[valid]] -= 1.0
+                grad[~valid] = 0.0
+                grad /= valid.sum()
+
+                weight_grad = np.add.reduceat((grad[row_of] * values)[by_index], segments, axis=0)
+                weight_grad += l2 * weights[touched]
+                weights_acc[touched] += weight_grad ** 2
+                weights[touched] -= learning_rate * weight_grad / (np.sqrt(weights_acc[touched]) + 1e-8)
+                bias_grad = grad.sum(axis=0)
+                bias_acc += bias_grad ** 2
+                bias -= learning_rate * bias_grad / (np.sqrt(bias_acc) + 1e-8)
+
+    # 情绪分数取训练集中各情绪的平均值
+    scores_by_sentiment: Dict[str, List[float]] = {}
+    for _, labels, score in samples:
+        if labels.get("sentiment") and score is not None:
+            scores_by_sentiment.setdefault(labels["sentiment"], []).append(score)
+    meta = {
+        "trained_at": datetime.now().isoformat(timespec="seconds"),
+        "samples": len(samples),
+        "sentiment_scores": {k: round(sum(v) / len(v), 3) for k, v in scores_by_sentiment.items()},
+    }
+    heads = {head: (label_arrays[head], weights, bias) for head, (weights, bias, _, _) in params.items()}
+    return TicketClassifier(dim, heads, meta)
+
+def evaluate(model: TicketClassifier, samples: List[Sample],
+             thresholds: Iterable[float] = (0.5, 0.7, 0.8, 0.9, 0.95, 0.98)) -> Dict[str, Any]:
+    """
+    在样本上评估模型
+
+    Returns:
+        各字段准确率；各阈值下本地处理的比例（覆盖率）及这部分工单分类、部门、优先级全部正确的比例；
+        单条预测耗时（微秒）
+    """
+    correct = Counter()
+    total = Counter()
+    gated = []  # (分类/部门/优先级的最低概率, 是否全部正确)
+    latencies = []
+    for content, labels, _ in samples:
+        start = time.perf_counter()
+        prediction = model.predict(content)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        if prediction is None:
+            continue
+        for head, (label, _) in prediction.items():
+            if labels.get(head):
+                total[head] += 1
+                correct[head] += label == labels[head]
+        if all(head in prediction for head in GATED_HEADS):
+            gated.append((
+                min(prediction[head][1] for head in GATED_HEADS),
+                all(prediction[head][0] == labels.get(head) for head in GATED_HEADS),
+            ))
+    latencies.sort()
+    coverage = []
+    for threshold in thresholds:
+        handled = [ok for confidence, ok in gated if confidence >= threshold]
+        coverage.append({
+            "threshold": threshold,
+            "coverage": len(handled) / len(samples) if samples else 0.0,
+            "accuracy": sum(handled) / len(handled) if handled else None,
+        })
+    return {
+        "samples": len(samples),
+        "accuracy": {head: correct[head] / total[head] for head in total},
+        "coverage": coverage,
+        "latency_p50_us": latencies[len(latencies) // 2] if latencies else None,
+        "latency_p99_us": latencies[int(len(latencies) * 0.99) - 1] if len(latencies) >= 100 else None,
+    }
+
+def load_samples(holdout: bool) -> List[Sample]:
+    """
+    从工单表读取带标签的样本
+
+    只使用千帆分析完成的非重复工单（人工修改过分类/部门的也在内），跳过降级结果和本地分类器的结果；
+    工单ID尾号为0的为评估集
+    """
+    db = SessionLocal()
+    try:
+        query = select(
+            Ticket.content, Ticket.category, Ticket.department, Ticket.priority,
+            Ticket.sentiment, Ticket.sentiment_score, Ticket.ai_analysis
+        ).where(
+            Ticket.content.isnot(None),
+            Ticket.category.isnot(None),
+            Ticket.parent_id.is_(None),
+            (Ticket.id % 10 == 0) if holdout else (Ticket.id % 10 != 0),
+        )
+        samples = []
+        for content, category, department, priority, sentiment, score, analysis in db.execute(query).yield_per(5000):
+            analysis = analysis or {}
+            if analysis.get("is_fallback") or analysis.get("source") == SOURCE:
+                continue
+            labels = {"category": category, "department": department, "priority": priority, "sentiment": sentiment}
+            samples.append((content, labels, score))
+        return samples
+    finally:
+        db.close()
+
+class LocalClassifierService:
+    """加载模型，判断工单能否在本地处理，并统计命中情况"""
+
+    def __init__(self, path: str, min_confidence: float):
+        self.path = path
+        self.min_confidence = min_confidence
+        self.model: Optional[TicketClassifier] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.counters = {"classified": 0, "handled": 0, "escalated": 0}
+        self._elapsed_us = 0.0
+
+    def reload(self) -> bool:
+        """重新加载模型文件，不存在或损坏时不启用本地分类"""
+        with self._lock:
+            self._loaded = True
+            if not os.path.exists(self.path):
+                self.model = None
+                return False
+            try:
+                self.model = TicketClassifier.load(self.path)
+            except Exception as e:
+                print(f"本地分类模型加载失败: {e}")
+                self.model = None
+                return False
+            print(f"已加载本地分类模型: {self.path}（{self.model.meta.get('samples')} 条样本训练）")
+            return True
+
+    def classify(self, content: str) -> Optional[Dict[str, Any]]:
+        """
+        有把握时返回与千帆意图分析结构相同的结果，否则返回None（交给千帆）
+        """
+        if not self._loaded:
+            self.reload()
+        model = self.model
+        if model is None:
+            return None
+
+        start = time.perf_counter()
+        prediction = model.predict(content)
+        self._elapsed_us += (time.perf_counter() - start) * 1e6
+        self.counters["classified"] += 1
+        if prediction is None or any(
+            head not in prediction or prediction[head][1] < self.min_confidence for head in GATED_HEADS
+        ):
+            self.counters["escalated"] += 1
+            return None
+        self.counters["handled"] += 1
+
+        category = prediction["category"][0]
+        department = prediction["department"][0]
+        priority = prediction["priority"][0]
+        sentiment = prediction["sentiment"][0] if "sentiment" in prediction else "neutral"
+        keywords = model.keywords(content, category) or [category]
+        return {
+            "core_issues": [category],
+            "entities": {},
+            "sentiment": {
+                "type": sentiment,
+                "intensity": model.meta.get("sentiment_scores", {}).get(sentiment, 0.5),
+                "urgency": priority,
+                "keywords": keywords
+            },
+            "summary": content[:50] + "..." if len(content) > 50 else content,
+            "suggested_category": category,
+            "suggested_department": department,
+            "priority": priority,
+            "keywords": keywords,
+            "solution_suggestion": f"我们已收到您的反馈，已转交{department}处理，将尽快为您解决。",
+            "source": SOURCE,
+            "confidence": {head: round(probability, 3) for head, (_, probability) in prediction.items()}
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        if not self._loaded:
+            self.reload()
+        classified = self.counters["classified"]
+        return {
+            "enabled": self.model is not None,
+            "path": self.path,
+            "min_confidence": self.min_confidence,
+            "model": self.model.meta if self.model is not None else None,
+            "handled_rate": round(self.counters["handled"] / classified, 3) if classified else None,
+            "avg_latency_us": round(self._elapsed_us / classified, 1) if classified else None,
+            **self.counters,
+        }
+
+# 创建全局实例
+local_classifier = LocalClassifierService(settings.LOCAL_CLASSIFIER_PATH, settings.LOCAL_CLASSIFIER_MIN_CONFIDENCE)
+
+def _print_report(report: Dict[str, Any]):
+    print(f"评估样本 {report['samples']} 条")
+    for head, accuracy in report["accuracy"].items():
+        print(f"  {head} 准确率 {accuracy:.1%}")
+    for row in report["coverage"]:
+        accuracy = f"{row['accuracy']:.1%}" if row["accuracy"] is not None else "-"
+        print(f"  置信度 ≥ {row['threshold']:.2f}: 本地处理 {row['coverage']:.1%}，其中全部字段正确 {accuracy}")
+    if report["latency_p50_us"] is not None:
+        p99 = f"{report['latency_p99_us']:.0f}" if report["latency_p99_us"] is not None else "-"
+        print(f"  单条耗时 p50 {report['latency_p50_us']:.0f} µs，p99 {p99} µs")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地工单分类器")
+    parser.add_argument("command", choices=["train", "evaluate"])
+    parser.add_argument("--path", default=settings.LOCAL_CLASSIFIER_PATH, help="模型文件路径")
+    parser.add_argument("--dim", type=int, default=settings.LOCAL_CLASSIFIER_DIM, help="特征哈希维度（训练）")
+    parser.add_argument("--epochs", type=int, default=6, help="训练轮数")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        train_samples = load_samples(holdout=False)
+        print(f"训练样本 {len(train_samples)} 条")
+        start = time.perf_counter()
+        classifier = train(train_samples, args.dim, epochs=args.epochs)
+        print(f"训练耗时 {time.perf_counter() - start:.1f} 秒")
+        if not all(head in classifier.heads for head in GATED_HEADS):
+            print("已分析的工单不足，分类、部门、优先级至少各需两个出现过 "
+                  f"{MIN_LABEL_COUNT} 次以上的取值，未生成模型")
+            raise SystemExit(1)
+        classifier.meta["evaluation"] = evaluate(classifier, load_samples(holdout=True))
+        _print_report(classifier.meta["evaluation"])
+        classifier.save(args.path)
+        print(f"已保存: {args.path}（{os.path.getsize(args.path) / 1024:.0f} KB）")
+    else:
+        if not os.path.exists(args.path):
+            print(f"模型文件不存在: {args.path}，请先运行 train")
+            raise SystemExit(1)
+        _print_report(evaluate(TicketClassifier.load(args.path), load_samples(holdout=True)))
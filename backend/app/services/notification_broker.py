@@ -0,0 +1,162 @@
+"""
+通知推送
+
+进程内的发布/订阅：通知写入提交后，按用户推送给该用户的 Server-Sent Events 连接，
+客户端不再定时轮询 /users/notifications。
+- 每个连接一个有界队列，发布只入队，不做IO；连接处理不过来（队列满）时断开该连接
+- 事件ID为通知ID，客户端断线重连时浏览器自动带上 Last-Event-ID，从 notifications 表补发
+- 只推送本进程提交的通知，多进程部署时其它进程写入的通知在客户端重连时补发
+"""
+import asyncio
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import settings
+from app.core.responses import dumps_text
+from app.db.database import AsyncSessionLocal
+from app.models.user import Notification
+
+# 断线补发时每次从数据库读取的通知数
+REPLAY_BATCH_SIZE = 100
+
+def notification_dict(notification: Notification) -> Dict[str, Any]:
+    """通知的接口表示，列表接口和推送共用"""
+    created_at = notification.__dict__.get("created_at") or datetime.now()
+    return {
+        "id": notification.id,
+        "title": notification.title,
+        "content": notification.content,
+        "ticket_id": notification.ticket_id,
+        "is_read": notification.is_read or 0,
+        "created_at": created_at.isoformat(),
+    }
+
+class NotificationBroker:
+    """按用户分发通知的进程内发布/订阅"""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        """在事件循环中调用，返回接收该用户通知的队列（收到 None 表示连接应断开）"""
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[user_id]
+
+    def close(self):
+        """断开全部连接（应用关闭时调用，否则服务器要等SSE连接超时才能退出）"""
+        for user_id, queues in list(self._subscribers.items()):
+            for queue in list(queues):
+                self._disconnect(user_id, queue)
+
+    def connection_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def publish(self, user_id: int, message: Dict[str, Any]):
+        """发布通知，可在任意线程调用（后台线程提交的通知转交事件循环分发）"""
+        loop = self._loop
+        if loop is None or user_id not in self._subscribers:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._dispatch(user_id, message)
+            return
+        try:
+            loop.call_soon_threadsafe(self._dispatch, user_id, message)
+        except RuntimeError:
+            # 事件循环已关闭（应用退出中）
+            pass
+
+    def _dispatch(self, user_id: int, message: Dict[str, Any]):
+        for queue in list(self._subscribers.get(user_id, ())):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # 断开处理不过来的连接，客户端重连后按 Last-Event-ID 补发
+                self._disconnect(user_id, queue)
+
+    def _disconnect(self, user_id: int, queue: asyncio.Queue):
+        self.unsubscribe(user_id, queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+def _sse(message: Dict[str, Any]) -> str:
+    return f"id: {message['id']}\nevent: notification\ndata: {dumps_text(message)}\n\n"
+
+async def stream_notifications(user_id: int, last_event_id: Optional[int] = None) -> AsyncIterator[str]:
+    """
+    用户通知的SSE流
+
+    先订阅再补发 last_event_id 之后的通知，补发期间提交的通知按ID去重，不会遗漏或重复；
+    在生成器内部打开会话：流式响应开始发送时，路由依赖注入的会话已经关闭
+    """
+    queue = notification_broker.subscribe(user_id)
+    try:
+        yield f"retry: {settings.NOTIFICATION_RETRY_MS}\n\n"
+        last_id = last_event_id or 0
+
+        if last_event_id is not None:
+            async with AsyncSessionLocal() as db:
+                while True:
+                    notifications = (await db.scalars(
+                        select(Notification)
+                        .where(Notification.user_id == user_id, Notification.id > last_id)
+                        .order_by(Notification.id)
+                        .limit(REPLAY_BATCH_SIZE)
+                    )).all()
+                    for notification in notifications:
+                        last_id = notification.id
+                        yield _sse(notification_dict(notification))
+                    if len(notifications) < REPLAY_BATCH_SIZE:
+                        break
+
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=settings.NOTIFICATION_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if message is None:
+                break
+            if message["id"] <= last_id:
+                continue
+            last_id = message["id"]
+            yield _sse(message)
+    finally:
+        notification_broker.unsubscribe(user_id, queue)
+
+@event.listens_for(Notification, "after_insert")
+def _notification_inserted(mapper, connection, target):
+    session = object_session(target)
+    if session is not None and target.user_id is not None:
+        session.info.setdefault("notifications", []).append((target.user_id, notification_dict(target)))
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session):
+    for user_id, message in session.info.pop("notifications", ()):
+        notification_broker.publish(user_id, message)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop("notifications", None)
+
+# 创建全局实例
+notification_broker = NotificationBroker(settings.NOTIFICATION_QUEUE_SIZE)
@@ -0,0 +1,140 @@
+"""
+通知生成
+
+工单生命周期事件（见 app.services.ticket_hooks）提交后生成给市民的通知:
+- 工单受理（新建的待处理工单）、状态变更通知提交人
+- 他人评论通知工单提交人
+
+通知不在业务事务中写入，而是交给缓冲写入器: 后台线程每 NOTIFICATION_FLUSH_INTERVAL_MS
+（或积累 NOTIFICATION_FLUSH_SIZE 条）把缓冲的通知在一个事务中批量插入，批量导入、批量改状态
+等突发写入合并为少量事务，业务请求不再为通知多一次写入。通知提交后由 notification_broker 推送。
+进程异常退出时缓冲中未写入的通知会丢失。
+"""
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.user import Notification
+from app.services import ticket_hooks
+from app.services.ticket_hooks import LifecycleEvent
+
+# 状态变更时通知市民的内容
+STATUS_TEXT = {
+    "pending": "已受理，等待处理",
+    "processing": "正在处理中",
+    "resolved": "已处理完成，请查看并评价",
+    "closed": "已关闭",
+}
+
+class NotificationWriter:
+    """缓冲通知并定期批量写入的后台线程"""
+
+    def __init__(self, flush_interval: float, flush_size: int):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._buffer: List[Dict] = []
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.written = 0
+        self.flushes = 0
+
+    def enqueue(self, user_id: int, ticket_id: Optional[int], title: str, content: str):
+        """缓冲一条通知，可在任意线程调用；首次调用时启动写入线程"""
+        with self._condition:
+            self._buffer.append({"user_id": user_id, "ticket_id": ticket_id, "title": title, "content": content[:500]})
+            if self._thread is None:
+                self._start()
+            if len(self._buffer) >= self.flush_size:
+                self._condition.notify()
+
+    def stop(self):
+        """写入剩余通知并停止写入线程（应用关闭时调用）"""
+        with self._condition:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stopping = True
+            self._condition.notify()
+        thread.join()
+        with self._condition:
+            self._thread = None
+            self._stopping = False
+
+    def flush(self) -> int:
+        """立即写入缓冲中的通知，返回写入条数"""
+        with self._condition:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+        db = SessionLocal()
+        try:
+            # 逐条 add 以触发通知写入事件（推送），插入由ORM合并为批量语句
+            db.add_all([Notification(**row) for row in rows])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"通知写入失败（{len(rows)}条）: {e}")
+            return 0
+        finally:
+            db.close()
+        self.written += len(rows)
+        self.flushes += 1
+        return len(rows)
+
+    def stats(self) -> Dict[str, int]:
+        """运行统计"""
+        return {"buffered": len(self._buffer), "written": self.written, "flushes": self.flushes}
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name="notification-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._stopping and len(self._buffer) < self.flush_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+def _ticket_created(lifecycle_event: LifecycleEvent):
+    # 批量导入的工单不产生生命周期事件（见 import_service）；其余已在处理或已办结的工单不通知
+    if lifecycle_event.user_id and lifecycle_event.new_status in (None, "pending"):
+        notification_writer.enqueue(
+            lifecycle_event.user_id, lifecycle_event.ticket_id, "工单已受理",
+            f"您的工单 {lifecycle_event.ticket_no} 已受理，我们将尽快处理"
+        )
+
+def _status_changed(lifecycle_event: LifecycleEvent):
+    if lifecycle_event.user_id:
+        status = lifecycle_event.new_status
+        notification_writer.enqueue(
+            lifecycle_event.user_id, lifecycle_event.ticket_id, "工单状态更新",
+            f"您的工单 {lifecycle_event.ticket_no} {STATUS_TEXT.get(status, status)}"
+        )
+
+def _comment_created(lifecycle_event: LifecycleEvent):
+    # 提交人自己的评论不通知
+    if lifecycle_event.user_id and lifecycle_event.user_id != lifecycle_event.actor_id:
+        notification_writer.enqueue(
+            lifecycle_event.user_id, lifecycle_event.ticket_id, "工单有新回复",
+            f"您的工单 {lifecycle_event.ticket_no} 有新回复: {lifecycle_event.content or ''}"
+        )
+
+ticket_hooks.register(ticket_hooks.TICKET_CREATED, _ticket_created)
+ticket_hooks.register(ticket_hooks.STATUS_CHANGED, _status_changed)
+ticket_hooks.register(ticket_hooks.COMMENT_CREATED, _comment_created)
+
+# 创建全局实例
+notification_writer = NotificationWriter(
+    settings.NOTIFICATION_FLUSH_INTERVAL_MS / 1000, settings.NOTIFICATION_FLUSH_SIZE
+)
@@ -0,0 +1,83 @@
+"""
+游标（keyset）分页
+
+列表按 (created_at, id) 倒序排列，游标记录上一页最后一行的排序键，下一页直接从该位置
+继续读取，不再扫描并丢弃前面的行，翻页期间有新工单进入也不会造成重复或遗漏。
+全文检索按相关度排序时，游标额外记录相关度分数。
+
+游标对客户端是不透明的字符串（URL安全的base64），通过响应头 X-Next-Cursor 返回，
+没有下一页时不返回该响应头。
+
+SQLite 中 created_at 以文本存储，且数据库默认值（无微秒）与应用写入的值（带微秒）格式不同，
+按文本排序。游标因此记录库中的原始文本并按文本比较，与 ORDER BY 的顺序严格一致。
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import String, and_, or_, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.ticket import Ticket
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _sort_key(db: Session):
+    """created_at 在数据库中的原始排序值（SQLite下为文本，不做类型转换，仍可使用索引）"""
+    if db.get_bind().dialect.name == "sqlite":
+        return type_coerce(Ticket.created_at, String)
+    return Ticket.created_at
+
+def encode_cursor(created_at, ticket_id: int, score: Optional[float] = None) -> str:
+    """生成游标，created_at 为库中原始值"""
+    payload = {"c": created_at if isinstance(created_at, str) else created_at.isoformat(), "i": ticket_id}
+    if score is not None:
+        payload["s"] = score
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, int, Optional[float]]:
+    """解析游标，格式错误时返回400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        created_at = str(payload["c"])
+        datetime.fromisoformat(created_at)
+        score = payload.get("s")
+        return created_at, int(payload["i"]), float(score) if score is not None else None
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+def after_cursor(db: Session, created_at: str, ticket_id: int):
+    """
+    按 (created_at, id) 倒序时位于游标之后的行
+
+    写成 created_at <= c AND (created_at < c OR id < i)，外层条件可直接走索引范围查找
+    （等价的 created_at < c OR (created_at = c AND id < i) 在SQLite中会退化为全索引扫描）
+    """
+    key = _sort_key(db)
+    if db.get_bind().dialect.name != "sqlite":
+        created_at = datetime.fromisoformat(created_at)
+    return and_(
+        key <= created_at,
+        or_(key < created_at, Ticket.id < ticket_id)
+    )
+
+def after_scored_cursor(db: Session, score_column, score: float, created_at: str, ticket_id: int):
+    """按 (score 升序, created_at 倒序, id 倒序) 排序时位于游标之后的行"""
+    return or_(
+        score_column > score,
+        and_(score_column == score, after_cursor(db, created_at, ticket_id))
+    )
+
+async def set_next_cursor(response: Response, db: AsyncSession, last, page_size: int,
+                          limit: int, score: Optional[float] = None):
+    """本页已满时在响应头中返回下一页游标，last 为本页最后一行（工单或含 id 列的查询结果行）"""
+    if last is None or page_size < limit:
+        return
+    created_at = await db.scalar(select(_sort_key(db)).where(Ticket.id == last.id))
+    if created_at is not None:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(created_at, last.id, score)
@@ -0,0 +1,206 @@
+"""
+千帆调用保护
+
+千帆变慢或故障时，限制其对整个服务的影响:
+- 并发上限: 同时进行中的模型调用不超过 QIANFAN_MAX_IN_FLIGHT，超出的调用最多排队
+  QIANFAN_QUEUE_TIMEOUT_SECONDS，仍拿不到名额则直接失败（走本地降级结果）。
+  名额在底层调用真正结束时才释放，调用方超时放弃后线程仍占用名额，不会越积越多
+- 调用时限: 每次调用的时限按最近成功调用的 P95 耗时自适应
+  （QIANFAN_TIMEOUT_MULTIPLIER 倍，限制在 QIANFAN_MIN_TIMEOUT_SECONDS ~ QIANFAN_MAX_TIMEOUT_SECONDS 之间），
+  SDK 不再自行重试（失败的工单由补全协程池按退避策略重试）
+- 熔断器: 最近 QIANFAN_BREAKER_WINDOW 次调用中失败（含超时）比例达到 QIANFAN_BREAKER_ERROR_RATE
+  时打开，之后 QIANFAN_BREAKER_OPEN_SECONDS 内的调用不再请求千帆，立即失败；到期后半开，
+  放行一次探测调用，成功则关闭，失败则重新打开
+
+所有拒绝都抛出 QianfanUnavailable，由 QianfanService 各方法的异常处理走本地降级结果。
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+class QianfanUnavailable(Exception):
+    """千帆调用被保护层拒绝（熔断、排队超时）或超过调用时限"""
+
+class CircuitBreaker:
+    """按最近调用失败率熔断，到期后半开探测"""
+
+    def __init__(self, window: int, error_rate: float, min_calls: int, open_seconds: float):
+        self.window = window
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = STATE_CLOSED
+        self.changed_at = time.monotonic()
+        self.opened = 0
+        self._outcomes = deque(maxlen=window)
+        self._probing = False
+
+    def allow(self) -> bool:
+        """是否放行本次调用"""
+        if self.state == STATE_OPEN:
+            if time.monotonic() - self.changed_at < self.open_seconds:
+                return False
+            self._transition(STATE_HALF_OPEN)
+        if self.state == STATE_HALF_OPEN:
+            # 半开时同一时刻只放行一次探测
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record(self, success: bool, probe: bool = False):
+        """
+        记录一次调用结果
+
+        Args:
+            probe: 是否为半开时放行的探测调用。熔断前发出、熔断后才结束的调用不影响熔断状态
+        """
+        if self.state != STATE_CLOSED:
+            if probe and self.state == STATE_HALF_OPEN:
+                self._probing = False
+                self._transition(STATE_CLOSED if success else STATE_OPEN)
+            return
+        self._outcomes.append(success)
+        if len(self._outcomes) >= self.min_calls:
+            failures = self._outcomes.count(False)
+            if failures / len(self._outcomes) >= self.error_rate:
+                self._outcomes.clear()
+                self._transition(STATE_OPEN)
+
+    def failure_rate(self) -> float:
+        return self._outcomes.count(False) / len(self._outcomes) if self._outcomes else 0.0
+
+    def _transition(self, state: str):
+        if state == STATE_OPEN:
+            self.opened += 1
+        print(f"千帆熔断器: {self.state} -> {state}")
+        self.state = state
+        self.changed_at = time.monotonic()
+
+class QianfanGuard:
+    """并发上限 + 自适应调用时限 + 熔断器，附带运行指标"""
+
+    def __init__(self, max_in_flight: int, queue_timeout: float, min_timeout: float, max_timeout: float,
+                 timeout_multiplier: float, breaker: CircuitBreaker):
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.breaker = breaker
+        self.in_flight = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._latencies = deque(maxlen=200)
+        self.counters = {
+            "calls": 0, "successes": 0, "failures": 0, "timeouts": 0, "rejected": 0, "short_circuited": 0
+        }
+
+    def timeout(self) -> float:
+        """本次调用的时限（秒）: 最近成功调用 P95 耗时的若干倍"""
+        if len(self._latencies) < 10:
+            return self.max_timeout
+        ordered = sorted(self._latencies)
+        p95 = ordered[int(len(ordered) * 0.95) - 1]
+        return min(self.max_timeout, max(self.min_timeout, p95 * self.timeout_multiplier))
+
+    async def call(self, run: Callable[[float], "asyncio.Future"]) -> Any:
+        """
+        在保护下执行一次调用
+
+        Args:
+            run: 接收调用时限（秒）、返回底层调用 Future 的函数（如 loop.run_in_executor）
+        """
+        self.counters["calls"] += 1
+        if not self.breaker.allow():
+            self.counters["short_circuited"] += 1
+            raise QianfanUnavailable(f"千帆熔断中（{self.breaker.state}），使用本地降级结果")
+        probe = self.breaker.state == STATE_HALF_OPEN
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.counters["rejected"] += 1
+            self._abort_probe(probe)
+            raise QianfanUnavailable(f"千帆并发调用已达上限（{self.max_in_flight}），使用本地降级结果")
+
+        timeout = self.timeout()
+        start = time.monotonic()
+        self.in_flight += 1
+        try:
+            future = run(timeout)
+        except BaseException:
+            self._release(None)
+            self._abort_probe(probe)
+            raise
+        # 底层调用结束（包括调用方已超时放弃的）才释放名额
+        future.add_done_callback(self._release)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            self.breaker.record(False, probe)
+            raise QianfanUnavailable(f"千帆调用超过时限（{timeout:.1f}秒）")
+        except asyncio.CancelledError:
+            self._abort_probe(probe)
+            raise
+        except Exception:
+            self.counters["failures"] += 1
+            self.breaker.record(False, probe)
+            raise
+        self._latencies.append(time.monotonic() - start)
+        self.counters["successes"] += 1
+        self.breaker.record(True, probe)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """运行指标"""
+        ordered = sorted(self._latencies)
+        return {
+            "state": self.breaker.state,
+            "state_seconds": round(time.monotonic() - self.breaker.changed_at, 1),
+            "opened": self.breaker.opened,
+            "failure_rate": round(self.breaker.failure_rate(), 3),
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "timeout_seconds": round(self.timeout(), 2),
+            "latency_p50_ms": round(ordered[len(ordered) // 2] * 1000) if ordered else None,
+            "latency_p95_ms": round(ordered[int(len(ordered) * 0.95) - 1] * 1000) if len(ordered) >= 20 else None,
+            **self.counters,
+        }
+
+    def _release(self, future: Optional[asyncio.Future]):
+        self.in_flight -= 1
+        self._slots.release()
+        if future is not None and not future.cancelled():
+            # 调用方已超时放弃时取出异常，避免 "exception was never retrieved" 警告
+            future.exception()
+
+    def _abort_probe(self, probe: bool):
+        """半开探测未得到结果（排队超时、被取消）时允许下一次探测"""
+        if probe and self.breaker.state == STATE_HALF_OPEN:
+            self.breaker._probing = False
+
+def create_guard() -> QianfanGuard:
+    """按配置创建千帆调用保护"""
+    return QianfanGuard(
+        max_in_flight=settings.QIANFAN_MAX_IN_FLIGHT,
+        queue_timeout=settings.QIANFAN_QUEUE_TIMEOUT_SECONDS,
+        min_timeout=settings.QIANFAN_MIN_TIMEOUT_SECONDS,
+        max_timeout=settings.QIANFAN_MAX_TIMEOUT_SECONDS,
+        timeout_multiplier=settings.QIANFAN_TIMEOUT_MULTIPLIER,
+        breaker=CircuitBreaker(
+            window=settings.QIANFAN_BREAKER_WINDOW,
+            error_rate=settings.QIANFAN_BREAKER_ERROR_RATE,
+            min_calls=settings.QIANFAN_BREAKER_MIN_CALLS,
+            open_seconds=settings.QIANFAN_BREAKER_OPEN_SECONDS
+        )
+    )
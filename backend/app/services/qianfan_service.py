@@ -1,10 +1,15 @@
 """
 百度千帆服务
 """
+import asyncio
+import functools
 import qianfan
 import json
-from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
 from app.core.config import settings
+from app.services.cache_service import ResponseCache, make_cache_key
+from app.services.qianfan_guard import create_guard
 
 class QianfanService:
     """千帆AI服务类"""
@@ -18,13 +23,96 @@ class QianfanService:
         
         # 创建聊天完成客户端
         self.chat_comp = qianfan.ChatCompletion()
+        
+        # SDK的do()是同步阻塞调用，统一放到有界线程池中执行，避免阻塞事件循环
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.QIANFAN_MAX_WORKERS,
+            thread_name_prefix="qianfan"
+        )
+        
+        # 响应缓存
+        self.cache = ResponseCache(
+            max_entries=settings.QIANFAN_CACHE_MAX_ENTRIES,
+            ttl=settings.QIANFAN_CACHE_TTL,
+            redis_url=settings.REDIS_URL if settings.QIANFAN_CACHE_BACKEND == "redis" else None
+        ) if settings.QIANFAN_CACHE_ENABLED else None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        
+        # 调用保护（并发上限、自适应调用时限、熔断器）
+        self.guard = create_guard() if settings.QIANFAN_GUARD_ENABLED else None
+        
+        # 模型调用次数和token用量（不含缓存命中）
+        self.usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    
+    async def _chat(self, template: str, content: str, use_cache: bool = True, **kwargs) -> Dict[str, Any]:
+        """
+        调用千帆对话接口
+        
+        相同的 规范化内容 + prompt模板 + 模型参数 直接返回缓存结果；
+        并发到达的相同请求只会调用一次模型
+        
+        Args:
+            template: prompt模板标识，参与缓存键计算
+            content: 市民反馈原文，规范化后参与缓存键计算
+            use_cache: 为False时绕过缓存直接调用模型
+        """
+        if not use_cache or self.cache is None:
+            return await self._call_model(**kwargs)
+        
+        params = {k: v for k, v in kwargs.items() if k != "messages"}
+        key = make_cache_key(template, content, **params)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._call_and_store(key, kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
     
-    async def analyze_intent(self, content: str) -> Dict[str, Any]:
+    async def _call_and_store(self, key: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """调用模型并把有效结果写入缓存"""
+        response = await self._call_model(**kwargs)
+        if response.get("result"):
+            await self.cache.set(key, response)
+        return response
+    
+    async def _call_model(self, **kwargs) -> Dict[str, Any]:
+        """
+        在线程池中调用千帆对话接口，调用期间事件循环可继续处理其他请求
+        
+        启用调用保护时经过并发上限、调用时限和熔断器，被拒绝或超时抛出 QianfanUnavailable
+        """
+        loop = asyncio.get_running_loop()
+        if self.guard is None:
+            response = await loop.run_in_executor(
+                self._executor,
+                functools.partial(self.chat_comp.do, **kwargs)
+            )
+        else:
+            # SDK内部不再重试，超时由保护层控制
+            response = await self.guard.call(lambda timeout: loop.run_in_executor(
+                self._executor,
+                functools.partial(self.chat_comp.do, retry_count=1, request_timeout=timeout, **kwargs)
+            ))
+        usage = response.get("usage") or {}
+        self.usage["calls"] += 1
+        for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            self.usage[field] += usage.get(field, 0)
+        return {
+            "result": response.get("result", ""),
+            "usage": usage
+        }
+    
+    async def analyze_intent(self, content: str, use_cache: bool = True) -> Dict[str, Any]:
         """
         分析市民诉求的意图
         
         Args:
             content: 市民反馈内容
+            use_cache: 是否使用响应缓存
             
         Returns:
             分析结果
@@ -33,7 +121,8 @@ class QianfanService:
         
         try:
             # 调用千帆API
-            response = self.chat_comp.do(
+            response = await self._chat(
+                "intent", content, use_cache,
                 model="ERNIE-Speed-128k",  # 使用ERNIE-Speed模型（注意是小写k）
                 messages=[{
                     "role": "user",
@@ -52,8 +141,67 @@ class QianfanService:
             # 返回默认结果
             return self._get_default_analysis(content)
     
-    def _build_intent_prompt(self, content: str) -> str:
-        """构建意图分析prompt"""
+    async def analyze_combined(self, content: str, use_cache: bool = True) -> Dict[str, Any]:
+        """
+        一次调用同时完成意图分析、关键词提取和解决方案生成
+        
+        Args:
+            content: 市民反馈内容
+            use_cache: 是否使用响应缓存
+            
+        Returns:
+            意图分析结果，额外包含 keywords 和 solution_suggestion 字段
+        """
+        prompt = self._build_intent_prompt(content, combined=True)
+        
+        try:
+            response = await self._chat(
+                "combined", content, use_cache,
+                model="ERNIE-Speed-128k",
+                messages=[{
+                    "role": "user",
+                    "content": prompt
+                }],
+                temperature=0.3,
+                top_p=0.8
+            )
+            result = self._parse_analysis_result(response.get("result", ""))
+        except Exception as e:
+            print(f"千帆API调用失败: {e}")
+            return self._get_default_analysis(content)
+        
+        # 模型漏填或格式不符时用本地规则补齐
+        keywords = result.get("keywords")
+        if isinstance(keywords, str):
+            keywords = [k.strip() for k in keywords.replace("，", ",").split(",") if k.strip()]
+        if not keywords:
+            keywords = self._extract_simple_keywords(content)
+        result["keywords"] = keywords[:5]
+        
+        if not result.get("solution_suggestion"):
+            result["solution_suggestion"] = "我们已收到您的反馈，将尽快安排处理。"
+        
+        return result
+    
+    def _build_intent_prompt(self, content: str, combined: bool = False) -> str:
+        """
+        构建意图分析prompt
+        
+        Args:
+            content: 市民反馈内容
+            combined: 为True时要求同时输出关键词和解决方案建议
+        """
+        extra_fields = ""
+        extra_points = ""
+        if combined:
+            extra_fields = (
+                ',\n  "keywords": ["关键词1", "关键词2", "关键词3"],'
+                '\n  "solution_suggestion": "解决方案建议"'
+            )
+            extra_points = """
+8. keywords: 提取3-5个关键词
+9. solution_suggestion: 给出2-3条可能的解决方案、预计处理时间和注意事项，不超过200字"""
+        
         return f"""你是一个政务热线工单分析专家。请仔细分析以下市民反馈，提取关键信息。
 
 市民反馈: {content}
@@ -75,7 +223,7 @@ class QianfanService:
   "summary": "一句话摘要（不超过50字）",
   "suggested_category": "工单类别",
   "suggested_department": "建议分派部门",
-  "priority": "low/medium/high"
+  "priority": "low/medium/high"{extra_fields}
 }}
 
 分析要点:
@@ -85,7 +233,7 @@ class QianfanService:
 4. summary: 简洁准确地概括问题
 5. suggested_category: 从以下类别中选择: 环境卫生/市政设施/交通出行/噪音扰民/物业管理/行政效率/其他
 6. suggested_department: 建议最合适的处理部门
-7. priority: 综合考虑紧急程度和影响范围
+7. priority: 综合考虑紧急程度和影响范围{extra_points}
 
 请直接输出JSON，不要有其他内容。"""
     
@@ -142,7 +290,8 @@ class QianfanService:
             "suggested_department": "综合服务部",
             "priority": "medium",
             "keywords": keywords,
-            "solution_suggestion": "我们已收到您的反馈，将尽快为您处理。"
+            "solution_suggestion": "我们已收到您的反馈，将尽快为您处理。",
+            "is_fallback": True
         }
     
     def _extract_simple_keywords(self, content: str) -> List[str]:
@@ -166,10 +315,100 @@ class QianfanService:
         
         return keywords[:5] if keywords else ["其他"]
     
-    async def generate_summary(self, content: str) -> str:
+    async def analyze_batch(self, contents: List[str], use_cache: bool = True) -> List[Dict[str, Any]]:
+        """
+        一次调用批量分析多条市民反馈（用于历史工单导入）
+        
+        Args:
+            contents: 市民反馈内容列表
+            use_cache: 是否使用响应缓存
+            
+        Returns:
+            与contents一一对应的分析结果，包含 keywords 和 solution_suggestion 字段；
+            模型漏掉的条目使用降级结果
+        """
+        if not contents:
+            return []
+        
+        items = []
+        try:
+            response = await self._chat(
+                "batch", "\n".join(contents), use_cache,
+                model="ERNIE-Speed-128k",
+                messages=[{
+                    "role": "user",
+                    "content": self._build_batch_prompt(contents)
+                }],
+                temperature=0.3,
+                top_p=0.8
+            )
+            items = self._parse_batch_result(response.get("result", ""))
+        except Exception as e:
+            print(f"千帆批量分析失败: {e}")
+        
+        by_index = {}
+        for item in items:
+            if isinstance(item, dict) and isinstance(item.get("index"), int):
+                by_index[item["index"]] = item
+        
+        results = []
+        for i, content in enumerate(contents, start=1):
+            item = by_index.get(i)
+            if item is None:
+                results.append(self._get_default_analysis(content))
+                continue
+            item.pop("index", None)
+            keywords = item.get("keywords")
+            if isinstance(keywords, str):
+                keywords = [k.strip() for k in keywords.replace("，", ",").split(",") if k.strip()]
+            item["keywords"] = (keywords or self._extract_simple_keywords(content))[:5]
+            item.setdefault("solution_suggestion", "我们已收到您的反馈，将尽快安排处理。")
+            results.append(item)
+        return results
+    
+    def _build_batch_prompt(self, contents: List[str]) -> str:
+        """构建批量分析prompt"""
+        numbered = "\n".join(f"{i}. {content}" for i, content in enumerate(contents, start=1))
+        return f"""你是一个政务热线工单分析专家。请逐条分析以下{len(contents)}条市民反馈。
+
+{numbered}
+
+请严格按照以下JSON数组格式输出，每条反馈对应一个对象，index为反馈序号（不要包含任何其他文字）：
+[
+  {{
+    "index": 1,
+    "summary": "一句话摘要（不超过50字）",
+    "suggested_category": "工单类别",
+    "suggested_department": "建议分派部门",
+    "priority": "low/medium/high",
+    "sentiment": {{"type": "positive/neutral/negative", "intensity": 0.75, "urgency": "low/medium/high"}},
+    "entities": {{"location": "位置信息"}},
+    "keywords": ["关键词1", "关键词2", "关键词3"],
+    "solution_suggestion": "解决方案建议（不超过100字）"
+  }}
+]
+
+suggested_category 从以下类别中选择: 环境卫生/市政设施/交通出行/噪音扰民/物业管理/行政效率/其他
+
+请直接输出JSON数组，不要有其他内容。"""
+    
+    def _parse_batch_result(self, result_text: str) -> List[Dict[str, Any]]:
+        """解析批量分析结果"""
+        try:
+            json_start = result_text.find('[')
+            json_end = result_text.rfind(']') + 1
+            if json_start >= 0 and json_end > json_start:
+                return json.loads(result_text[json_start:json_end])
+            raise ValueError("未找到有效的JSON数组")
+        except Exception as e:
+            print(f"解析批量结果失败: {e}")
+            return []
+    
+    async def generate_summary(self, content: str, use_cache: bool = True) -> str:
         """生成工单摘要"""
         try:
-            response = self.chat_comp.do(
+            response = await self._chat(
+                "summary", content, use_cache,
                 model="ERNIE-Speed-128k",
                 messages=[{
                     "role": "user",
@@ -181,10 +420,11 @@ class QianfanService:
         except:
             return content[:50] + "..." if len(content) > 50 else content
     
-    async def extract_keywords(self, content: str) -> List[str]:
+    async def extract_keywords(self, content: str, use_cache: bool = True) -> List[str]:
         """提取关键词"""
         try:
-            response = self.chat_comp.do(
+            response = await self._chat(
+                "keywords", content, use_cache,
                 model="ERNIE-Speed-128k",
                 messages=[{
                     "role": "user",
@@ -198,14 +438,22 @@ class QianfanService:
         except:
             return self._extract_simple_keywords(content)
     
-    async def generate_solution(self, content: str, category: str) -> str:
-        """生成解决方案建议"""
+    async def generate_solution(self, content: str, category: Optional[str] = None,
+                                use_cache: bool = True) -> str:
+        """
+        生成解决方案建议
+        
+        Args:
+            content: 市民反馈内容
+            category: 问题类别，为空时由模型根据描述自行判断，便于与意图分析并发执行
+            use_cache: 是否使用响应缓存
+        """
         try:
+            category_line = f"问题类别：{category}\n" if category else ""
             prompt = f"""
 作为政务热线专家，请为以下问题提供专业的解决方案建议：
 
-问题类别：{category}
-问题描述：{content}
+{category_line}问题描述：{content}
 
 请提供：
 1. 可能的解决方案（2-3条）
@@ -214,7 +462,8 @@ class QianfanService:
 
 用简洁专业的语言回答，不超过200字。
 """
-            response = self.chat_comp.do(
+            response = await self._chat(
+                f"solution:{category or ''}", content, use_cache,
                 model="ERNIE-Speed-128k",
                 messages=[{
                     "role": "user",
@@ -230,76 +479,9 @@ class QianfanService:
                 "噪音扰民": "建议：1. 核实施工许可证 2. 限制施工时间 3. 加强现场监管",
                 "交通出行": "建议：1. 优化交通组织方案 2. 增设交通标识 3. 加强现场疏导"
             }
+            if not category:
+                category = self._extract_simple_keywords(content)[0]
             return solutions.get(category, "我们已收到您的反馈，将尽快安排处理。")
-    
-    async def find_similar_tickets(self, content: str, existing_tickets: List[Dict]) -> List[Dict]:
-        """查找相似工单"""
-        # 简单的文本相似度匹配
-        similar = []
-        keywords = set(self._extract_simple_keywords(content))
-        
-        for ticket in existing_tickets:
-            ticket_keywords = set(self._extract_simple_keywords(ticket.get("content", "")))
-            # 计算关键词交集
-            intersection = keywords & ticket_keywords
-            if len(intersection) >= 1:
-                similarity = len(intersection) / len(keywords | ticket_keywords)
-                if similarity > 0.3:
-                    similar.append({
-                        "ticket": ticket,
-                        "similarity": round(similarity, 2)
-                    })
-        
-        # 按相似度排序
-        similar.sort(key=lambda x: x["similarity"], reverse=True)
-        return similar[:5]
-    
-    async def analyze_trends(self, tickets_data: List[Dict]) -> Dict[str, Any]:
-        """分析趋势和生成预警"""
-        # 统计分析
-        category_count = {}
-        location_count = {}
-        
-        for ticket in tickets_data:
-            # 类别统计
-            category = ticket.get("category", "其他")
-            category_count[category] = category_count.get(category, 0) + 1
-            
-            # 地点统计
-            location = ticket.get("location_district", "未知")
-            location_count[location] = location_count.get(location, 0) + 1
-        
-        # 生成预警
-        alerts = []
-        
-        # 检查类别激增
-        for category, count in category_count.items():
-            if count > 10:  # 简单阈值
-                alerts.append({
-                    "type": "category_surge",
-                    "level": "high" if count > 20 else "medium",
-                    "title": f"{category}类工单数量较多",
-                    "description": f"近期{category}类工单达到{count}件，建议重点关注",
-                    "data": {"category": category, "count": count}
-                })
-        
-        # 检查地点集中
-        for location, count in location_count.items():
-            if count > 5:
-                alerts.append({
-                    "type": "location_concentration",
-                    "level": "medium",
-                    "title": f"{location}区域问题集中",
-                    "description": f"{location}区域工单数量达到{count}件",
-                    "data": {"location": location, "count": count}
-                })
-        
-        return {
-            "category_statistics": category_count,
-            "location_statistics": location_count,
-            "alerts": alerts,
-            "total_analyzed": len(tickets_data)
-        }
 
 # 创建全局实例
 qianfan_service = QianfanService()
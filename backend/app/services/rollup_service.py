@@ -0,0 +1,228 @@
+"""
+工单统计日汇总
+
+数据大屏的统计接口不再扫描原始工单，而是读取预聚合的 ticket_rollups 表:
+- 按 日期×类别×区域×部门×状态×情绪×优先级 维护工单数，以及响应时间、情绪分数的合计与计数
+  （与原统计口径一致，值为0的不计入平均）
+- 通过 ORM 写入事件在同一事务内增量维护：创建 +1，删除 -1，维度变化时旧组合 -1、新组合 +1
+- 统计窗口仍为最近 N×24 小时: 窗口起点所在的那一天只统计起点之后的部分，这部分直接查询原始工单
+  （按创建时间索引，最多一天的工单），其余整天读取汇总表
+- 查询代价只与时间窗口内的维度组合数和一天的工单量有关，与历史工单总量无关
+
+绕过ORM直接写 tickets 表（如批量SQL修复数据）后需要重建（在backend目录下）:
+    python -m app.services.rollup_service rebuild
+"""
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import case, delete, event, func, inspect, insert, literal, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+from app.models.ticket import AnalyticsRecord, Ticket, TicketRollup
+
+# 汇总维度: 汇总表列名 -> 工单列
+DIMENSIONS = {
+    "category": Ticket.category,
+    "district": Ticket.location_district,
+    "department": Ticket.department,
+    "status": Ticket.status,
+    "sentiment": Ticket.sentiment,
+    "priority": Ticket.priority,
+}
+# 影响汇总的工单字段
+TRACKED_FIELDS = ("created_at", "category", "location_district", "department", "status",
+                  "sentiment", "priority", "response_time", "sentiment_score")
+
+MEASURES = ("ticket_count", "response_time_sum", "response_time_count",
+            "sentiment_score_sum", "sentiment_score_count")
+
+RollupTotals = namedtuple("RollupTotals", ("keys",) + MEASURES)
+
+def window_start(days: int) -> datetime:
+    """统计窗口起点（最近 days×24 小时）"""
+    return datetime.now() - timedelta(days=days)
+
+def _edge_day_rows(db: Session, start: datetime, dimensions: tuple) -> list:
+    """窗口起点所在那一天中起点之后的工单，按维度直接从原始工单汇总"""
+    edge_day = start.date()
+    columns = [
+        literal(edge_day).label("day") if name == "day" else func.coalesce(DIMENSIONS[name], "").label(name)
+        for name in dimensions
+    ]
+    return db.query(
+        *columns,
+        func.count(),
+        func.sum(func.coalesce(Ticket.response_time, 0)),
+        func.sum(case((Ticket.response_time != 0, 1), else_=0)),
+        func.sum(func.coalesce(Ticket.sentiment_score, 0)),
+        func.sum(case((Ticket.sentiment_score != 0, 1), else_=0)),
+    ).filter(
+        Ticket.created_at >= start,
+        Ticket.created_at < datetime.combine(edge_day + timedelta(days=1), time.min)
+    ).group_by(*columns).all()
+
+def query_rollups(db: Session, days: int, *dimensions: str) -> List[RollupTotals]:
+    """
+    按指定维度汇总最近 days×24 小时的统计值
+
+    Args:
+        dimensions: 汇总表维度列名，如 "category"、"status"，"day" 表示按日期
+
+    Returns:
+        RollupTotals 列表，keys 为维度取值元组（空维度还原为None）
+    """
+    start = window_start(days)
+    columns = [getattr(TicketRollup, name) for name in dimensions]
+    rows = db.query(
+        *columns,
+        *(func.sum(getattr(TicketRollup, measure)) for measure in MEASURES)
+    ).filter(
+        TicketRollup.day > start.date()
+    ).group_by(*columns).all()
+
+    totals: Dict[tuple, List[Any]] = {}
+    for row in list(rows) + _edge_day_rows(db, start, dimensions):
+        keys = tuple(value if value != "" else None for value in row[:len(columns)])
+        measures = totals.setdefault(keys, [0] * len(MEASURES))
+        for i, value in enumerate(row[len(columns):]):
+            measures[i] += value or 0
+    return [RollupTotals(keys, *measures) for keys, measures in totals.items()]
+
+def _measures(response_time, sentiment_score) -> Dict[str, Any]:
+    return {
+        "ticket_count": 1,
+        "response_time_sum": response_time or 0,
+        "response_time_count": 1 if response_time else 0,
+        "sentiment_score_sum": sentiment_score or 0,
+        "sentiment_score_count": 1 if sentiment_score else 0,
+    }
+
+def _rollup_key(values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    created_at = values["created_at"]
+    if created_at is None:
+        return None
+    key = {"day": created_at.date() if isinstance(created_at, datetime) else created_at}
+    for name, column in DIMENSIONS.items():
+        key[name] = values[column.key] or ""
+    return key
+
+def _load_values(connection: Connection, ticket_id: int) -> Optional[Dict[str, Any]]:
+    """从数据库读取工单当前的汇总相关字段"""
+    row = connection.execute(
+        select(*(getattr(Ticket, field) for field in TRACKED_FIELDS)).where(Ticket.id == ticket_id)
+    ).first()
+    return dict(zip(TRACKED_FIELDS, row)) if row else None
+
+def _apply(connection: Connection, values: Optional[Dict[str, Any]], sign: int):
+    """把一张工单计入（sign=1）或移出（sign=-1）汇总"""
+    key = _rollup_key(values) if values else None
+    if key is None:
+        return
+    delta = {k: v * sign for k, v in _measures(values["response_time"], values["sentiment_score"]).items()}
+    match = [getattr(TicketRollup, name) == value for name, value in key.items()]
+    increment = update(TicketRollup).where(*match).values(
+        {getattr(TicketRollup, name): getattr(TicketRollup, name) + value for name, value in delta.items()}
+    )
+
+    if connection.execute(increment).rowcount:
+        if sign < 0:
+            connection.execute(delete(TicketRollup).where(*match, TicketRollup.ticket_count <= 0))
+        return
+    if sign < 0:
+        return
+
+    if connection.dialect.name == "sqlite":
+        # SQLite写入串行，不会有并发插入同一组合
+        connection.execute(insert(TicketRollup).values(**key, **delta))
+        return
+    try:
+        with connection.begin_nested():
+            connection.execute(insert(TicketRollup).values(**key, **delta))
+    except IntegrityError:
+        # 并发事务已插入同一组合
+        connection.execute(increment)
+
+@event.listens_for(Ticket, "after_insert")
+def _rollup_inserted(mapper, connection, target):
+    # created_at 由数据库生成，从库中读取
+    _apply(connection, _load_values(connection, target.id), 1)
+
+@event.listens_for(Ticket, "before_update")
+def _rollup_updated(mapper, connection, target):
+    state = inspect(target)
+    changed = {
+        field: state.attrs[field].history.added[0]
+        for field in TRACKED_FIELDS
+        if state.attrs[field].history.added
+    }
+    if not changed:
+        return
+    old = _load_values(connection, target.id)
+    if old is None:
+        return
+    new = dict(old, **changed)
+    if new == old:
+        return
+    _apply(connection, old, -1)
+    _apply(connection, new, 1)
+
+@event.listens_for(Ticket, "before_delete")
+def _rollup_deleted(mapper, connection, target):
+    _apply(connection, _load_values(connection, target.id), -1)
+
+def rebuild() -> int:
+    """从工单表全量重建汇总，返回汇总行数"""
+    response_time = case((Ticket.response_time != 0, Ticket.response_time))
+    sentiment_score = case((Ticket.sentiment_score != 0, Ticket.sentiment_score))
+    dimensions = [func.coalesce(column, "") for column in DIMENSIONS.values()]
+    day = func.date(Ticket.created_at)
+    source = select(
+        day,
+        *dimensions,
+        func.count(Ticket.id),
+        func.coalesce(func.sum(response_time), 0),
+        func.count(response_time),
+        func.coalesce(func.sum(sentiment_score), 0),
+        func.count(sentiment_score)
+    ).where(
+        Ticket.created_at.isnot(None)
+    ).group_by(day, *dimensions)
+
+    db = SessionLocal()
+    try:
+        db.execute(delete(TicketRollup))
+        db.execute(insert(TicketRollup).from_select(["day", *DIMENSIONS, *MEASURES], source))
+        rows = db.query(TicketRollup).count()
+        tickets = db.query(func.coalesce(func.sum(TicketRollup.ticket_count), 0)).scalar()
+        db.add(AnalyticsRecord(
+            analysis_type="rollup_rebuild",
+            time_range="all",
+            result={"rows": rows, "tickets": tickets}
+        ))
+        db.commit()
+        return rows
+    finally:
+        db.close()
+
+def ensure_built():
+    """汇总表为空而已有工单时（首次部署或新建表）自动重建"""
+    db = SessionLocal()
+    try:
+        empty = db.query(TicketRollup.id).first() is None
+        has_tickets = db.query(Ticket.id).first() is not None
+    finally:
+        db.close()
+    if empty and has_tickets:
+        rebuild()
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("用法: python -m app.services.rollup_service rebuild")
+        sys.exit(1)
+    print(f"已重建统计汇总，共 {rebuild()} 行")
@@ -0,0 +1,192 @@
+"""
+工单全文检索索引
+
+基于 SQLite FTS5 建立 content / summary / keywords 的倒排索引:
+- 中文没有空格分词，入库前把连续的中日韩字符切分为重叠的二元组（"垃圾清理" -> "垃圾 圾清 清理"），
+  查询词按同样方式切分后作为短语匹配，等价于子串匹配但走索引
+- 通过 ORM 写入事件在同一事务内同步索引，创建/更新/删除工单时自动维护
+- 使用 bm25 排序，摘要和关键词权重高于正文
+
+非SQLite数据库不启用索引，检索退化为 LIKE 匹配。
+
+重建索引（在backend目录下）:
+    python -m app.services.search_index rebuild
+"""
+import re
+import unicodedata
+from typing import List, Optional
+
+from sqlalchemy import event, inspect, text, Integer, Float
+from sqlalchemy.engine import Engine
+
+from app.models.ticket import Ticket
+
+FTS_TABLE = "ticket_search"
+INDEXED_FIELDS = ("content", "summary", "keywords")
+# bm25 列权重: content, summary, keywords
+BM25_WEIGHTS = (1.0, 2.0, 1.5)
+
+# 中日韩统一表意文字、日文假名、韩文音节
+_CJK = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af"
+_CJK_RUN = re.compile(f"[{_CJK}]+")
+_TOKEN = re.compile(f"[{_CJK}]+|[0-9a-z]+")
+
+_enabled = False
+
+def is_enabled() -> bool:
+    """当前数据库是否启用了全文索引"""
+    return _enabled
+
+def _bigrams(run: str) -> List[str]:
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+def tokenize(value: Optional[str]) -> str:
+    """把文本切分为索引词，中日韩字符按二元组切分，字母数字按单词切分"""
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFKC", value).lower()
+    tokens = []
+    for match in _TOKEN.finditer(value):
+        run = match.group()
+        tokens.extend(_bigrams(run) if _CJK_RUN.fullmatch(run) else [run])
+    return " ".join(tokens)
+
+def build_match_query(keyword: str) -> Optional[str]:
+    """
+    把用户输入的检索词转换为 FTS5 MATCH 表达式
+
+    空格分隔的多个词按 AND 组合；无法走索引（如单个汉字）时返回None
+    """
+    terms = []
+    for term in unicodedata.normalize("NFKC", keyword).lower().split():
+        for match in _TOKEN.finditer(term):
+            run = match.group()
+            if _CJK_RUN.fullmatch(run):
+                if len(run) < 2:
+                    return None
+                terms.append('"' + " ".join(_bigrams(run)) + '"')
+            else:
+                terms.append('"' + run + '"')
+    return " AND ".join(terms) if terms else None
+
+def search_subquery(match: str):
+    """返回 (rowid, score) 子查询，score越小越相关"""
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    return text(
+        f"SELECT rowid, bm25({FTS_TABLE}, {weights}) AS score "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"
+    ).bindparams(match=match).columns(rowid=Integer, score=Float).subquery("search_hits")
+
+def highlight(ticket: Ticket, keyword: str, width: int = 30) -> Optional[str]:
+    """在摘要或正文中截取包含检索词的片段，命中部分用<mark>标记"""
+    terms = [t for t in unicodedata.normalize("NFKC", keyword).split() if t]
+    if not terms:
+        return None
+    pattern = re.compile("|".join(re.escape(t) for t in terms), re.IGNORECASE)
+    for value in (ticket.summary, ticket.content, ticket.keywords):
+        if not value:
+            continue
+        match = pattern.search(value)
+        if not match:
+            continue
+        start = max(0, match.start() - width)
+        end = min(len(value), match.end() + width)
+        snippet = pattern.sub(lambda m: f"<mark>{m.group()}</mark>", value[start:end])
+        return ("..." if start > 0 else "") + snippet + ("..." if end < len(value) else "")
+    return None
+
+def ensure_schema(engine: Engine):
+    """创建全文索引表；新建时为已有工单补建索引"""
+    global _enabled
+    if engine.dialect.name != "sqlite":
+        _enabled = False
+        return
+
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE}
+        ).first()
+        if not exists:
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                f"{', '.join(INDEXED_FIELDS)}, tokenize = 'unicode61')"
+            ))
+    _enabled = True
+    if not exists:
+        rebuild(engine)
+
+def rebuild(engine: Engine, batch_size: int = 1000) -> int:
+    """全量重建索引，返回索引的工单数"""
+    total = 0
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                text("SELECT id, content, summary, keywords FROM tickets "
+                     "WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": batch_size}
+            ).all()
+            if not rows:
+                break
+            conn.execute(
+                text(f"INSERT INTO {FTS_TABLE}(rowid, content, summary, keywords) "
+                     f"VALUES (:id, :content, :summary, :keywords)"),
+                [{"id": r.id, "content": tokenize(r.content), "summary": tokenize(r.summary),
+                  "keywords": tokenize(r.keywords)} for r in rows]
+            )
+            total += len(rows)
+            last_id = rows[-1].id
+    return total
+
+def _index_params(target: Ticket) -> dict:
+    return {
+        "id": target.id,
+        "content": tokenize(target.content),
+        "summary": tokenize(target.summary),
+        "keywords": tokenize(target.keywords)
+    }
+
+@event.listens_for(Ticket, "after_insert")
+def _index_inserted(mapper, connection, target):
+    if _enabled:
+        connection.execute(
+            text(f"INSERT INTO {FTS_TABLE}(rowid, content, summary, keywords) "
+                 f"VALUES (:id, :content, :summary, :keywords)"),
+            _index_params(target)
+        )
+
+@event.listens_for(Ticket, "after_update")
+def _index_updated(mapper, connection, target):
+    if not _enabled:
+        return
+    state = inspect(target)
+    if not any(state.attrs[field].history.has_changes() for field in INDEXED_FIELDS):
+        return
+    connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": target.id})
+    connection.execute(
+        text(f"INSERT INTO {FTS_TABLE}(rowid, content, summary, keywords) "
+             f"VALUES (:id, :content, :summary, :keywords)"),
+        _index_params(target)
+    )
+
+@event.listens_for(Ticket, "after_delete")
+def _index_deleted(mapper, connection, target):
+    if _enabled:
+        connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": target.id})
+
+if __name__ == "__main__":
+    import sys
+    from app.db.database import engine
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("用法: python -m app.services.search_index rebuild")
+        sys.exit(1)
+    ensure_schema(engine)
+    if not is_enabled():
+        print("当前数据库不是SQLite，未启用全文索引")
+        sys.exit(1)
+    print(f"已重建索引，共 {rebuild(engine)} 条工单")
@@ -0,0 +1,280 @@
+"""
+工单相似度检索
+
+为每张工单生成紧凑的文本向量，不依赖网络:
+- 特征为字符一元/二元/三元组，经哈希投影到固定维度（带符号哈希减少冲突偏差），
+  词频取对数后做L2归一化，向量点积即余弦相似度
+- 向量在工单写入时计算，通过 ORM 写入事件在同一事务内存入 ticket_vectors 表（float16，连同维度）；
+  修改 SIMILARITY_DIM 后，维度不一致的向量在加载时删除并按新维度重算
+- 查询时使用内存中的 NumPy 矩阵做暴力点积检索，数十万工单也只需毫秒级；
+  事务提交后增量更新内存索引，首次查询时从数据库加载，缺失的向量自动补算
+
+重建全部向量（在backend目录下）:
+    python -m app.services.similarity_index rebuild
+"""
+import math
+import re
+import threading
+import unicodedata
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event, func, inspect, or_, select, delete
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.ticket import Ticket, TicketVector
+
+# n元组权重：单字信息量低，权重较小
+NGRAM_WEIGHTS = {1: 0.3, 2: 1.0, 3: 1.0}
+
+_NON_TEXT = re.compile(r"[^\w]+")
+
+def embed(text: Optional[str], dim: int = None) -> np.ndarray:
+    """把文本转换为L2归一化的哈希向量"""
+    dim = dim or settings.SIMILARITY_DIM
+    vector = np.zeros(dim, dtype=np.float32)
+    value = _NON_TEXT.sub("", unicodedata.normalize("NFKC", text or "").lower())
+    if not value:
+        return vector
+
+    for n, weight in NGRAM_WEIGHTS.items():
+        counts = Counter(value[i:i + n] for i in range(len(value) - n + 1))
+        for gram, count in counts.items():
+            h = zlib.crc32(gram.encode("utf-8"))
+            sign = 1.0 if h & 0x80000000 else -1.0
+            vector[h % dim] += sign * weight * (1.0 + math.log(count))
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+def to_bytes(vector: np.ndarray) -> bytes:
+    return vector.astype(np.float16).tobytes()
+
+def from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.float16).astype(np.float32)
+
+def _vector_row(ticket_id: int, vector: np.ndarray) -> dict:
+    return {"ticket_id": ticket_id, "vector": to_bytes(vector), "dim": len(vector)}
+
+class VectorIndex:
+    """内存向量索引，支持增量增删和top-k检索"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._rows: Dict[int, int] = {}
+        self._size = 0
+        self._loaded = False
+        self._loading = False
+        self._pending: List[Tuple[int, Optional[np.ndarray]]] = []
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def ensure_loaded(self):
+        """首次使用时从数据库加载全部向量，并补算缺失的向量"""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            with self._lock:
+                self._loading = True
+            try:
+                dropped = drop_mismatched_vectors(self.dim)
+                if dropped:
+                    print(f"相似度检索: {dropped} 条向量维度与当前配置（{self.dim}）不一致，已删除并重新计算")
+                backfill_vectors()
+                skipped = 0
+                db = SessionLocal()
+                try:
+                    result = db.execute(
+                        select(TicketVector.ticket_id, TicketVector.vector)
+                    ).yield_per(5000)
+                    for ticket_id, data in result:
+                        vector = from_bytes(data)
+                        # 其他进程仍按旧维度写入的向量
+                        if len(vector) != self.dim:
+                            skipped += 1
+                            continue
+                        with self._lock:
+                            self._put(ticket_id, vector)
+                finally:
+                    db.close()
+                if skipped:
+                    print(f"相似度检索: 跳过 {skipped} 条维度不一致的向量")
+            finally:
+                with self._lock:
+                    self._loading = False
+                    self._loaded = True
+                    # 加载期间提交的变更
+                    for ticket_id, vector in self._pending:
+                        self._apply(ticket_id, vector)
+                    self._pending.clear()
+
+    def apply(self, ticket_id: int, vector: Optional[np.ndarray]):
+        """应用一次已提交的变更，vector为None表示删除"""
+        with self._lock:
+            if self._loading:
+                self._pending.append((ticket_id, vector))
+            elif self._loaded:
+                self._apply(ticket_id, vector)
+
+    def get(self, ticket_id: int) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._rows.get(ticket_id)
+            return None if row is None else self._matrix[row].copy()
+
+    def search(self, vector: np.ndarray, k: int, exclude_id: Optional[int] = None,
+               min_score: float = 0.0) -> List[Tuple[int, float]]:
+        """返回与vector最相似的k个(工单ID, 相似度)"""
+        with self._lock:
+            if self._size == 0:
+                return []
+            scores = self._matrix[:self._size] @ vector
+            ids = self._ids[:self._size]
+            fetch = min(k + 1, self._size)
+            top = np.argpartition(-scores, fetch - 1)[:fetch]
+            top = top[np.argsort(-scores[top])]
+            results = []
+            for row in top:
+                ticket_id = int(ids[row])
+                score = float(scores[row])
+                if ticket_id == exclude_id or score < min_score:
+                    continue
+                results.append((ticket_id, score))
+            return results[:k]
+
+    def _apply(self, ticket_id: int, vector: Optional[np.ndarray]):
+        if vector is None:
+            self._remove(ticket_id)
+        else:
+            self._put(ticket_id, vector)
+
+    def _put(self, ticket_id: int, vector: np.ndarray):
+        row = self._rows.get(ticket_id)
+        if row is None:
+            if self._size == len(self._matrix):
+                capacity = max(1024, len(self._matrix) * 2)
+                matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+                matrix[:self._size] = self._matrix[:self._size]
+                ids = np.zeros(capacity, dtype=np.int64)
+                ids[:self._size] = self._ids[:self._size]
+                self._matrix, self._ids = matrix, ids
+            row = self._size
+            self._size += 1
+            self._rows[ticket_id] = row
+            self._ids[row] = ticket_id
+        self._matrix[row] = vector
+
+    def _remove(self, ticket_id: int):
+        row = self._rows.pop(ticket_id, None)
+        if row is None:
+            return
+        # 用最后一行填补空位
+        last = self._size - 1
+        if row != last:
+            last_id = int(self._ids[last])
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = last_id
+            self._rows[last_id] = row
+        self._size -= 1
+
+def drop_mismatched_vectors(dim: int) -> int:
+    """删除维度与 dim 不一致的向量（之后由 backfill_vectors 重算），返回删除数量"""
+    db = SessionLocal()
+    try:
+        deleted = db.execute(delete(TicketVector).where(or_(
+            TicketVector.dim != dim,
+            # 记录维度之前写入的向量按字节数判断（float16每维2字节）
+            TicketVector.dim.is_(None) & (func.length(TicketVector.vector) != dim * 2)
+        ))).rowcount
+        db.execute(TicketVector.__table__.update().where(TicketVector.dim.is_(None)).values(dim=dim))
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+def backfill_vectors(batch_size: int = 1000) -> int:
+    """为还没有向量的工单补算向量，返回补算数量"""
+    total = 0
+    db = SessionLocal()
+    try:
+        while True:
+            rows = db.execute(
+                select(Ticket.id, Ticket.content)
+                .outerjoin(TicketVector, TicketVector.ticket_id == Ticket.id)
+                .where(TicketVector.ticket_id.is_(None))
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            db.execute(TicketVector.__table__.insert(), [
+                _vector_row(ticket_id, embed(content)) for ticket_id, content in rows
+            ])
+            db.commit()
+            total += len(rows)
+    finally:
+        db.close()
+    return total
+
+def _queue_change(target: Ticket, vector: Optional[np.ndarray]):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("vector_changes", []).append((target.id, vector))
+
+@event.listens_for(Ticket, "after_insert")
+def _vector_inserted(mapper, connection, target):
+    vector = embed(target.content)
+    connection.execute(TicketVector.__table__.insert(), _vector_row(target.id, vector))
+    _queue_change(target, vector)
+
+@event.listens_for(Ticket, "after_update")
+def _vector_updated(mapper, connection, target):
+    if not inspect(target).attrs.content.history.has_changes():
+        return
+    vector = embed(target.content)
+    connection.execute(delete(TicketVector).where(TicketVector.ticket_id == target.id))
+    connection.execute(TicketVector.__table__.insert(), _vector_row(target.id, vector))
+    _queue_change(target, vector)
+
+@event.listens_for(Ticket, "after_delete")
+def _vector_deleted(mapper, connection, target):
+    connection.execute(delete(TicketVector).where(TicketVector.ticket_id == target.id))
+    _queue_change(target, None)
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session):
+    for ticket_id, vector in session.info.pop("vector_changes", []):
+        vector_index.apply(ticket_id, vector)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop("vector_changes", None)
+
+# 创建全局实例
+vector_index = VectorIndex(settings.SIMILARITY_DIM)
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("用法: python -m app.services.similarity_index rebuild")
+        sys.exit(1)
+    db = SessionLocal()
+    try:
+        db.execute(delete(TicketVector))
+        db.commit()
+    finally:
+        db.close()
+    print(f"已重建向量，共 {backfill_vectors()} 条工单")
@@ -0,0 +1,122 @@
+"""
+工单变更事件
+
+ORM 写入事件中记录本事务内新增/更新/删除的工单，事务提交后:
+- 递增进程内数据版本号，缓存以版本号为键的一部分，工单写入后旧结果自动失效
+- 把本事务的变更列表通知给订阅者
+事务回滚时丢弃记录。批量更新（Query.update）没有逐条工单的事件，只递增版本号。
+
+另在数据库 data_versions 表中维护持久化的数据版本号，与工单写入在同一事务中递增，
+其他进程（多个 worker、独立运行的导入）的写入同样可见，供条件请求（ETag）使用。
+写入工单的进程需导入本模块以注册事件。
+"""
+import threading
+import time
+from collections import namedtuple
+from typing import Callable, List
+
+from sqlalchemy import event, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, object_session
+
+from app.db.database import async_read_engine
+from app.models.ticket import DataVersion, Ticket
+
+TICKET_CREATED = "created"
+TICKET_UPDATED = "updated"
+TICKET_DELETED = "deleted"
+
+TicketEvent = namedtuple("TicketEvent", ("action", "ticket_id"))
+
+VERSION_NAME = "tickets"
+
+_lock = threading.Lock()
+_version = 0
+_subscribers: List[Callable[[List[TicketEvent]], None]] = []
+
+def data_version() -> int:
+    """当前数据版本号，每次提交工单变更后递增"""
+    return _version
+
+async def persisted_version() -> int:
+    """数据库中的工单数据版本号（跨进程），尚无写入时为0"""
+    async with async_read_engine.connect() as conn:
+        version = await conn.scalar(select(DataVersion.version).where(DataVersion.name == VERSION_NAME))
+    return version or 0
+
+def subscribe(callback: Callable[[List[TicketEvent]], None]):
+    """订阅已提交的工单变更，回调在提交事务的线程中同步执行，应尽快返回"""
+    _subscribers.append(callback)
+
+def _record(target: Ticket, action: str):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("ticket_events", []).append(TicketEvent(action, target.id))
+
+@event.listens_for(Ticket, "after_insert")
+def _ticket_inserted(mapper, connection, target):
+    _record(target, TICKET_CREATED)
+
+@event.listens_for(Ticket, "after_update")
+def _ticket_updated(mapper, connection, target):
+    _record(target, TICKET_UPDATED)
+
+@event.listens_for(Ticket, "after_delete")
+def _ticket_deleted(mapper, connection, target):
+    _record(target, TICKET_DELETED)
+
+def _bump_persisted(connection: Connection):
+    """在当前事务中递增持久化版本号；首次写入时以当前毫秒时间戳为初值，重建数据库后不会与旧版本号重复"""
+    bumped = connection.execute(
+        update(DataVersion).where(DataVersion.name == VERSION_NAME).values(version=DataVersion.version + 1)
+    ).rowcount
+    if bumped:
+        return
+    try:
+        with connection.begin_nested():
+            connection.execute(DataVersion.__table__.insert().values(
+                name=VERSION_NAME, version=int(time.time() * 1000)
+            ))
+    except IntegrityError:
+        # 其他进程同时插入了初始行
+        _bump_persisted(connection)
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_flush(session, flush_context):
+    if session.info.get("ticket_events") and not session.info.get("ticket_version_bumped"):
+        _bump_persisted(session.connection())
+        session.info["ticket_version_bumped"] = True
+
+@event.listens_for(Session, "after_bulk_update")
+def _bump_on_bulk_update(update_context):
+    if update_context.mapper.class_ is Ticket and update_context.result.rowcount:
+        session = update_context.session
+        if not session.info.get("ticket_version_bumped"):
+            _bump_persisted(session.connection())
+            session.info["ticket_version_bumped"] = True
+        session.info["ticket_bulk_changed"] = True
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session):
+    global _version
+    session.info.pop("ticket_version_bumped", None)
+    events = session.info.pop("ticket_events", None)
+    bulk_changed = session.info.pop("ticket_bulk_changed", False)
+    if not events and not bulk_changed:
+        return
+    with _lock:
+        _version += 1
+    if not events:
+        return
+    for callback in _subscribers:
+        try:
+            callback(events)
+        except Exception as e:
+            print(f"工单变更事件处理失败: {e}")
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop("ticket_events", None)
+    session.info.pop("ticket_version_bumped", None)
+    session.info.pop("ticket_bulk_changed", None)
@@ -0,0 +1,53 @@
+"""
+工单筛选条件
+
+工单搜索和数据导出共用同一组筛选参数
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import HTTPException
+
+from app.models.ticket import Ticket
+
+def _parse_date(value: str, name: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} 不是有效的ISO日期: {value}")
+
+def ticket_filters(
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+) -> List:
+    """
+    把筛选参数转换为查询条件，未提供的参数不做限制
+    
+    Args:
+        start_date / end_date: ISO格式日期或时间，按创建时间闭区间筛选
+    
+    Returns:
+        可直接传给 select().where(*conditions) 的条件列表
+    """
+    conditions = []
+    
+    if category:
+        conditions.append(Ticket.category == category)
+    
+    if status:
+        conditions.append(Ticket.status == status)
+    
+    if priority:
+        conditions.append(Ticket.priority == priority)
+    
+    # 时间范围过滤
+    if start_date:
+        conditions.append(Ticket.created_at >= _parse_date(start_date, "start_date"))
+    
+    if end_date:
+        conditions.append(Ticket.created_at <= _parse_date(end_date, "end_date"))
+    
+    return conditions
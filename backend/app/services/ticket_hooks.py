@@ -0,0 +1,84 @@
+"""
+工单生命周期钩子
+
+ORM 写入事件中记录本事务内的生命周期事件，事务提交后按事件类型调用注册的处理函数:
+- ticket_created: 新建工单
+- status_changed: 工单状态变更（含原状态）
+- comment_created: 工单新增评论（含工单的提交人）
+事务回滚时丢弃记录。处理函数在提交事务的线程中同步执行，应尽快返回（耗时操作转交后台）。
+
+批量导入历史工单等不应通知市民的写入，在会话上设置 session.info[SUPPRESS_NOTIFICATIONS] = True，
+该会话内不记录生命周期事件。
+"""
+from collections import namedtuple
+from typing import Callable, Dict, List
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+
+from app.models.ticket import Ticket
+from app.models.user import Comment
+
+TICKET_CREATED = "ticket_created"
+STATUS_CHANGED = "status_changed"
+COMMENT_CREATED = "comment_created"
+
+SUPPRESS_NOTIFICATIONS = "suppress_notifications"
+
+# actor_id 为评论人，ticket 信息取自提交前的数据
+LifecycleEvent = namedtuple(
+    "LifecycleEvent",
+    ("kind", "ticket_id", "ticket_no", "user_id", "old_status", "new_status", "actor_id", "content")
+)
+
+_handlers: Dict[str, List[Callable[[LifecycleEvent], None]]] = {}
+
+def register(kind: str, handler: Callable[[LifecycleEvent], None]):
+    """注册生命周期事件的处理函数"""
+    _handlers.setdefault(kind, []).append(handler)
+
+def _record(target, lifecycle_event: LifecycleEvent):
+    session = object_session(target)
+    if session is not None and not session.info.get(SUPPRESS_NOTIFICATIONS):
+        session.info.setdefault("lifecycle_events", []).append(lifecycle_event)
+
+@event.listens_for(Ticket, "after_insert")
+def _ticket_inserted(mapper, connection, target):
+    _record(target, LifecycleEvent(
+        TICKET_CREATED, target.id, target.ticket_no, target.user_id, None, target.status, None, None
+    ))
+
+@event.listens_for(Ticket, "after_update")
+def _ticket_updated(mapper, connection, target):
+    history = inspect(target).attrs.status.history
+    if not history.added or (history.deleted and history.added[0] == history.deleted[0]):
+        return
+    old_status = history.deleted[0] if history.deleted else None
+    _record(target, LifecycleEvent(
+        STATUS_CHANGED, target.id, target.ticket_no, target.user_id, old_status, history.added[0], None, None
+    ))
+
+@event.listens_for(Comment, "after_insert")
+def _comment_inserted(mapper, connection, target):
+    ticket = connection.execute(
+        select(Ticket.ticket_no, Ticket.user_id).where(Ticket.id == target.ticket_id)
+    ).first()
+    if ticket is None:
+        return
+    _record(target, LifecycleEvent(
+        COMMENT_CREATED, target.ticket_id, ticket.ticket_no, ticket.user_id, None, None,
+        target.user_id, target.content
+    ))
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_committed(session):
+    for lifecycle_event in session.info.pop("lifecycle_events", ()):
+        for handler in _handlers.get(lifecycle_event.kind, ()):
+            try:
+                handler(lifecycle_event)
+            except Exception as e:
+                print(f"工单生命周期事件处理失败: {e}")
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop("lifecycle_events", None)
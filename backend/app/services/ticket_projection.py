@@ -0,0 +1,47 @@
+"""
+工单列表字段投影
+
+列表类接口（工单列表、用户工单、搜索）默认只返回摘要字段，只查询这些列（不加载 ORM 对象，
+不读取正文、处理建议和AI分析JSON），逐行转换为字典后直接序列化，不再逐行做 Pydantic 校验
+和 jsonable_encoder 转换。
+需要更多字段时通过 fields 参数（逗号分隔的字段名）指定，可用字段同 TicketResponse；
+完整工单通过 GET /tickets/{ticket_id} 获取。
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException, Response
+
+from app.core.responses import FastJSONResponse
+from app.models.ticket import Ticket
+from app.schemas.ticket import TicketResponse
+
+# 列表默认返回的字段
+SUMMARY_FIELDS = ("id", "ticket_no", "summary", "category", "status", "priority", "created_at")
+# fields 参数可选的字段
+TICKET_FIELDS = tuple(TicketResponse.model_fields)
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """解析 fields 参数，未指定时为摘要字段；id 总是返回（分页游标需要）"""
+    if not fields:
+        return list(SUMMARY_FIELDS)
+    names = ["id"]
+    for name in fields.split(","):
+        name = name.strip()
+        if not name or name in names:
+            continue
+        if name not in TICKET_FIELDS:
+            raise HTTPException(status_code=400, detail=f"不支持的字段: {name}，可选: {','.join(TICKET_FIELDS)}")
+        names.append(name)
+    return names
+
+def columns(names: Iterable[str]) -> list:
+    """字段对应的工单表列，用于 select(*columns(names))"""
+    return [getattr(Ticket, name) for name in names]
+
+def to_dict(row, names: Iterable[str]) -> Dict[str, Any]:
+    """查询结果行转换为字典（时间由 FastJSONResponse 序列化）"""
+    return {name: getattr(row, name) for name in names}
+
+def projection_response(items: List[Dict[str, Any]], response: Response) -> FastJSONResponse:
+    """直接序列化投影结果，保留接口中设置的响应头（如分页游标）"""
+    return FastJSONResponse(content=items, headers=dict(response.headers))
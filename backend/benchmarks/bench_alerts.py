@@ -0,0 +1,142 @@
+"""
+异常预警引擎 基准与激增模拟
+
+在临时SQLite数据库中生成4周的常态工单（各类别/区域按工作日、时段有起伏），然后:
+1. 加载历史计数的耗时，全部类别/区域检测一次的耗时（只读内存计数，与工单总量无关）
+2. 常态数据下的预警数：原实现（最近7天类别工单数>10、区域>5即预警）对比现实现
+3. 模拟某区域某类别突发（逐条通过ORM提交工单），记录第几条工单、提交后多久触发预警
+
+用法（在backend目录下）:
+    python benchmarks/bench_alerts.py --days 28 --daily 400 --surge 30
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# 必须在导入应用模块之前指定数据库
+_db_file = os.path.join(tempfile.mkdtemp(), "bench_alerts.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+os.environ["DEBUG"] = "false"
+
+from sqlalchemy import func
+
+from app.db import migrations
+from app.db.database import SessionLocal, engine
+from app.models.ticket import Ticket
+from app.services.alert_engine import alert_engine
+
+CATEGORIES = ["环境卫生", "市政设施", "交通出行", "噪音扰民", "物业管理", "供水供电"]
+DISTRICTS = ["东城区", "西城区", "南湖区", "北山区", "新区"]
+
+def hourly_weight(moment: datetime) -> float:
+    """白天多、夜间少，周末约为工作日的六成"""
+    weight = 1.0 if 8 <= moment.hour < 20 else 0.2
+    return weight * (0.6 if moment.weekday() >= 5 else 1.0)
+
+def seed(days: int, daily: int):
+    """按时段权重生成历史工单（直接插入表，不触发写入事件）"""
+    migrations.upgrade(engine)
+    rng = random.Random(7)
+    now = datetime.now()
+    rows = []
+    moment = now - timedelta(days=days)
+    per_hour = daily / (12 * 1.0 + 12 * 0.2)
+    while moment < now:
+        for _ in range(int(rng.gauss(per_hour * hourly_weight(moment), 1) + 0.5)):
+            created = moment + timedelta(seconds=rng.randint(0, 3599))
+            if created >= now:
+                continue
+            rows.append({
+                "ticket_no": f"ALERT{len(rows):08d}",
+                "user_id": rng.randint(1, 50),
+                "content": "市民反映问题",
+                "category": rng.choice(CATEGORIES),
+                "location_district": rng.choice(DISTRICTS),
+                "status": "pending",
+                "created_at": created,
+                "updated_at": created,
+            })
+        moment += timedelta(hours=1)
+    with engine.begin() as conn:
+        for offset in range(0, len(rows), 5000):
+            conn.execute(Ticket.__table__.insert(), rows[offset:offset + 5000])
+    return len(rows)
+
+def legacy_alert_count(days: int) -> int:
+    """原实现：最近days天类别工单数>10、区域工单数>5即预警"""
+    since = datetime.now() - timedelta(days=days)
+    db = SessionLocal()
+    try:
+        categories = db.query(Ticket.category, func.count()).filter(
+            Ticket.created_at >= since
+        ).group_by(Ticket.category)
+        districts = db.query(Ticket.location_district, func.count()).filter(
+            Ticket.created_at >= since
+        ).group_by(Ticket.location_district)
+        return sum(1 for _, count in categories if count > 10) + sum(1 for _, count in districts if count > 5)
+    finally:
+        db.close()
+
+def simulate_surge(count: int, category: str, district: str):
+    """逐条提交同一区域同一类别的工单，返回 (触发时的序号, 提交后到回调的耗时ms, 预警)"""
+    fired = []
+    alert_engine.subscribe(lambda alert: fired.append((time.perf_counter(), alert)))
+    db = SessionLocal()
+    try:
+        for i in range(1, count + 1):
+            db.add(Ticket(
+                ticket_no=f"SURGE{i:06d}",
+                user_id=1,
+                content="小区附近水管爆裂，路面积水",
+                category=category,
+                location_district=district,
+                status="pending",
+            ))
+            committed = time.perf_counter()
+            db.commit()
+            if fired:
+                fired_at, alert = fired[0]
+                return i, (fired_at - committed) * 1000, alert
+        return None, None, None
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="异常预警引擎基准")
+    parser.add_argument("--days", type=int, default=28, help="历史工单天数")
+    parser.add_argument("--daily", type=int, default=400, help="工作日日均工单数")
+    parser.add_argument("--surge", type=int, default=30, help="模拟突发最多提交的工单数")
+    parser.add_argument("--rounds", type=int, default=20, help="检测耗时重复次数")
+    args = parser.parse_args()
+
+    total = seed(args.days, args.daily)
+    print(f"生成 {total} 条工单（{args.days} 天）: {os.environ['DATABASE_URL']}")
+
+    start = time.perf_counter()
+    alert_engine.ensure_loaded()
+    print(f"加载历史计数: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        alerts = alert_engine.current_alerts()
+    elapsed = (time.perf_counter() - start) * 1000 / args.rounds
+    keys = len(CATEGORIES) + len(DISTRICTS)
+    print(f"检测全部 {keys} 个类别/区域: {elapsed:.2f} ms（每个 {elapsed / keys:.3f} ms）")
+
+    print(f"\n常态数据下的预警数: 原实现 {legacy_alert_count(7)} 条，现实现 {len(alerts)} 条")
+
+    index, latency, alert = simulate_surge(args.surge, "供水供电", "南湖区")
+    if alert is None:
+        print(f"\n连续提交 {args.surge} 条同类工单未触发预警")
+    else:
+        print(f"\n突发模拟: 第 {index} 条工单提交后触发预警，提交到回调 {latency:.1f} ms")
+        print(f"  {alert['title']}: {alert['description']}（z={alert['data']['z_score']}）")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+数据分析接口 基准测试
+
+在临时SQLite数据库中生成指定数量的工单并重建日汇总表，分别执行:
+- 原实现: 加载时间窗口内全部工单ORM对象后在Python中循环统计
+- 现实现: 各分析接口（读取日汇总表；关键词云为数据库分组聚合）
+统计每个接口的耗时和Python内存峰值（tracemalloc），并校验两者结果一致。
+
+用法（在backend目录下）:
+    python benchmarks/bench_analytics.py --tickets 100000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# 必须在导入应用模块之前指定数据库
+_db_file = os.path.join(tempfile.mkdtemp(), "bench_analytics.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+os.environ["DEBUG"] = "false"
+
+from app.db.database import AsyncReadSessionLocal, Base, SessionLocal, async_read_engine, engine
+from app.models.ticket import Ticket
+from app.api import analysis
+from app.services import rollup_service
+
+CATEGORIES = ["环境卫生", "市政设施", "交通出行", "噪音扰民", "物业管理", "公共服务", None]
+DEPARTMENTS = ["城管局", "住建局", "交通局", "环保局", "街道办", None]
+DISTRICTS = ["朝阳区", "海淀区", "东城区", "西城区", "丰台区", None]
+STATUSES = ["pending", "processing", "resolved", "closed"]
+SENTIMENTS = ["positive", "neutral", "negative", None]
+KEYWORDS = ["垃圾", "路灯", "噪音", "停车", "漏水", "电梯", "绿化", "施工", "占道", "异味"]
+
+def seed(count: int, days: int):
+    """批量生成工单（直接插入表，不触发写入事件），时间分布在最近days-1天内以便与按整天统计的口径一致"""
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(42)
+    now = datetime.now()
+    content = "市民反映" + "小区环境问题，" * 20
+    with engine.begin() as conn:
+        for offset in range(0, count, 5000):
+            rows = []
+            for i in range(offset, min(offset + 5000, count)):
+                created = now - timedelta(seconds=rng.randint(0, (days - 1) * 86400))
+                rows.append({
+                    "ticket_no": f"BENCH{i:08d}",
+                    "user_id": 1,
+                    "content": content,
+                    "summary": "市民反映小区环境问题",
+                    "category": rng.choice(CATEGORIES),
+                    "department": rng.choice(DEPARTMENTS),
+                    "priority": rng.choice(["low", "medium", "high"]),
+                    "sentiment": rng.choice(SENTIMENTS),
+                    "sentiment_score": rng.choice([0, round(rng.random(), 2)]),
+                    "location_district": rng.choice(DISTRICTS),
+                    "status": rng.choice(STATUSES),
+                    "keywords": ",".join(rng.sample(KEYWORDS, 3)),
+                    "solution_suggestion": "建议相关部门尽快处理。" * 10,
+                    "response_time": rng.choice([0, rng.randint(500, 5000)]),
+                    "ai_analysis": {"intents": ["投诉"], "entities": {}, "summary": "市民反映小区环境问题"},
+                    "created_at": created,
+                    "updated_at": created,
+                })
+            conn.execute(Ticket.__table__.insert(), rows)
+
+def legacy_department_performance(db, days: int):
+    """原实现：加载全部工单后循环统计"""
+    start_date = datetime.now() - timedelta(days=days)
+    tickets = db.query(Ticket).filter(Ticket.created_at >= start_date).all()
+    dept_stats = {}
+    for ticket in tickets:
+        dept = ticket.department or "未分派"
+        stats = dept_stats.setdefault(dept, {"total": 0, "resolved": 0, "avg_response_time": 0, "response_times": []})
+        stats["total"] += 1
+        if ticket.status == "resolved":
+            stats["resolved"] += 1
+        if ticket.response_time:
+            stats["response_times"].append(ticket.response_time)
+    for stats in dept_stats.values():
+        times = stats.pop("response_times")
+        if times:
+            stats["avg_response_time"] = round(sum(times) / len(times), 2)
+        stats["resolution_rate"] = round(stats["resolved"] / stats["total"] * 100, 2)
+    return {"time_range": f"最近{days}天", "departments": dept_stats}
+
+def legacy_category_trends(db, days: int):
+    start_date = datetime.now() - timedelta(days=days)
+    tickets = db.query(Ticket).filter(Ticket.created_at >= start_date).all()
+    daily_data = {}
+    for ticket in tickets:
+        day = daily_data.setdefault(ticket.created_at.strftime("%Y-%m-%d"), {})
+        category = ticket.category or "未分类"
+        day[category] = day.get(category, 0) + 1
+    dates = sorted(daily_data)
+    return {"time_range": f"最近{days}天", "daily_data": {d: daily_data[d] for d in dates}, "total_days": len(dates)}
+
+def legacy_keywords_cloud(db, days: int):
+    start_date = datetime.now() - timedelta(days=days)
+    tickets = db.query(Ticket).filter(Ticket.created_at >= start_date).all()
+    keyword_count = {}
+    for ticket in tickets:
+        for keyword in (ticket.keywords or "").split(","):
+            keyword = keyword.strip()
+            if keyword:
+                keyword_count[keyword] = keyword_count.get(keyword, 0) + 1
+    return {k: v for k, v in keyword_count.items()}
+
+async def new_keywords_cloud(db, days: int):
+    result = await analysis.get_keywords_cloud(days=days, db=db)
+    return {item["name"]: item["value"] for item in result["keywords"]}
+
+# 异步会话的连接池绑定事件循环，全部异步调用共用一个循环
+_loop = asyncio.new_event_loop()
+
+async def _run_async(runner):
+    async with AsyncReadSessionLocal() as db:
+        return await runner(db)
+
+def _run_sync(runner):
+    db = SessionLocal()
+    try:
+        return runner(db)
+    finally:
+        db.close()
+
+def measure(runner, rounds: int, use_async: bool = False):
+    """
+    返回 (结果, 平均耗时ms, 内存峰值MB)
+
+    原实现传入同步会话；现实现为异步接口函数，use_async=True 时传入异步会话
+    """
+    latencies = []
+    peak = 0
+    result = None
+    for _ in range(rounds):
+        tracemalloc.start()
+        start = time.perf_counter()
+        if use_async:
+            result = _loop.run_until_complete(_run_async(runner))
+        else:
+            result = _run_sync(runner)
+        latencies.append((time.perf_counter() - start) * 1000)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return result, sum(latencies) / len(latencies), peak / 1024 / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description="数据分析接口基准测试")
+    parser.add_argument("--tickets", type=int, default=100000, help="生成的工单数")
+    parser.add_argument("--days", type=int, default=30, help="统计时间窗口（天）")
+    parser.add_argument("--rounds", type=int, default=3, help="每项重复次数")
+    args = parser.parse_args()
+
+    print(f"生成 {args.tickets} 条工单: {_db_file}")
+    seed(args.tickets, args.days)
+    start = time.perf_counter()
+    rows = rollup_service.rebuild()
+    print(f"重建日汇总: {rows} 行, {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    cases = [
+        ("department-performance",
+         lambda db: legacy_department_performance(db, args.days),
+         lambda db: analysis.get_department_performance(days=args.days, db=db)),
+        ("trends/category",
+         lambda db: legacy_category_trends(db, args.days),
+         lambda db: analysis.get_category_trends(days=args.days, db=db)),
+        ("keywords-cloud",
+         lambda db: legacy_keywords_cloud(db, args.days),
+         lambda db: new_keywords_cloud(db, args.days)),
+    ]
+
+    print(f"\n{'接口':<26}{'原耗时ms':>10}{'现耗时ms':>10}{'原内存MB':>10}{'现内存MB':>10}  结果一致")
+    for name, legacy, current in cases:
+        legacy_result, legacy_ms, legacy_mb = measure(legacy, args.rounds)
+        current_result, current_ms, current_mb = measure(current, args.rounds, use_async=True)
+        same = legacy_result == current_result
+        print(f"{name:<26}{legacy_ms:>10.0f}{current_ms:>10.0f}{legacy_mb:>10.1f}{current_mb:>10.1f}  {same}")
+
+    for name in ("sentiment-analysis", "export/report"):
+        endpoint = {
+            "sentiment-analysis": analysis.get_sentiment_analysis,
+            "export/report": analysis.export_report,
+        }[name]
+        _, ms, mb = measure(lambda db: endpoint(days=args.days, db=db), args.rounds, use_async=True)
+        print(f"{name:<26}{'-':>10}{ms:>10.0f}{'-':>10}{mb:>10.1f}")
+
+    # 预警由预警引擎的内存计数得出（首次调用加载历史计数，见 bench_alerts.py）
+    _, ms, mb = measure(lambda db: analysis.get_alerts(), args.rounds, use_async=True)
+    print(f"{'alerts':<26}{'-':>10}{ms:>10.0f}{'-':>10}{mb:>10.1f}")
+
+    # 连接池中的aiosqlite连接不关闭时进程无法退出
+    _loop.run_until_complete(async_read_engine.dispose())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+异步数据库会话 并发压测
+
+在临时SQLite数据库中生成工单后，以子进程启动应用（uvicorn，单进程），并发请求同一组查询:
+- 原实现: async 路由中直接使用同步会话（数据库IO在事件循环线程上执行，阻塞其它请求）
+- 现实现: 异步会话（get_async_db），数据库IO不占用事件循环
+
+两组接口执行相同的SQL（原实现为改造前代码的副本，挂在 /legacy 下）。压测期间另有一个探针
+持续请求 /health，其延迟反映事件循环被阻塞的程度（千帆调用等其它协程同样受影响）。
+
+注意: 原实现并发数超过同步连接池上限（默认5+10）时，等待连接的请求在事件循环线程上阻塞，
+持有连接的请求无法结束并归还连接，服务会停顿到连接池超时（30秒）后报错，因此默认并发为8。
+
+用法（在backend目录下）:
+    python benchmarks/bench_async_db.py --tickets 50000 --concurrency 8 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# 必须在导入应用模块之前指定数据库（应用子进程通过环境变量继承）
+if "--serve" not in sys.argv:
+    _db_file = os.path.join(tempfile.mkdtemp(), "bench_async_db.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+os.environ["DEBUG"] = "false"
+
+import httpx
+
+KEYWORDS = ["垃圾", "路灯", "噪音", "停车", "漏水", "电梯", "绿化", "施工", "占道", "异味"]
+STATUSES = ["pending", "processing", "resolved", "closed"]
+
+def seed(count: int, days: int):
+    """批量生成工单（直接插入表，不触发写入事件）"""
+    from app.db import migrations
+    from app.db.database import engine
+    from app.models.ticket import Ticket
+    
+    migrations.upgrade(engine)
+    rng = random.Random(42)
+    now = datetime.now()
+    with engine.begin() as conn:
+        for offset in range(0, count, 5000):
+            rows = []
+            for i in range(offset, min(offset + 5000, count)):
+                created = now - timedelta(seconds=rng.randint(0, days * 86400))
+                rows.append({
+                    "ticket_no": f"BENCH{i:08d}",
+                    "user_id": rng.randint(1, 50),
+                    "content": "市民反映小区环境问题" * 5,
+                    "status": rng.choice(STATUSES),
+                    "keywords": ",".join(rng.sample(KEYWORDS, 3)),
+                    "created_at": created,
+                    "updated_at": created,
+                })
+            conn.execute(Ticket.__table__.insert(), rows)
+
+def build_legacy_router():
+    """改造前的实现：async 路由 + 同步会话"""
+    from typing import List
+    
+    from fastapi import APIRouter, Depends
+    from sqlalchemy import func
+    from sqlalchemy.orm import Session
+    
+    from app.db.database import get_db
+    from app.models.ticket import Ticket
+    from app.schemas.ticket import TicketResponse
+    
+    router = APIRouter()
+    
+    @router.get("/tickets/", response_model=List[TicketResponse])
+    async def list_tickets(skip: int = 0, limit: int = 100, status: str = None, db: Session = Depends(get_db)):
+        query = db.query(Ticket)
+        if status:
+            query = query.filter(Ticket.status == status)
+        return query.order_by(Ticket.created_at.desc(), Ticket.id.desc()).offset(skip).limit(limit).all()
+    
+    @router.get("/analysis/keywords-cloud")
+    async def get_keywords_cloud(days: int = 30, db: Session = Depends(get_db)):
+        start_date = datetime.now() - timedelta(days=days)
+        rows = db.query(
+            Ticket.keywords,
+            func.count(Ticket.id)
+        ).filter(
+            Ticket.created_at >= start_date,
+            Ticket.keywords.isnot(None),
+            Ticket.keywords != ""
+        ).group_by(Ticket.keywords)
+        keyword_count = {}
+        for keywords, count in rows.yield_per(1000):
+            for keyword in keywords.split(","):
+                keyword = keyword.strip()
+                if keyword:
+                    keyword_count[keyword] = keyword_count.get(keyword, 0) + count
+        word_cloud = [
+            {"name": k, "value": v}
+            for k, v in sorted(keyword_count.items(), key=lambda x: x[1], reverse=True)[:30]
+        ]
+        return {"time_range": f"最近{days}天", "keywords": word_cloud, "total_keywords": len(keyword_count)}
+    
+    return router
+
+def serve(port: int):
+    """子进程：启动应用并挂载原实现"""
+    import uvicorn
+    
+    from main import app
+    
+    app.include_router(build_legacy_router(), prefix="/legacy")
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+def request_paths(prefix: str, rng: random.Random) -> str:
+    """列表翻页与关键词云交替，模拟大屏轮询和列表浏览"""
+    if rng.random() < 0.5:
+        return f"{prefix}/analysis/keywords-cloud?days=30"
+    return f"{prefix}/tickets/?limit=50&skip={rng.randint(0, 100) * 50}&status={rng.choice(STATUSES)}"
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+async def run_load(base_url: str, prefix: str, concurrency: int, duration: float):
+    """并发请求 duration 秒，返回 (吞吐req/s, 请求延迟列表ms, 探针延迟列表ms, 错误数)"""
+    latencies = []
+    probe_latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency + 1, max_keepalive_connections=concurrency + 1)
+    
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        async def worker(seed_value: int):
+            nonlocal errors
+            rng = random.Random(seed_value)
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.get(request_paths(prefix, rng))
+                if response.status_code != 200:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+        
+        async def probe():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                await client.get("/health")
+                probe_latencies.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.02)
+        
+        started = time.perf_counter()
+        await asyncio.gather(probe(), *(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    
+    return len(latencies) / elapsed, latencies, probe_latencies, errors
+
+def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("应用启动失败")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.3)
+    raise RuntimeError("等待应用启动超时")
+
+def main():
+    parser = argparse.ArgumentParser(description="异步数据库会话并发压测")
+    parser.add_argument("--tickets", type=int, default=50000, help="生成的工单数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发请求数")
+    parser.add_argument("--duration", type=float, default=10, help="每组压测时长（秒）")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.serve:
+        serve(args.port)
+        return
+    
+    print(f"生成 {args.tickets} 条工单: {os.environ['DATABASE_URL']}")
+    seed(args.tickets, days=30)
+    
+    base_url = f"http://127.0.0.1:{args.port}"
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(args.port)],
+        env=dict(os.environ)
+    )
+    try:
+        wait_until_ready(base_url, process)
+        # 预热：加载连接池和首次查询
+        asyncio.run(run_load(base_url, "/legacy", 2, 1))
+        asyncio.run(run_load(base_url, "/api/v1", 2, 1))
+        
+        print(f"\n并发 {args.concurrency}，每组 {args.duration:.0f} 秒（列表翻页 + 关键词云）:")
+        print(f"{'实现':<12}{'吞吐req/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'探针p50':>10}{'探针p95':>10}{'错误':>6}")
+        for name, prefix in (("同步会话", "/legacy"), ("异步会话", "/api/v1")):
+            throughput, latencies, probes, errors = asyncio.run(
+                run_load(base_url, prefix, args.concurrency, args.duration)
+            )
+            print(f"{name:<12}{throughput:>12.1f}{statistics.median(latencies):>10.1f}"
+                  f"{percentile(latencies, 0.95):>10.1f}{statistics.median(probes):>10.1f}"
+                  f"{percentile(probes, 0.95):>10.1f}{errors:>6}")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            # 事件循环被阻塞时无法响应退出信号
+            process.kill()
+
+if __name__ == "__main__":
+    main()
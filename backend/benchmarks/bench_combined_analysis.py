@@ -0,0 +1,73 @@
+"""
+合并分析 vs 三次调用 基准测试
+
+对同一批市民反馈分别执行:
+- 三次调用: analyze_intent + extract_keywords + generate_solution（并发）
+- 合并调用: analyze_combined
+统计每张工单的端到端耗时和token用量。需要配置有效的 QIANFAN_AK / QIANFAN_SK。
+
+用法（在backend目录下）:
+    python benchmarks/bench_combined_analysis.py --rounds 3
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.qianfan_service import qianfan_service
+
+SAMPLES = [
+    "小区垃圾没人清理，已经堆了三天了，味道很大",
+    "我家楼下的路灯坏了一个多星期，晚上走路很危险",
+    "隔壁工地每天晚上十一点还在施工，噪音太大影响休息",
+    "地铁站出口附近乱停车严重，行人都没法通行",
+    "物业不作为，电梯坏了半个月也不修",
+    "办理居住证跑了三趟还没办下来，窗口人员态度差",
+    "公园里的绿化带被破坏了，希望尽快修复",
+    "十字路口红绿灯时间太短，老人过马路来不及",
+]
+
+async def run_three_calls(content: str):
+    await asyncio.gather(
+        qianfan_service.analyze_intent(content, use_cache=False),
+        qianfan_service.extract_keywords(content, use_cache=False),
+        qianfan_service.generate_solution(content, use_cache=False)
+    )
+
+async def run_combined(content: str):
+    await qianfan_service.analyze_combined(content, use_cache=False)
+
+async def measure(name: str, runner, rounds: int):
+    before = dict(qianfan_service.usage)
+    latencies = []
+    for _ in range(rounds):
+        for content in SAMPLES:
+            start = time.perf_counter()
+            await runner(content)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    tickets = len(latencies)
+    usage = {k: qianfan_service.usage[k] - before[k] for k in before}
+    print(f"\n[{name}] 工单数: {tickets}")
+    print(f"  平均耗时: {statistics.mean(latencies):.0f} ms")
+    print(f"  P50耗时: {statistics.median(latencies):.0f} ms")
+    print(f"  最大耗时: {max(latencies):.0f} ms")
+    print(f"  每单模型调用: {usage['calls'] / tickets:.1f} 次")
+    print(f"  每单prompt tokens: {usage['prompt_tokens'] / tickets:.0f}")
+    print(f"  每单completion tokens: {usage['completion_tokens'] / tickets:.0f}")
+    print(f"  每单total tokens: {usage['total_tokens'] / tickets:.0f}")
+
+async def main():
+    parser = argparse.ArgumentParser(description="合并分析基准测试")
+    parser.add_argument("--rounds", type=int, default=1, help="样本重复轮数")
+    args = parser.parse_args()
+
+    await measure("三次调用", run_three_calls, args.rounds)
+    await measure("合并调用", run_combined, args.rounds)
+
+if __name__ == "__main__":
+    asyncio.run(main())
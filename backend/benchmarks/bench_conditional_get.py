@@ -0,0 +1,141 @@
+"""
+响应压缩与条件请求 基准
+
+在临时SQLite数据库中生成工单，通过应用（进程内ASGI，含全部中间件）模拟大屏和列表页轮询
+数据分析接口和工单列表，数据未变化期间对比:
+- 原方式: 不压缩、不带 If-None-Match，每次完整计算并返回
+- gzip: 带 Accept-Encoding: gzip
+- 条件请求: 带上次响应的 ETag（If-None-Match），未变化时返回 304
+记录每轮请求的传输字节数和耗时。
+
+用法（在backend目录下）:
+    python benchmarks/bench_conditional_get.py --tickets 50000 --rounds 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# 必须在导入应用模块之前指定数据库
+_db_file = os.path.join(tempfile.mkdtemp(), "bench_conditional_get.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+os.environ["DEBUG"] = "false"
+
+import httpx
+
+CATEGORIES = ["环境卫生", "市政设施", "交通出行", "噪音扰民", "物业管理"]
+DISTRICTS = ["东城区", "西城区", "南湖区", "北山区"]
+KEYWORDS = ["垃圾", "路灯", "噪音", "停车", "漏水", "电梯", "绿化", "施工"]
+URLS = [
+    "/api/v1/analysis/statistics?days=30",
+    "/api/v1/analysis/trends/category?days=30",
+    "/api/v1/analysis/trends/location?days=30",
+    "/api/v1/analysis/sentiment-analysis?days=30",
+    "/api/v1/analysis/keywords-cloud?days=30",
+    "/api/v1/tickets/?limit=100&fields=ticket_no,summary,content,category,department,status,priority,created_at",
+]
+
+def seed(count: int):
+    """批量生成工单（直接插入表，汇总表在应用启动时重建）"""
+    from app.db import migrations
+    from app.db.database import engine
+    from app.models.ticket import Ticket
+
+    migrations.upgrade(engine)
+    rng = random.Random(9)
+    now = datetime.now()
+    with engine.begin() as conn:
+        for offset in range(0, count, 5000):
+            rows = []
+            for i in range(offset, min(offset + 5000, count)):
+                created = now - timedelta(seconds=rng.randint(0, 30 * 86400))
+                content = "市民反映小区门口垃圾堆放多日无人清理，气味很大，影响居民出行。" * 2
+                rows.append({
+                    "ticket_no": f"COND{i:08d}",
+                    "user_id": rng.randint(1, 50),
+                    "content": content,
+                    "summary": content[:30],
+                    "category": rng.choice(CATEGORIES),
+                    "department": "环卫局",
+                    "location_district": rng.choice(DISTRICTS),
+                    "status": rng.choice(["pending", "processing", "resolved"]),
+                    "priority": "medium",
+                    "sentiment": rng.choice(["positive", "neutral", "negative"]),
+                    "keywords": ",".join(rng.sample(KEYWORDS, 3)),
+                    "created_at": created,
+                    "updated_at": created,
+                })
+            conn.execute(Ticket.__table__.insert(), rows)
+
+class Wire:
+    """统计经过传输层的响应体字节数（压缩后）"""
+
+    def __init__(self, app):
+        self.app = app
+        self.bytes = 0
+
+    async def __call__(self, scope, receive, send):
+        async def counting_send(message):
+            if message["type"] == "http.response.body":
+                self.bytes += len(message.get("body", b""))
+            await send(message)
+        await self.app(scope, receive, counting_send)
+
+async def run(rounds: int):
+    from app.db.database import async_engine, async_read_engine
+    from main import app
+
+    wire = Wire(app)
+    etags = {}
+    modes = [
+        ("原方式", lambda url: {"accept-encoding": "identity"}),
+        ("gzip", lambda url: {"accept-encoding": "gzip"}),
+        ("gzip + 条件请求", lambda url: {"accept-encoding": "gzip", **({"if-none-match": etags[url]} if url in etags else {})}),
+    ]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=wire), base_url="http://bench") as client:
+        # 预热（汇总、预警引擎加载）
+        for url in URLS:
+            etags[url] = (await client.get(url)).headers.get("etag")
+        print(f"每轮依次请求 {len(URLS)} 个接口，{rounds} 轮，数据无变化:")
+        for name, headers in modes:
+            wire.bytes = 0
+            statuses = {}
+            latencies = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                for url in URLS:
+                    response = await client.get(url, headers=headers(url))
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                latencies.append((time.perf_counter() - start) * 1000)
+            print(f"  {name}: 每轮 {wire.bytes / rounds / 1024:.1f} KB，p50 {statistics.median(latencies):.2f} ms，"
+                  f"状态码 {statuses}")
+
+        # 写入后第一次条件请求重新计算，之后恢复 304
+        await client.put("/api/v1/tickets/1", json={"status": "closed"})
+        codes = []
+        for _ in range(2):
+            codes.append([(await client.get(url, headers=modes[2][1](url))).status_code for url in URLS[:1]][0])
+            etags[URLS[0]] = (await client.get(URLS[0])).headers.get("etag")
+        print(f"  工单更新后统计接口的两次条件请求: {codes}")
+    await async_engine.dispose()
+    await async_read_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description="响应压缩与条件请求基准")
+    parser.add_argument("--tickets", type=int, default=50000, help="生成的工单数")
+    parser.add_argument("--rounds", type=int, default=50, help="每种方式的轮数")
+    args = parser.parse_args()
+
+    print(f"生成 {args.tickets} 条工单: {os.environ['DATABASE_URL']}")
+    seed(args.tickets)
+    asyncio.run(run(args.rounds))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+大屏推送 压测
+
+在临时SQLite数据库中生成工单后，以子进程启动应用（uvicorn，单进程），同时打开 N 个大屏，
+期间每秒更新一次工单状态（数据持续变化），对比:
+- 原方式: 每个大屏每 --poll 秒依次请求统计、预警、类别趋势、地域热点、情绪、关键词六个接口
+- 推送方式: 每个大屏一个 /analysis/dashboard/stream 连接，服务端每个周期计算一次并推送变化部分
+
+记录服务进程消耗的CPU时间、请求/消息数，以及推送方式下工单更新到全部大屏收到变化的延迟。
+
+用法（在backend目录下）:
+    python benchmarks/bench_dashboard.py --tickets 50000 --dashboards 100 --duration 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# 必须在导入应用模块之前指定数据库（应用子进程通过环境变量继承）
+_db_file = os.path.join(tempfile.mkdtemp(), "bench_dashboard.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+os.environ["DEBUG"] = "false"
+
+import httpx
+
+HOST = "127.0.0.1"
+ENDPOINTS = ["statistics", "alerts", "trends/category", "trends/location", "sentiment-analysis", "keywords-cloud"]
+CATEGORIES = ["环境卫生", "市政设施", "交通出行", "噪音扰民", "物业管理"]
+DISTRICTS = ["东城区", "西城区", "南湖区", "北山区"]
+KEYWORDS = ["垃圾", "路灯", "噪音", "停车", "漏水", "电梯", "绿化", "施工"]
+STATUSES = ["pending", "processing", "resolved"]
+
+def seed(count: int, days: int):
+    """批量生成工单（直接插入表，汇总表在应用启动时重建）"""
+    from app.db import migrations
+    from app.db.database import engine
+    from app.models.ticket import Ticket
+
+    migrations.upgrade(engine)
+    rng = random.Random(3)
+    now = datetime.now()
+    with engine.begin() as conn:
+        for offset in range(0, count, 5000):
+            rows = []
+            for i in range(offset, min(offset + 5000, count)):
+                created = now - timedelta(seconds=rng.randint(0, days * 86400))
+                rows.append({
+                    "ticket_no": f"DASH{i:08d}",
+                    "user_id": rng.randint(1, 50),
+                    "content": "市民反映问题",
+                    "category": rng.choice(CATEGORIES),
+                    "location_district": rng.choice(DISTRICTS),
+                    "status": rng.choice(STATUSES),
+                    "sentiment": rng.choice(["positive", "neutral", "negative"]),
+                    "keywords": ",".join(rng.sample(KEYWORDS, 3)),
+                    "created_at": created,
+                    "updated_at": created,
+                })
+            conn.execute(Ticket.__table__.insert(), rows)
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+async def update_tickets(client: httpx.AsyncClient, deadline: float, on_update=None):
+    """每秒关闭一条工单（生成的工单均未关闭，每次都会改变统计）"""
+    while time.perf_counter() < deadline:
+        update_tickets.ticket_id += 1
+        await client.put(f"/api/v1/tickets/{update_tickets.ticket_id}", json={"status": "closed"})
+        if on_update is not None:
+            on_update(time.perf_counter())
+        await asyncio.sleep(1)
+
+update_tickets.ticket_id = 0
+
+async def run_polling(base_url: str, pid: int, dashboards: int, duration: float, poll: float, days: int):
+    requests = 0
+    latencies = []
+    deadline = time.perf_counter() + duration
+    # 空闲连接早于服务端 keep-alive 超时（5秒）关闭，避免复用已被服务端关闭的连接
+    limits = httpx.Limits(max_connections=dashboards + 1, keepalive_expiry=2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        async def dashboard(index: int):
+            nonlocal requests
+            await asyncio.sleep(poll * index / dashboards)
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                for endpoint in ENDPOINTS:
+                    await client.get(f"/api/v1/analysis/{endpoint}?days={days}")
+                    requests += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(max(0.0, poll - (time.perf_counter() - start)))
+
+        cpu = cpu_seconds(pid)
+        await asyncio.gather(update_tickets(client, deadline), *(dashboard(i) for i in range(dashboards)))
+        cpu = cpu_seconds(pid) - cpu
+    print(f"原方式（每 {poll:.0f} 秒轮询六个接口）: 服务CPU {cpu:.1f} 秒，请求 {requests} 次，"
+          f"一轮刷新 p50 {statistics.median(latencies):.0f} ms / p95 {sorted(latencies)[int(len(latencies) * 0.95)]:.0f} ms")
+
+class Subscriber:
+    """原始TCP上的SSE连接，记录收到每条消息的时间"""
+
+    def __init__(self):
+        self.events = []
+        self.writer = None
+        self.task = None
+
+    async def open(self, port: int, days: int):
+        reader, self.writer = await asyncio.open_connection(HOST, port)
+        self.writer.write(f"GET /api/v1/analysis/dashboard/stream?days={days} HTTP/1.1\r\nHost: {HOST}\r\n"
+                          "Accept: text/event-stream\r\n\r\n".encode())
+        await self.writer.drain()
+        self.task = asyncio.create_task(self._read(reader))
+
+    async def _read(self, reader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            if line.startswith(b"event:"):
+                self.events.append((time.perf_counter(), line[6:].strip().decode()))
+
+    def close(self):
+        self.task.cancel()
+        self.writer.close()
+
+async def run_push(base_url: str, port: int, pid: int, dashboards: int, duration: float, days: int):
+    updates = []
+    subscribers = [Subscriber() for _ in range(dashboards)]
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        cpu = cpu_seconds(pid)
+        for offset in range(0, dashboards, 100):
+            await asyncio.gather(*(s.open(port, days) for s in subscribers[offset:offset + 100]))
+        deadline = time.perf_counter() + duration
+        await update_tickets(client, deadline, updates.append)
+        cpu = cpu_seconds(pid) - cpu
+
+    # 每次更新后全部大屏收到下一条 delta 的延迟
+    delays = []
+    for updated_at in updates:
+        arrivals = []
+        for subscriber in subscribers:
+            received = [t for t, kind in subscriber.events if kind == "delta" and t >= updated_at]
+            if received:
+                arrivals.append(received[0])
+        if len(arrivals) == dashboards:
+            delays.append((max(arrivals) - updated_at) * 1000)
+    messages = sum(len(s.events) for s in subscribers)
+    for subscriber in subscribers:
+        subscriber.close()
+    print(f"推送方式: 服务CPU {cpu:.1f} 秒，推送消息 {messages} 条（{len(updates)} 次更新）")
+    if delays:
+        print(f"  工单更新到全部 {dashboards} 个大屏收到变化: p50 {statistics.median(delays):.0f} ms，"
+              f"最大 {max(delays):.0f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="大屏推送压测")
+    parser.add_argument("--tickets", type=int, default=50000, help="生成的工单数")
+    parser.add_argument("--dashboards", type=int, default=100, help="同时打开的大屏数")
+    parser.add_argument("--duration", type=float, default=20, help="每组时长（秒）")
+    parser.add_argument("--poll", type=float, default=5, help="原方式的刷新间隔（秒）")
+    parser.add_argument("--days", type=int, default=30, help="统计时间范围（天）")
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    print(f"生成 {args.tickets} 条工单: {os.environ['DATABASE_URL']}")
+    seed(args.tickets, args.days)
+    base_url = f"http://{HOST}:{args.port}"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", HOST, "--port", str(args.port),
+         "--log-level", "warning"],
+        cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+        env=dict(os.environ)
+    )
+    try:
+        deadline = time.time() + 120
+        while True:
+            try:
+                httpx.get(f"{base_url}/health", timeout=1)
+                break
+            except httpx.HTTPError:
+                if time.time() > deadline or process.poll() is not None:
+                    raise RuntimeError("应用启动失败")
+                time.sleep(0.3)
+        print(f"\n{args.dashboards} 个大屏，每组 {args.duration:.0f} 秒，每秒更新一条工单:")
+        # 先测推送方式：原方式结束时服务端仍积压大量请求，会影响之后的测量
+        asyncio.run(run_push(base_url, args.port, process.pid, args.dashboards, args.duration, args.days))
+        asyncio.run(run_polling(base_url, process.pid, args.dashboards, args.duration, args.poll, args.days))
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+if __name__ == "__main__":
+    main()
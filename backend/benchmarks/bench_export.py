@@ -0,0 +1,111 @@
+"""
+工单明细导出 基准测试
+
+在临时SQLite数据库中生成指定数量的工单，分别执行:
+- 一次性导出: 查询全部工单后在内存中拼出完整的导出内容
+- 流式导出: app.services.export_service.stream_tickets（服务端游标分块读取，逐块写出）
+统计耗时、输出大小和Python内存峰值（tracemalloc）。
+
+用法（在backend目录下）:
+    python benchmarks/bench_export.py --tickets 200000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# 必须在导入应用模块之前指定数据库
+_db_file = os.path.join(tempfile.mkdtemp(), "bench_export.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+os.environ["DEBUG"] = "false"
+
+from sqlalchemy import select
+
+from app.db.database import AsyncReadSessionLocal, Base, async_read_engine, engine
+from app.models.ticket import Ticket
+from app.services.export_service import EXPORT_COLUMNS, stream_tickets
+
+CATEGORIES = ["环境卫生", "市政设施", "交通出行", "噪音扰民", "物业管理"]
+
+def seed(count: int):
+    """批量生成工单（直接插入表，不触发写入事件）"""
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(42)
+    now = datetime.now()
+    with engine.begin() as conn:
+        for offset in range(0, count, 5000):
+            rows = []
+            for i in range(offset, min(offset + 5000, count)):
+                created = now - timedelta(seconds=rng.randint(0, 365 * 86400))
+                rows.append({
+                    "ticket_no": f"BENCH{i:08d}",
+                    "user_id": rng.randint(1, 50),
+                    "content": "市民反映小区环境问题，希望尽快处理" * 3,
+                    "summary": "小区环境问题",
+                    "category": rng.choice(CATEGORIES),
+                    "status": "pending",
+                    "keywords": "环境,小区",
+                    "created_at": created,
+                    "updated_at": created,
+                })
+            conn.execute(Ticket.__table__.insert(), rows)
+
+async def export_all_at_once() -> int:
+    """对照：一次性读取全部行并拼出完整JSON Lines"""
+    names = [column.key for column in EXPORT_COLUMNS]
+    async with AsyncReadSessionLocal() as db:
+        rows = (await db.execute(select(*EXPORT_COLUMNS).order_by(Ticket.id))).all()
+    body = "".join(
+        json.dumps(dict(zip(names, row)), ensure_ascii=False, default=str) + "\n" for row in rows
+    )
+    return len(body.encode("utf-8"))
+
+async def export_streaming(fmt: str) -> int:
+    size = 0
+    async for chunk in stream_tickets([], fmt):
+        size += len(chunk.encode("utf-8"))
+    return size
+
+def measure(loop, coroutine_factory):
+    """返回 (输出字节数, 耗时ms, 内存峰值MB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = loop.run_until_complete(coroutine_factory())
+    elapsed = (time.perf_counter() - start) * 1000
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, elapsed, peak / 1024 / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description="工单明细导出基准测试")
+    parser.add_argument("--tickets", type=int, default=200000, help="生成的工单数")
+    args = parser.parse_args()
+
+    print(f"生成 {args.tickets} 条工单: {_db_file}")
+    seed(args.tickets)
+
+    loop = asyncio.new_event_loop()
+    cases = [
+        ("一次性导出 jsonl", export_all_at_once),
+        ("流式导出 jsonl", lambda: export_streaming("jsonl")),
+        ("流式导出 csv", lambda: export_streaming("csv")),
+        ("流式导出 columnar", lambda: export_streaming("columnar")),
+    ]
+    print(f"\n{'方式':<20}{'输出MB':>10}{'耗时ms':>10}{'内存峰值MB':>12}")
+    for name, factory in cases:
+        size, elapsed, peak = measure(loop, factory)
+        print(f"{name:<20}{size / 1024 / 1024:>10.1f}{elapsed:>10.0f}{peak:>12.1f}")
+
+    # 连接池中的aiosqlite连接不关闭时进程无法退出
+    loop.run_until_complete(async_read_engine.dispose())
+
+if __name__ == "__main__":
+    main()
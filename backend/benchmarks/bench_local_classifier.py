@@ -0,0 +1,144 @@
+"""
+本地分类器 基准
+
+在临时SQLite数据库中按常见诉求生成带标签的历史工单（含跨类别的混合诉求和少量标注噪声），
+用 app.services.local_classifier 训练并在留出的评估集上测量:
+- 各字段准确率，不同置信度阈值下本地处理的比例和这部分工单的准确率
+- 单条预测耗时
+- 工单补全（analyze_ticket_content）: 本地处理的工单耗时，以及需要调用千帆的比例
+
+用法（在backend目录下）:
+    python benchmarks/bench_local_classifier.py --tickets 50000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# 必须在导入应用模块之前指定数据库和模型文件
+_work_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_work_dir, 'bench_local_classifier.db')}"
+os.environ["LOCAL_CLASSIFIER_PATH"] = os.path.join(_work_dir, "ticket_classifier.npz")
+os.environ["DEBUG"] = "false"
+# 千帆指向不可达的本地端口，需要调用千帆的工单立即降级
+os.environ["QIANFAN_BASE_URL"] = "http://127.0.0.1:9"
+os.environ["QIANFAN_ACCESS_TOKEN"] = "fake"
+
+# 类别 → (部门, 常见诉求)
+ISSUES = {
+    "环境卫生": ("环卫局", ["垃圾堆放多日无人清理", "垃圾桶满了没人清运", "路边有大量建筑垃圾", "公厕卫生很差气味难闻",
+                          "河道漂浮垃圾发臭", "小区内污水横流"]),
+    "市政设施": ("市政管理局", ["路灯坏了晚上一片漆黑", "井盖缺失非常危险", "人行道地砖松动", "自来水管道破裂漏水",
+                            "下水道堵塞污水外溢", "道路出现大坑"]),
+    "交通出行": ("交通运输局", ["公交车长时间不来", "路口红绿灯故障", "违章停车堵塞消防通道", "共享单车乱停放",
+                            "早晚高峰道路拥堵严重", "公交站台损坏"]),
+    "噪音扰民": ("生态环境局", ["夜间施工噪音太大", "广场舞音响声音太大", "酒吧音乐声吵到半夜", "装修噪音中午不停",
+                            "工厂机器轰鸣影响休息"]),
+    "物业管理": ("住房和城乡建设局", ["电梯经常故障物业不管", "物业费收取不合理", "小区门禁坏了物业不修",
+                                 "物业私自占用公共绿地", "物业不处理楼道杂物"]),
+    "行政效率": ("政务服务中心", ["办理证件排队时间太长", "窗口工作人员态度差", "网上办事系统经常打不开",
+                             "审批材料反复要求补交", "电话一直打不通"]),
+    "其他": ("综合服务部", ["咨询社保缴费政策", "询问疫苗接种地点", "建议增加社区活动", "咨询公积金提取流程"]),
+}
+DISTRICTS = ["东城区", "西城区", "南湖区", "北山区"]
+PLACES = ["幸福小区", "阳光花园", "人民路", "解放大道", "滨江路口", "老城区菜市场", "第一中学附近"]
+OPENERS = ["", "市民来电反映，", "您好，", "我是附近居民，", "网友留言：", "再次反映，"]
+URGENT = ["已经反映过多次了", "老人小孩出行很危险", "情况十分紧急"]
+CLOSERS = ["希望尽快处理。", "请相关部门关注。", "谢谢！", "影响大家正常生活。", ""]
+
+def make_ticket(rng: random.Random):
+    """生成一条工单内容及标签"""
+    category = rng.choice(list(ISSUES))
+    department, issues = ISSUES[category]
+    place = f"{rng.choice(DISTRICTS)}{rng.choice(PLACES)}"
+    content = f"{rng.choice(OPENERS)}{place}{rng.choice(issues)}"
+    if rng.random() < 0.15:
+        # 混合诉求: 附带另一类问题，标签仍为主要诉求
+        other = rng.choice([c for c in ISSUES if c != category])
+        content += f"，另外{rng.choice(ISSUES[other][1])}"
+    urgent = category != "其他" and rng.random() < 0.25
+    if urgent:
+        content += f"，{rng.choice(URGENT)}"
+    content += f"，{rng.choice(CLOSERS)}"
+    priority = "high" if urgent else ("low" if category == "其他" else "medium")
+    sentiment = "neutral" if category == "其他" else ("negative" if urgent or rng.random() < 0.6 else "neutral")
+    if rng.random() < 0.03:
+        # 标注噪声
+        category = rng.choice(list(ISSUES))
+        department = ISSUES[category][0]
+    return content, category, department, priority, sentiment
+
+def seed(count: int):
+    from app.db import migrations
+    from app.db.database import engine
+    from app.models.ticket import Ticket
+
+    migrations.upgrade(engine)
+    rng = random.Random(25)
+    now = datetime.now()
+    with engine.begin() as conn:
+        for offset in range(0, count, 5000):
+            rows = []
+            for i in range(offset, min(offset + 5000, count)):
+                content, category, department, priority, sentiment = make_ticket(rng)
+                created = now - timedelta(minutes=i)
+                rows.append({
+                    "ticket_no": f"LC{i:08d}", "user_id": 1, "content": content, "summary": content[:30],
+                    "category": category, "department": department, "priority": priority,
+                    "sentiment": sentiment, "sentiment_score": 0.3 if sentiment == "negative" else 0.5,
+                    "status": "resolved", "enrichment_status": "done", "ai_analysis": {"summary": content[:30]},
+                    "created_at": created, "updated_at": created,
+                })
+            conn.execute(Ticket.__table__.insert(), rows)
+
+async def measure_enrichment(contents):
+    """补全耗时: 本地处理的工单直接返回；其余调用千帆（基准中千帆不可达）"""
+    from app.services.enrichment_service import analyze_ticket_content
+
+    local, escalated = [], 0
+    for content in contents:
+        start = time.perf_counter()
+        fields = await analyze_ticket_content(content)
+        if fields["ai_analysis"].get("source") == "local_classifier":
+            local.append((time.perf_counter() - start) * 1e6)
+        else:
+            escalated += 1
+    return local, escalated
+
+def main():
+    parser = argparse.ArgumentParser(description="本地分类器基准")
+    parser.add_argument("--tickets", type=int, default=50000, help="生成的历史工单数")
+    parser.add_argument("--enrich", type=int, default=2000, help="测量补全耗时的新工单数")
+    args = parser.parse_args()
+
+    from app.core.config import settings
+    from app.services import local_classifier as lc
+
+    print(f"生成 {args.tickets} 条历史工单: {os.environ['DATABASE_URL']}")
+    seed(args.tickets)
+    train_samples = lc.load_samples(holdout=False)
+    start = time.perf_counter()
+    model = lc.train(train_samples, settings.LOCAL_CLASSIFIER_DIM)
+    print(f"训练 {len(train_samples)} 条，耗时 {time.perf_counter() - start:.1f} 秒")
+    report = lc.evaluate(model, lc.load_samples(holdout=True))
+    lc._print_report(report)
+    model.meta["evaluation"] = report
+    model.save(settings.LOCAL_CLASSIFIER_PATH)
+    print(f"模型文件 {os.path.getsize(settings.LOCAL_CLASSIFIER_PATH) / 1024:.0f} KB")
+
+    rng = random.Random(2025)
+    contents = [make_ticket(rng)[0] for _ in range(args.enrich)]
+    local, escalated = asyncio.run(measure_enrichment(contents))
+    print(f"新工单 {args.enrich} 条（置信度阈值 {settings.LOCAL_CLASSIFIER_MIN_CONFIDENCE}）: "
+          f"本地处理 {len(local)} 条，补全耗时 p50 {statistics.median(local):.0f} µs；"
+          f"需要调用千帆 {escalated} 条（{escalated / args.enrich:.1%}）")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+通知生成与已读/未读 基准
+
+在临时SQLite数据库中:
+1. 突发写入: 分块批量导入工单（与 import_service 相同，每块一个事务），对比
+   - 逐条写入: 每条通知单独一个事务（在业务事务提交后逐条插入）
+   - 缓冲写入: notification_writer 合并为批量插入
+2. 未读数: 大量通知下按用户统计未读数，对比只有 user_id 索引（需回表读取 is_read）
+   和 (user_id, is_read, id) 覆盖索引
+3. 全部已读: 逐条调用标记已读（查询+更新+提交） 对比 一条批量UPDATE
+
+用法（在backend目录下）:
+    python benchmarks/bench_notification_writes.py --tickets 20000 --notifications 500000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# 必须在导入应用模块之前指定数据库
+_db_file = os.path.join(tempfile.mkdtemp(), "bench_notification_writes.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+os.environ["DEBUG"] = "false"
+
+from sqlalchemy import func, select, text, update
+
+from app.db import migrations
+from app.db.database import SessionLocal, engine
+from app.models.ticket import Ticket
+from app.models.user import Notification
+from app.services.notification_service import notification_writer  # 同时注册生命周期事件处理
+
+CHUNK_SIZE = 1000
+
+def import_tickets(count: int, prefix: str):
+    """分块导入工单，每块一个事务（触发生命周期事件）"""
+    for offset in range(0, count, CHUNK_SIZE):
+        db = SessionLocal()
+        try:
+            db.add_all([
+                Ticket(ticket_no=f"{prefix}{i:08d}", user_id=i % 500 + 1, content="路灯不亮", status="pending")
+                for i in range(offset, min(offset + CHUNK_SIZE, count))
+            ])
+            db.commit()
+        finally:
+            db.close()
+
+def write_one(user_id: int, ticket_id: int, title: str, content: str):
+    """逐条写入：每条通知一个事务"""
+    db = SessionLocal()
+    try:
+        db.add(Notification(user_id=user_id, ticket_id=ticket_id, title=title, content=content))
+        db.commit()
+    finally:
+        db.close()
+
+def notification_count() -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(Notification)).scalar()
+
+def bench_burst(count: int):
+    print(f"导入 {count} 条工单（每块 {CHUNK_SIZE} 条），每条生成一条受理通知:")
+    before = notification_count()
+    original = notification_writer.enqueue
+    notification_writer.enqueue = write_one
+    try:
+        start = time.perf_counter()
+        import_tickets(count, "SYNC")
+        elapsed = time.perf_counter() - start
+    finally:
+        notification_writer.enqueue = original
+    print(f"  逐条写入: {elapsed:.2f} 秒，通知 {notification_count() - before} 条，{count} 个通知事务")
+
+    before = notification_count()
+    flushes = notification_writer.flushes
+    start = time.perf_counter()
+    import_tickets(count, "BUFF")
+    imported = time.perf_counter() - start
+    notification_writer.stop()
+    elapsed = time.perf_counter() - start
+    print(f"  缓冲写入: 导入 {imported:.2f} 秒，全部通知写入 {elapsed:.2f} 秒，通知 {notification_count() - before} 条，"
+          f"{notification_writer.flushes - flushes} 个通知事务")
+
+def seed_notifications(count: int, users: int):
+    rng = random.Random(1)
+    with engine.begin() as conn:
+        for offset in range(0, count, 10000):
+            conn.execute(Notification.__table__.insert(), [
+                {"user_id": rng.randint(1, users), "ticket_id": i, "title": "工单状态更新",
+                 "content": "您的工单已处理完成，请查看并评价", "is_read": int(rng.random() < 0.9)}
+                for i in range(offset, min(offset + 10000, count))
+            ])
+        conn.exec_driver_sql("ANALYZE")
+
+def timed(func, rounds: int = 200) -> float:
+    latencies = []
+    for i in range(rounds):
+        start = time.perf_counter()
+        func(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+def bench_unread(count: int, users: int):
+    seed_notifications(count, users)
+    print(f"\n{count} 条通知（{users} 个用户，约 {count // users} 条/用户）未读数查询 p50:")
+    legacy_sql = text("SELECT count(*) FROM notifications INDEXED BY ix_notifications_user_id "
+                      "WHERE user_id = :user_id AND is_read = 0")
+
+    def current(user_id: int):
+        return select(func.count()).select_from(Notification).where(
+            Notification.user_id == user_id, Notification.is_read == 0
+        )
+
+    with engine.connect() as conn:
+        legacy_ms = timed(lambda i: conn.execute(legacy_sql, {"user_id": i % users + 1}).scalar())
+        current_ms = timed(lambda i: conn.execute(current(i % users + 1)).scalar())
+        plan = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT count(*) FROM notifications WHERE user_id = 1 AND is_read = 0"
+        ).all()[-1][-1]
+    print(f"  user_id 索引: {legacy_ms:.2f} ms")
+    print(f"  覆盖索引: {current_ms:.2f} ms（{plan}）")
+
+def bench_mark_read():
+    def unread_ids(user_id: int):
+        with engine.connect() as conn:
+            return conn.execute(select(Notification.id).where(
+                Notification.user_id == user_id, Notification.is_read == 0
+            )).scalars().all()
+
+    print("\n全部已读（每用户）:")
+    legacy, bulk = [], []
+    for user_id in range(1, 21):
+        ids = unread_ids(user_id)
+        start = time.perf_counter()
+        for notification_id in ids:
+            db = SessionLocal()
+            try:
+                db.get(Notification, notification_id).is_read = 1
+                db.commit()
+            finally:
+                db.close()
+        legacy.append((time.perf_counter() - start) * 1000)
+
+    for user_id in range(21, 41):
+        start = time.perf_counter()
+        db = SessionLocal()
+        try:
+            db.execute(update(Notification).where(
+                Notification.user_id == user_id, Notification.is_read == 0
+            ).values(is_read=1))
+            db.commit()
+        finally:
+            db.close()
+        bulk.append((time.perf_counter() - start) * 1000)
+    print(f"  逐条标记: p50 {statistics.median(legacy):.1f} ms")
+    print(f"  批量UPDATE: p50 {statistics.median(bulk):.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="通知生成与已读/未读基准")
+    parser.add_argument("--tickets", type=int, default=20000, help="突发导入的工单数")
+    parser.add_argument("--notifications", type=int, default=500000, help="未读数测试的通知数")
+    parser.add_argument("--users", type=int, default=500, help="用户数")
+    args = parser.parse_args()
+
+    migrations.upgrade(engine)
+    bench_burst(args.tickets)
+    bench_unread(args.notifications, args.users)
+    bench_mark_read()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+通知推送 连接压测
+
+以子进程启动应用（uvicorn，单进程），建立大量空闲的SSE通知连接（分属多个用户），然后:
+1. 服务进程内存随连接数的增长（每连接内存），空闲连接下 /health 的延迟
+2. 更新工单状态，测量通知从请求发出到送达该用户全部连接的耗时
+3. 断开一个连接后产生新通知，带 Last-Event-ID 重连，检查补发
+
+原方式中每个在线市民定时轮询 /users/notifications，没有新通知时也要查询数据库；
+推送方式下空闲连接只占用内存，不访问数据库。
+
+用法（在backend目录下）:
+    python benchmarks/bench_notifications.py --connections 2000 --users 500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# 必须在导入应用模块之前指定数据库（应用子进程通过环境变量继承）
+_db_file = os.path.join(tempfile.mkdtemp(), "bench_notifications.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+os.environ["DEBUG"] = "false"
+
+import httpx
+
+HOST = "127.0.0.1"
+
+def seed(users: int):
+    """每个用户一条待处理工单，返回 用户ID -> 工单ID"""
+    from app.db import migrations
+    from app.db.database import engine
+    from app.models.ticket import Ticket
+
+    migrations.upgrade(engine)
+    with engine.begin() as conn:
+        conn.execute(Ticket.__table__.insert(), [
+            {"ticket_no": f"NOTIFY{user_id:06d}", "user_id": user_id, "content": "路灯不亮", "status": "pending"}
+            for user_id in range(1, users + 1)
+        ])
+        rows = conn.execute(Ticket.__table__.select().with_only_columns(Ticket.user_id, Ticket.id)).all()
+    return dict(rows)
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+class Connection:
+    """原始TCP上的SSE连接，客户端开销小，单进程可保持数千个"""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.event_ids = []
+        self.received = asyncio.Event()
+        self.writer = None
+        self.task = None
+
+    async def open(self, port: int, last_event_id: int = None):
+        reader, self.writer = await asyncio.open_connection(HOST, port)
+        headers = f"GET /api/v1/users/notifications/{self.user_id}/stream HTTP/1.1\r\nHost: {HOST}\r\n" \
+                  "Accept: text/event-stream\r\n"
+        if last_event_id is not None:
+            headers += f"Last-Event-ID: {last_event_id}\r\n"
+        self.writer.write((headers + "\r\n").encode())
+        await self.writer.drain()
+        # 读到 retry 行表示服务端已订阅
+        while not (await reader.readline()).startswith(b"retry:"):
+            pass
+        self.task = asyncio.create_task(self._read(reader))
+
+    async def _read(self, reader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            if line.startswith(b"id:"):
+                self.event_ids.append(int(line[3:]))
+                self.received.set()
+
+    def close(self):
+        self.task.cancel()
+        self.writer.close()
+
+async def health_latencies(client: httpx.AsyncClient, count: int = 50):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        await client.get("/health")
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+async def run(port: int, pid: int, tickets, connections: int, users: int):
+    base_rss = rss_mb(pid)
+    async with httpx.AsyncClient(base_url=f"http://{HOST}:{port}", timeout=60) as client:
+        idle_health = statistics.median(await health_latencies(client))
+
+        start = time.perf_counter()
+        conns = [Connection(i % users + 1) for i in range(connections)]
+        for offset in range(0, connections, 200):
+            await asyncio.gather(*(conn.open(port) for conn in conns[offset:offset + 200]))
+        print(f"建立 {connections} 个连接（{users} 个用户）: {time.perf_counter() - start:.1f} 秒")
+        await asyncio.sleep(1)
+        rss = rss_mb(pid)
+        print(f"服务进程内存: {base_rss:.0f} MB -> {rss:.0f} MB（每连接约 {(rss - base_rss) * 1024 / connections:.0f} KB）")
+        print(f"/health p50: 无连接 {idle_health:.1f} ms，{connections} 个空闲连接 "
+              f"{statistics.median(await health_latencies(client)):.1f} ms")
+
+        # 通知送达耗时：更新工单状态 -> 该用户全部连接收到事件
+        delays = []
+        for user_id in range(1, min(users, 20) + 1):
+            targets = [conn for conn in conns if conn.user_id == user_id]
+            for conn in targets:
+                conn.received.clear()
+            start = time.perf_counter()
+            await client.put(f"/api/v1/tickets/{tickets[user_id]}", json={"status": "processing"})
+            await asyncio.wait_for(asyncio.gather(*(conn.received.wait() for conn in targets)), 10)
+            delays.append((time.perf_counter() - start) * 1000)
+        print(f"状态更新到通知送达（含更新请求本身）: p50 {statistics.median(delays):.1f} ms，"
+              f"最大 {max(delays):.1f} ms（每用户 {connections // users} 个连接）")
+
+        # 断线重连补发
+        conn = next(conn for conn in conns if conn.user_id == 1)
+        last_id = conn.event_ids[-1]
+        conn.close()
+        await client.put(f"/api/v1/tickets/{tickets[1]}", json={"status": "resolved"})
+        reconnect = Connection(1)
+        await reconnect.open(port, last_event_id=last_id)
+        await asyncio.wait_for(reconnect.received.wait(), 10)
+        print(f"断线期间的通知: Last-Event-ID={last_id} 重连后补发 {reconnect.event_ids}")
+
+        for conn in conns + [reconnect]:
+            if not conn.writer.is_closing():
+                conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="通知推送连接压测")
+    parser.add_argument("--connections", type=int, default=2000, help="SSE连接数")
+    parser.add_argument("--users", type=int, default=500, help="连接分属的用户数")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    tickets = seed(args.users)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", HOST, "--port", str(args.port),
+         "--log-level", "warning", "--backlog", "4096"],
+        cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+        env=dict(os.environ)
+    )
+    try:
+        deadline = time.time() + 120
+        while True:
+            try:
+                httpx.get(f"http://{HOST}:{args.port}/health", timeout=1)
+                break
+            except httpx.HTTPError:
+                if time.time() > deadline or process.poll() is not None:
+                    raise RuntimeError("应用启动失败")
+                time.sleep(0.3)
+        asyncio.run(run(args.port, process.pid, tickets, args.connections, args.users))
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+工单列表 深翻页 基准测试
+
+在临时SQLite数据库中生成指定数量的工单，测量 GET /api/v1/tickets/ 第N页的耗时:
+- 改造前: 没有 (created_at, id) 复合索引，skip/limit 偏移分页
+- 改造后: 有复合索引，分别测 skip/limit 偏移分页和游标分页
+
+用法（在backend目录下）:
+    python benchmarks/bench_pagination.py --tickets 200000 --page 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# 必须在导入应用模块之前指定数据库
+_db_file = os.path.join(tempfile.mkdtemp(), "bench_pagination.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+os.environ["DEBUG"] = "false"
+
+from fastapi import Response
+from sqlalchemy import text
+
+from app.api import tickets
+from app.db.database import AsyncSessionLocal, Base, async_engine, engine
+from app.models.ticket import Ticket
+from app.services.pagination import NEXT_CURSOR_HEADER
+
+PAGINATION_INDEXES = [index for index in Ticket.__table__.indexes
+                      if index.name in ("ix_tickets_created_at_id", "ix_tickets_user_created_at_id")]
+
+def seed(count: int):
+    """批量生成工单（直接插入表，不触发写入事件）"""
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(42)
+    now = datetime.now()
+    with engine.begin() as conn:
+        for offset in range(0, count, 5000):
+            rows = []
+            for i in range(offset, min(offset + 5000, count)):
+                created = now - timedelta(seconds=rng.randint(0, 365 * 86400))
+                rows.append({
+                    "ticket_no": f"BENCH{i:08d}",
+                    "user_id": rng.randint(1, 50),
+                    "content": "市民反映小区环境问题" * 5,
+                    "status": "pending",
+                    "created_at": created,
+                    "updated_at": created,
+                })
+            conn.execute(Ticket.__table__.insert(), rows)
+
+# 异步会话的连接池绑定事件循环，全部请求共用一个循环
+_loop = asyncio.new_event_loop()
+
+async def _fetch_page(skip: int, limit: int, cursor: str = None):
+    async with AsyncSessionLocal() as db:
+        response = Response()
+        page = await tickets.list_tickets(
+            response=response, skip=skip, limit=limit, status=None, category=None, cursor=cursor, fields=None, db=db
+        )
+        return [t["id"] for t in json.loads(page.body)], page.headers.get(NEXT_CURSOR_HEADER)
+
+def fetch_page(skip: int, limit: int, cursor: str = None):
+    return _loop.run_until_complete(_fetch_page(skip, limit, cursor))
+
+def measure(runner, rounds: int) -> float:
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        runner()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description="深翻页基准测试")
+    parser.add_argument("--tickets", type=int, default=200000, help="生成的工单数")
+    parser.add_argument("--page", type=int, default=1000, help="测量的页码（从1开始）")
+    parser.add_argument("--limit", type=int, default=20, help="每页条数")
+    parser.add_argument("--rounds", type=int, default=5, help="重复次数，取中位数")
+    args = parser.parse_args()
+
+    print(f"生成 {args.tickets} 条工单: {_db_file}")
+    seed(args.tickets)
+    skip = (args.page - 1) * args.limit
+
+    with engine.begin() as conn:
+        for index in PAGINATION_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+    before = measure(lambda: fetch_page(skip, args.limit), args.rounds)
+    expected, _ = fetch_page(skip, args.limit)
+
+    for index in PAGINATION_INDEXES:
+        index.create(bind=engine)
+    after_offset = measure(lambda: fetch_page(skip, args.limit), args.rounds)
+
+    # 取得第N页的游标（上一页最后一行）
+    _, cursor = fetch_page(skip - args.limit, args.limit)
+    after_cursor = measure(lambda: fetch_page(0, args.limit, cursor), args.rounds)
+    page, _ = fetch_page(0, args.limit, cursor)
+
+    print(f"\n第{args.page}页（每页{args.limit}条）中位耗时:")
+    print(f"  改造前 偏移分页（无复合索引）: {before:.1f} ms")
+    print(f"  改造后 偏移分页: {after_offset:.1f} ms")
+    print(f"  改造后 游标分页: {after_cursor:.1f} ms")
+    print(f"  游标分页结果与偏移分页一致: {page == expected}")
+
+    # 连接池中的aiosqlite连接不关闭时进程无法退出
+    _loop.run_until_complete(async_engine.dispose())
+
+if __name__ == "__main__":
+    main()
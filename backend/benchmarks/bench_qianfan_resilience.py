@@ -0,0 +1,131 @@
+"""
+千帆调用保护 基准
+
+启动本地模拟千帆服务（benchmarks/fake_qianfan.py），按固定速率持续发起意图分析调用（不使用缓存），
+依次模拟 正常 → 千帆报错 → 千帆变慢 → 恢复 四个阶段，对比:
+- 原方式: 不经过调用保护，SDK默认重试和超时
+- 调用保护: 并发上限 + 自适应调用时限 + 熔断器
+按调用开始时所处阶段统计发起数、未完成（积压）数、耗时、降级比例和千帆侧最大并发，以及恢复阶段开始后
+第一个正常（非降级）结果的等待时间。
+
+用法（在backend目录下）:
+    python benchmarks/bench_qianfan_resilience.py --rate 20 --phase-seconds 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+PORT = int(os.environ.get("FAKE_QIANFAN_PORT", "8793"))
+CONTROL_URL = f"http://127.0.0.1:{PORT}/control"
+
+# 必须在导入应用模块之前设置: SDK请求本地模拟服务，不换取token；熔断时间缩短以便观察恢复
+os.environ["QIANFAN_BASE_URL"] = f"http://127.0.0.1:{PORT}"
+os.environ["QIANFAN_ACCESS_TOKEN"] = "fake"
+os.environ["QIANFAN_AK"] = ""
+os.environ["QIANFAN_SK"] = ""
+os.environ.setdefault("QIANFAN_BREAKER_OPEN_SECONDS", "5")
+os.environ["DEBUG"] = "false"
+
+def phases(seconds: float):
+    """(阶段名, 模拟延迟秒数, 错误率, 持续秒数)"""
+    return [
+        ("正常", 0.2, 0.0, seconds),
+        ("千帆报错", 0.2, 1.0, seconds),
+        ("千帆变慢", 15.0, 0.0, seconds * 1.5),
+        ("恢复", 0.2, 0.0, seconds * 1.5),
+    ]
+
+async def run_mode(name: str, guarded: bool, rate: float, phase_seconds: float):
+    from app.services.qianfan_service import QianfanService
+
+    service = QianfanService()
+    if not guarded:
+        service.guard = None
+    calls = []  # (阶段序号, 开始时间, 耗时, 是否降级)
+    started = [0] * len(phases(phase_seconds))
+
+    async def call(phase: int, n: int):
+        start = time.monotonic()
+        result = await service.analyze_intent(f"小区门口垃圾堆放多日无人清理，第{n}次反映", use_cache=False)
+        calls.append((phase, start, time.monotonic() - start, bool(result.get("is_fallback"))))
+
+    # 按固定速率发起调用（不等待前一个调用结束），模拟持续到达的工单
+    tasks = []
+    phase_starts = []
+    server_peaks = []
+    async with httpx.AsyncClient() as control:
+        for index, (_, latency, error_rate, duration) in enumerate(phases(phase_seconds)):
+            await control.post(CONTROL_URL, params={"latency": latency, "error_rate": error_rate})
+            phase_starts.append(time.monotonic())
+            deadline = phase_starts[-1] + duration
+            while time.monotonic() < deadline:
+                started[index] += 1
+                tasks.append(asyncio.ensure_future(call(index, len(tasks))))
+                await asyncio.sleep(1 / rate)
+            server_peaks.append((await control.get(CONTROL_URL)).json()["max_active"])
+    # 结束后最多再等一个阶段时长，仍未完成的调用视为积压
+    _, pending = await asyncio.wait(tasks, timeout=phase_seconds)
+    for task in pending:
+        task.cancel()
+
+    print(f"{name}:")
+    for index, (phase_name, *_rest) in enumerate(phases(phase_seconds)):
+        rows = [c for c in calls if c[0] == index]
+        backlog = started[index] - len(rows)
+        if not rows:
+            print(f"  {phase_name}: 发起 {started[index]} 次，无完成的调用")
+            continue
+        latencies = sorted(c[2] for c in rows)
+        fallback = sum(1 for c in rows if c[3])
+        print(f"  {phase_name}: 发起 {started[index]} 次，未完成 {backlog}，p50 {statistics.median(latencies) * 1000:.0f} ms，"
+              f"p95 {latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000:.0f} ms，降级 {fallback / len(rows):.0%}，"
+              f"千帆侧最大并发 {server_peaks[index]}")
+    recovery_start = phase_starts[-1]
+    recovered = [start + elapsed for _, start, elapsed, fallback in calls
+                 if not fallback and start >= recovery_start]
+    if recovered:
+        print(f"  恢复阶段开始后 {min(recovered) - recovery_start:.1f} 秒得到第一个正常结果")
+    else:
+        print("  恢复阶段未得到正常结果")
+    if service.guard is not None:
+        stats = service.guard.stats()
+        print(f"  保护层: 熔断 {stats['opened']} 次，超时 {stats['timeouts']}，失败 {stats['failures']}，"
+              f"名额不足 {stats['rejected']}，熔断短路 {stats['short_circuited']}，当前状态 {stats['state']}")
+    service._executor.shutdown(wait=True, cancel_futures=True)
+
+async def run(rate: float, phase_seconds: float):
+    for name, guarded in (("原方式", False), ("调用保护", True)):
+        await run_mode(name, guarded, rate, phase_seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description="千帆调用保护基准")
+    parser.add_argument("--rate", type=float, default=20, help="每秒发起的调用数")
+    parser.add_argument("--phase-seconds", type=float, default=10, help="每个阶段的基准时长（秒）")
+    args = parser.parse_args()
+
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(__file__), "fake_qianfan.py"), "--port", str(PORT)]
+    )
+    try:
+        for _ in range(50):
+            try:
+                httpx.get(CONTROL_URL)
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        print(f"模拟千帆服务: {os.environ['QIANFAN_BASE_URL']}，每秒发起 {args.rate:g} 次调用")
+        asyncio.run(run(args.rate, args.phase_seconds))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
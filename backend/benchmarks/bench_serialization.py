@@ -0,0 +1,155 @@
+"""
+JSON响应序列化 微基准
+
+构造接近实际大小的响应数据（工单列表、类别趋势、地域热点、大屏快照），测量 FastAPI 从
+接口返回值到响应体的序列化耗时:
+- 改造前: 按 response_model 校验并转换（serialize_response），标准库 json 序列化（JSONResponse）
+- 默认响应类: 同样校验转换，orjson 序列化（FastJSONResponse）
+- 直接返回: 已组织好的数据直接构造 FastJSONResponse，跳过校验和转换
+
+用法（在backend目录下）:
+    python benchmarks/bench_serialization.py --rounds 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.core.responses import FastJSONResponse
+from app.schemas.ticket import AlertResponse, StatisticsResponse, TicketResponse
+
+CATEGORIES = ["环境卫生", "市政设施", "交通出行", "噪音扰民", "物业管理", "绿化养护", "供水供电", "教育医疗", "其他", "未分类"]
+DISTRICTS = [f"第{i}区" for i in range(1, 17)]
+
+def ticket_rows(count: int) -> List[Dict[str, Any]]:
+    """带完整AI分析结果的工单"""
+    rng = random.Random(1)
+    now = datetime.now()
+    rows = []
+    for i in range(count):
+        category = rng.choice(CATEGORIES)
+        content = f"市民反映{category}问题，" + "小区门口垃圾堆放多日无人清理，气味很大，影响居民出行。" * 4
+        rows.append({
+            "id": i + 1, "ticket_no": f"GH{i:012d}", "user_id": rng.randint(1, 50), "content": content,
+            "summary": content[:30], "category": category, "department": "环卫局", "priority": "medium",
+            "sentiment": "negative", "sentiment_score": 0.3, "location_district": rng.choice(DISTRICTS),
+            "location_street": "某某街道", "location_detail": "某某小区", "status": "pending",
+            "keywords": "垃圾,清理,气味", "solution_suggestion": "建议环卫部门尽快安排人员清运。" * 3,
+            "response_time": rng.randint(1, 72),
+            "ai_analysis": {
+                "core_issues": ["垃圾堆放", "无人清理"],
+                "entities": {"location": "小区门口", "time": "近期", "departments": ["环卫局"]},
+                "sentiment": {"type": "negative", "intensity": 0.7, "urgency": "medium", "keywords": ["垃圾", "气味"]},
+                "summary": content[:30], "suggested_category": category, "suggested_department": "环卫局",
+                "priority": "medium", "keywords": ["垃圾", "清理", "气味"],
+                "solution_suggestion": "建议环卫部门尽快安排人员清运。" * 3,
+                "stage_timings": {"analyze_intent": 812, "extract_keywords": 640, "generate_solution": 905},
+            },
+            "enrichment_status": "done", "parent_id": None,
+            "created_at": now - timedelta(minutes=i), "updated_at": now - timedelta(minutes=i),
+        })
+    return rows
+
+def category_trends(days: int) -> Dict[str, Any]:
+    rng = random.Random(2)
+    today = date.today()
+    daily_data = {
+        str(today - timedelta(days=d)): {c: rng.randint(0, 200) for c in CATEGORIES}
+        for d in range(days, 0, -1)
+    }
+    return {"time_range": f"最近{days}天", "daily_data": daily_data, "total_days": len(daily_data)}
+
+def location_trends() -> Dict[str, Any]:
+    rng = random.Random(3)
+    location_data = {}
+    for district in DISTRICTS:
+        by_category = {c: rng.randint(0, 500) for c in CATEGORIES}
+        location_data[district] = {"total": sum(by_category.values()), "by_category": by_category}
+    top = sorted(location_data.items(), key=lambda x: x[1]["total"], reverse=True)[:5]
+    return {"time_range": "最近7天", "all_locations": location_data, "top_locations": dict(top),
+            "total_locations": len(location_data)}
+
+def dashboard_snapshot() -> Dict[str, Any]:
+    rng = random.Random(4)
+    alerts = [
+        AlertResponse(alert_type="category_surge", level="high", title=f"{c}工单激增", description="近一小时工单数明显高于基线",
+                      data={"category": c, "count": 30, "expected": 8.5, "z_score": 4.2, "window_minutes": 60},
+                      created_at=datetime.now()).model_dump()
+        for c in CATEGORIES[:3]
+    ]
+    return {
+        "statistics": StatisticsResponse(
+            total_tickets=50000, by_category={c: rng.randint(0, 9000) for c in CATEGORIES},
+            by_status={"pending": 1200, "processing": 800, "resolved": 48000},
+            by_priority={"high": 5000, "medium": 40000, "low": 5000},
+            sentiment_distribution={"positive": 10000, "neutral": 30000, "negative": 10000},
+        ).model_dump(),
+        "alerts": alerts,
+        "category_trends": category_trends(30),
+        "location_trends": location_trends(),
+        "sentiment": {"time_range": "最近30天", "sentiment_distribution": {"positive": 10000, "neutral": 30000, "negative": 10000},
+                      "average_sentiment_score": 0.48, "satisfaction_rate": 20.0, "total_analyzed": 50000, "negative_rate": 20.0},
+        "keywords": {"time_range": "最近30天", "keywords": [{"name": f"关键词{i}", "value": 1000 - i} for i in range(30)],
+                     "total_keywords": 800},
+    }
+
+async def measure(content: Any, direct_content: Any, field, rounds: int) -> List[float]:
+    """三种方式的中位耗时（毫秒），direct_content 为直接返回时的数据"""
+    def timed(render) -> float:
+        latencies = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            render()
+            latencies.append((time.perf_counter() - start) * 1000)
+        return statistics.median(latencies)
+
+    async def through_fastapi(response_class):
+        start = time.perf_counter()
+        response_class(await serialize_response(field=field, response_content=content))
+        return (time.perf_counter() - start) * 1000
+
+    results = []
+    for response_class in (JSONResponse, FastJSONResponse):
+        latencies = [await through_fastapi(response_class) for _ in range(rounds)]
+        results.append(statistics.median(latencies))
+    results.append(timed(lambda: FastJSONResponse(direct_content)))
+    return results
+
+async def run(rounds: int):
+    rows = ticket_rows(100)
+    # 工单列表改造前返回 ORM 对象由 TicketResponse 校验，直接返回时为列投影得到的字典
+    cases = [
+        ("工单列表 100条完整字段", [TicketResponse(**row) for row in rows], rows, List[TicketResponse]),
+        ("类别趋势 90天", category_trends(90), None, Dict[str, Any]),
+        ("地域热点", location_trends(), None, Dict[str, Any]),
+        ("大屏快照", dashboard_snapshot(), None, Dict[str, Any]),
+    ]
+    print(f"序列化中位耗时（{rounds} 次）: 改造前 / 默认响应类 orjson / 直接返回")
+    for name, content, direct_content, annotation in cases:
+        field = create_response_field(name="response", type_=annotation)
+        legacy, default, direct = await measure(
+            content, content if direct_content is None else direct_content, field, rounds
+        )
+        size = len(JSONResponse(await serialize_response(field=field, response_content=content)).body)
+        print(f"  {name}（{size / 1024:.1f} KB）: {legacy:.3f} / {default:.3f} / {direct:.3f} ms"
+              f"（{legacy / default:.1f}x / {legacy / direct:.1f}x）")
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON响应序列化微基准")
+    parser.add_argument("--rounds", type=int, default=500, help="每种方式重复次数")
+    args = parser.parse_args()
+    asyncio.run(run(args.rounds))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+工单列表字段投影 基准
+
+在临时SQLite数据库中生成带完整AI分析结果的工单，通过应用（进程内ASGI）请求一页列表，对比:
+- 改造前: 查询完整 ORM 对象，按 List[TicketResponse] 逐行校验后序列化
+- 改造后: 默认摘要字段，只查询这些列，直接序列化
+- 改造后 fields 指定列表页常用字段（加上正文和部门）
+记录响应体大小和延迟。
+
+用法（在backend目录下）:
+    python benchmarks/bench_ticket_lists.py --tickets 20000 --limit 100
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# 必须在导入应用模块之前指定数据库
+_db_file = os.path.join(tempfile.mkdtemp(), "bench_ticket_lists.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+os.environ["DEBUG"] = "false"
+
+import httpx
+from fastapi import Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import migrations
+from app.db.database import async_engine, async_read_engine, engine, get_async_db
+from app.models.ticket import Ticket
+from app.schemas.ticket import TicketResponse
+from main import app
+
+CATEGORIES = ["环境卫生", "市政设施", "交通出行", "噪音扰民", "物业管理"]
+LIST_FIELDS = "ticket_no,summary,content,category,department,status,priority,created_at"
+
+def seed(count: int):
+    """批量生成工单，正文、处理建议和AI分析结果接近实际大小"""
+    migrations.upgrade(engine)
+    rng = random.Random(7)
+    now = datetime.now()
+    with engine.begin() as conn:
+        for offset in range(0, count, 5000):
+            rows = []
+            for i in range(offset, min(offset + 5000, count)):
+                created = now - timedelta(seconds=rng.randint(0, 90 * 86400))
+                category = rng.choice(CATEGORIES)
+                content = f"市民反映{category}问题，" + "小区门口垃圾堆放多日无人清理，气味很大，影响居民出行。" * 4
+                rows.append({
+                    "ticket_no": f"LIST{i:08d}",
+                    "user_id": rng.randint(1, 50),
+                    "content": content,
+                    "summary": content[:30],
+                    "category": category,
+                    "department": "环卫局",
+                    "priority": rng.choice(["high", "medium", "low"]),
+                    "sentiment": "negative",
+                    "sentiment_score": 0.3,
+                    "location_district": "东城区",
+                    "status": "pending",
+                    "keywords": "垃圾,清理,气味",
+                    "solution_suggestion": "建议环卫部门尽快安排人员清运，并加强日常巡查。" * 3,
+                    "ai_analysis": {
+                        "core_issues": ["垃圾堆放", "无人清理"],
+                        "entities": {"location": "小区门口", "time": "近期", "departments": ["环卫局"]},
+                        "sentiment": {"type": "negative", "intensity": 0.7, "urgency": "medium",
+                                      "keywords": ["垃圾", "气味"]},
+                        "summary": content[:30],
+                        "suggested_category": category,
+                        "suggested_department": "环卫局",
+                        "priority": "medium",
+                        "keywords": ["垃圾", "清理", "气味"],
+                        "solution_suggestion": "建议环卫部门尽快安排人员清运，并加强日常巡查。" * 3,
+                    },
+                    "created_at": created,
+                    "updated_at": created,
+                })
+            conn.execute(Ticket.__table__.insert(), rows)
+
+@app.get("/bench/legacy-list", response_model=List[TicketResponse])
+async def legacy_list(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
+    """改造前的工单列表"""
+    query = select(Ticket).order_by(Ticket.created_at.desc(), Ticket.id.desc()).offset(skip).limit(limit)
+    return list(await db.scalars(query))
+
+async def measure(client: httpx.AsyncClient, url: str, rounds: int):
+    latencies = []
+    size = 0
+    for i in range(rounds):
+        start = time.perf_counter()
+        response = await client.get(url)
+        latencies.append((time.perf_counter() - start) * 1000)
+        size = len(response.content)
+    return statistics.median(latencies), size
+
+async def run(limit: int, rounds: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        cases = [
+            ("改造前 完整 TicketResponse", f"/bench/legacy-list?limit={limit}"),
+            ("改造后 默认摘要字段", f"/api/v1/tickets/?limit={limit}"),
+            ("改造后 fields 含正文和部门", f"/api/v1/tickets/?limit={limit}&fields={LIST_FIELDS}"),
+            ("改造后 用户工单 默认摘要字段", f"/api/v1/tickets/user/1?limit={limit}"),
+        ]
+        # 预热连接池和语句缓存
+        for _, url in cases:
+            await client.get(url)
+        print(f"每页 {limit} 条，{rounds} 次请求中位数:")
+        baseline = None
+        for name, url in cases:
+            latency, size = await measure(client, url, rounds)
+            baseline = baseline or (latency, size)
+            print(f"  {name}: {latency:.1f} ms，响应 {size / 1024:.1f} KB"
+                  f"（{size / baseline[1]:.0%} 大小，{latency / baseline[0]:.0%} 耗时）")
+    await async_engine.dispose()
+    await async_read_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description="工单列表字段投影基准")
+    parser.add_argument("--tickets", type=int, default=20000, help="生成的工单数")
+    parser.add_argument("--limit", type=int, default=100, help="每页条数")
+    parser.add_argument("--rounds", type=int, default=200, help="每种方式请求次数")
+    args = parser.parse_args()
+
+    print(f"生成 {args.tickets} 条工单: {os.environ['DATABASE_URL']}")
+    seed(args.tickets)
+    asyncio.run(run(args.limit, args.rounds))
+
+if __name__ == "__main__":
+    main()
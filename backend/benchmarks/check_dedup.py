@@ -0,0 +1,100 @@
+"""
+受理去重回归检查
+
+在临时SQLite数据库中写入事件工单，再用 find_duplicate_parent 判断新工单是否被挂到已有事件下:
+- 同一事件的重复描述（标点、语气词不同，位置一致）应当合并
+- 话题相近但诉求不同的工单（垃圾 vs 垃圾+路灯，停电 vs 停水）、位置不同的同类工单不得合并
+- 未提供位置时只合并内容完全相同的工单
+- 端到端: 千帆不可用时父工单为降级分析结果（详细位置被改写为"待确认"），
+  同一位置的相同内容工单仍应挂到该父工单下
+
+每个用例输出汉明距离和判定结果，任一用例不符合预期时以非0状态退出，可用于CI。
+
+用法（在backend目录下）:
+    python benchmarks/check_dedup.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# 必须在导入应用模块之前指定数据库
+_db_file = os.path.join(tempfile.mkdtemp(), "check_dedup.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+os.environ["DEBUG"] = "false"
+os.environ.setdefault("QIANFAN_AK", "check")
+os.environ.setdefault("QIANFAN_SK", "check")
+# 千帆指向不可达的本地端口，受理时立即得到降级分析结果；不使用本地分类器
+os.environ["QIANFAN_BASE_URL"] = "http://127.0.0.1:9"
+os.environ["QIANFAN_ACCESS_TOKEN"] = "fake"
+os.environ["LOCAL_CLASSIFIER_PATH"] = os.path.join(os.path.dirname(_db_file), "missing.npz")
+os.environ["ENRICHMENT_MODE"] = "sync"
+
+from app.core.config import settings
+from app.db import migrations
+from app.db.database import SessionLocal, engine
+from app.models.ticket import Ticket
+from app.services.dedup_service import find_duplicate_parent, hamming_distance, simhash
+
+# (名称, 已有工单内容, 已有工单位置, 新工单内容, 新工单位置, 是否应当合并)
+CASES = [
+    ("重复-语气词", "人民路爆管了，水漫到马路上", "人民路", "人民路爆管了，水漫到马路上了", "人民路", True),
+    ("重复-标点", "人民路爆管了，水漫到马路上", "人民路", "人民路爆管了！！水漫到马路上", "人民路188号", True),
+    ("重复-无位置且内容相同", "幸福小区路灯坏了好几天", "", "幸福小区路灯坏了好几天。", "", True),
+    ("不同诉求-垃圾+路灯", "小区门口垃圾堆放多日无人清理，气味很大", "阳光花园",
+     "小区门口垃圾堆放多日无人清理，路灯也坏了很久", "阳光花园", False),
+    ("不同诉求-停电/停水", "幸福小区停电了", "幸福小区", "幸福小区停水了", "幸福小区", False),
+    ("不同位置", "人民路爆管了，水漫到马路上", "人民路", "人民路爆管了，水漫到马路上", "解放大道", False),
+    ("无位置且内容不同", "人民路爆管了，水漫到马路上", "", "人民路爆管了，水漫到马路上了", "", False),
+    ("一方无位置且内容不同", "人民路爆管了，水漫到马路上", "人民路", "人民路爆管了，水漫到马路上了", "", False),
+]
+
+def check(name, parent_content, parent_location, content, location, expected) -> bool:
+    """每个用例使用空表，只有一条已有事件工单"""
+    with SessionLocal() as db:
+        for ticket in db.query(Ticket).all():
+            db.delete(ticket)
+        db.flush()
+        db.add(Ticket(
+            ticket_no="DEDUP0001", user_id=1, content=parent_content, location_detail=parent_location,
+            location_reported=parent_location, status="pending", created_at=datetime.now() - timedelta(hours=1)
+        ))
+        db.commit()
+        merged = find_duplicate_parent(db, content, location) is not None
+
+    distance = hamming_distance(simhash(parent_content), simhash(content))
+    ok = merged == expected
+    print(f"{'ok' if ok else 'FAIL':<5}{name}: 距离 {distance}，{'合并' if merged else '不合并'}"
+          f"（预期{'合并' if expected else '不合并'}）")
+    return ok
+
+def check_fallback_parent() -> bool:
+    """通过受理接口向空库提交两条相同工单，父工单的AI分析为降级结果"""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    body = {"content": "朝阳区建国路井盖丢失，晚上很危险", "location_info": "朝阳区"}
+    with TestClient(app) as client:
+        parent = client.post("/api/v1/tickets/", json=body).json()
+        child = client.post("/api/v1/tickets/", json=body).json()
+
+    fallback = bool((parent.get("ai_analysis") or {}).get("is_fallback"))
+    ok = fallback and child.get("parent_id") == parent["id"]
+    print(f"{'ok' if ok else 'FAIL':<5}端到端-降级父工单: 父工单详细位置 {parent.get('location_detail')!r}，"
+          f"{'降级' if fallback else '非降级'}分析，子工单 parent_id={child.get('parent_id')}（预期 {parent['id']}）")
+    return ok
+
+def main():
+    migrations.upgrade(engine)
+    print(f"汉明距离上限 {settings.DEDUP_MAX_DISTANCE}")
+    failures = int(not check_fallback_parent())
+    failures += sum(not check(*case) for case in CASES)
+    if failures:
+        print(f"\n{failures} 个用例不符合预期")
+        sys.exit(1)
+    print("\n全部用例符合预期")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+查询计划回归检查
+
+在临时SQLite数据库中建表（走 app.db.migrations，与线上启动一致）并写入样例工单，
+依次调用各接口，截获其执行的SQL并用 EXPLAIN QUERY PLAN 检查:
+- 对 tickets / ticket_rollups / ticket_vectors / notifications 的全表扫描（SCAN 且未使用索引）视为回归
+- 需要临时B树排序的查询只提示，不判定失败
+
+任一查询出现全表扫描时以非0状态退出，可用于CI。
+
+用法（在backend目录下）:
+    python benchmarks/check_query_plans.py [-v]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# 必须在导入应用模块之前指定数据库
+_db_file = os.path.join(tempfile.mkdtemp(), "check_query_plans.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_file}"
+os.environ["DEBUG"] = "false"
+os.environ.setdefault("QIANFAN_AK", "check")
+os.environ.setdefault("QIANFAN_SK", "check")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from main import app
+from app.core.config import settings
+from app.db.database import SessionLocal, async_engine, async_read_engine, engine
+from app.models.ticket import Ticket
+from app.services.alert_engine import AlertEngine
+from app.services.dedup_service import find_duplicate_parent
+from app.services.enrichment_service import ENRICHMENT_QUEUED, count_backlog, enrichment_pool
+from app.services.similarity_index import vector_index
+
+WATCHED_TABLES = ("tickets", "ticket_rollups", "ticket_vectors", "notifications")
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?!.*\bUSING\b)")
+
+# (名称, GET路径 或 无参函数)
+CASES = [
+    ("工单列表", "/api/v1/tickets/?limit=20"),
+    ("工单列表-状态筛选", "/api/v1/tickets/?status=pending&limit=20"),
+    ("工单列表-类别筛选", "/api/v1/tickets/?category=环境卫生&limit=20"),
+    ("工单列表-游标翻页", "cursor:/api/v1/tickets/?limit=20"),
+    ("用户工单", "/api/v1/tickets/user/1?limit=20"),
+    ("用户工单-游标翻页", "cursor:/api/v1/tickets/user/1?limit=20"),
+    ("工单详情", "/api/v1/tickets/1"),
+    ("重复工单聚类", "/api/v1/tickets/1/cluster"),
+    ("相似工单", "/api/v1/tickets/1/similar"),
+    ("AI补全状态", "/api/v1/tickets/1/enrichment"),
+    ("AI补全队列", "/api/v1/tickets/enrichment/stats"),
+    ("全文检索", "/api/v1/tickets/search?keyword=垃圾"),
+    ("检索-状态+时间", "/api/v1/tickets/search?status=pending&start_date=2020-01-01"),
+    ("检索-类别", "/api/v1/tickets/search?category=市政设施"),
+    ("用户通知", "/api/v1/users/notifications/1"),
+    ("未读通知数", "/api/v1/users/notifications/1/unread-count"),
+    ("统计", "/api/v1/analysis/statistics?days=30"),
+    ("预警", "/api/v1/analysis/alerts"),
+    ("预警历史加载", lambda: AlertEngine(
+        settings.ALERT_BUCKET_MINUTES, settings.ALERT_WINDOW_BUCKETS, settings.ALERT_HISTORY_DAYS
+    ).ensure_loaded()),
+    ("类别趋势", "/api/v1/analysis/trends/category"),
+    ("地域热点", "/api/v1/analysis/trends/location"),
+    ("情绪分析", "/api/v1/analysis/sentiment-analysis"),
+    ("部门绩效", "/api/v1/analysis/department-performance"),
+    ("关键词云", "/api/v1/analysis/keywords-cloud"),
+    ("统计报告", "/api/v1/analysis/export/report"),
+    ("受理去重", lambda: _with_session(lambda db: find_duplicate_parent(db, "路灯坏了好几天", "幸福路"))),
+    ("补全积压统计", count_backlog),
+    ("补全领取", lambda: enrichment_pool._claim_next()),
+]
+
+def _with_session(func):
+    db = SessionLocal()
+    try:
+        return func(db)
+    finally:
+        db.close()
+
+def seed():
+    """通过ORM写入样例工单，触发全部写入事件（索引、向量、汇总）"""
+    samples = [
+        ("小区垃圾没人清理", "环境卫生", "城管局", "朝阳区"),
+        ("路灯坏了好几天", "市政设施", "住建局", "海淀区"),
+        ("晚上施工噪音太大", "噪音扰民", "环保局", "东城区"),
+        ("电梯坏了物业不修", "物业管理", "街道办", None),
+    ]
+    db = SessionLocal()
+    try:
+        for i in range(200):
+            content, category, department, district = samples[i % len(samples)]
+            db.add(Ticket(
+                ticket_no=f"CHECK{i:05d}",
+                user_id=1 + i % 5,
+                content=f"{content}（{i}）",
+                category=category,
+                department=department,
+                location_district=district,
+                location_detail="幸福路",
+                status="pending" if i % 3 else "resolved",
+                keywords=f"{category},{content[:2]}",
+                parent_id=1 if i % 10 == 9 else None,
+                enrichment_status=ENRICHMENT_QUEUED if i % 50 == 0 else "done",
+                enrichment_attempts=0
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+def explain(statement, parameters):
+    with engine.connect() as conn:
+        return [row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+
+def run_case(client: TestClient, target):
+    if callable(target):
+        target()
+    elif target.startswith("cursor:"):
+        url = target[len("cursor:"):]
+        cursor = client.get(url).headers["X-Next-Cursor"]
+        statements.clear()
+        response = client.get(f"{url}&cursor={cursor}")
+        assert response.status_code == 200, response.text
+    else:
+        response = client.get(target)
+        assert response.status_code == 200, (target, response.status_code, response.text)
+
+statements = []
+
+def main():
+    parser = argparse.ArgumentParser(description="查询计划回归检查")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出每条查询的执行计划")
+    args = parser.parse_args()
+    
+    seed()
+    # 向量索引首次加载会全量读取向量表，属于预期的一次性扫描
+    vector_index.ensure_loaded()
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and not executemany:
+            statements.append((statement, parameters))
+    
+    # API路由使用异步引擎（数据分析接口为只读引擎），后台任务和服务函数使用同步引擎
+    for target in (engine, async_engine.sync_engine, async_read_engine.sync_engine):
+        event.listen(target, "before_cursor_execute", capture)
+    
+    failures = 0
+    with TestClient(app) as client:
+        for name, target in CASES:
+            statements.clear()
+            run_case(client, target)
+            captured = list(statements)
+            
+            problems = []
+            notes = []
+            for statement, parameters in captured:
+                plan = explain(statement, parameters)
+                scans = [line for line in plan
+                         if (m := _FULL_SCAN.match(line)) and m.group(1) in WATCHED_TABLES]
+                if scans:
+                    problems.append((statement, plan))
+                elif any("TEMP B-TREE" in line for line in plan):
+                    notes.append((statement, plan))
+                if args.verbose:
+                    print(f"  [{name}] {' '.join(statement.split())[:120]}")
+                    for line in plan:
+                        print(f"      {line}")
+            
+            status = "FAIL" if problems else "ok"
+            print(f"{status:<5}{name}（{len(captured)}条查询）")
+            for statement, plan in problems + notes:
+                label = "全表扫描" if (statement, plan) in problems else "临时排序"
+                print(f"      {label}: {' '.join(statement.split())[:160]}")
+                for line in plan:
+                    print(f"        {line}")
+            failures += bool(problems)
+    
+    if failures:
+        print(f"\n{failures} 个用例出现全表扫描")
+        sys.exit(1)
+    print("\n全部查询均使用索引")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+本地模拟千帆服务
+
+实现千帆对话接口（ERNIE-Speed-128k）的请求和响应格式，响应延迟和错误率可在运行时调整，
+用于在不访问真实千帆的情况下测试调用保护（并发上限、调用时限、熔断器）。
+
+千帆SDK通过环境变量指向本服务，并跳过AK/SK换取token:
+    QIANFAN_BASE_URL=http://127.0.0.1:8793 QIANFAN_ACCESS_TOKEN=fake
+
+用法（在backend目录下）:
+    python benchmarks/fake_qianfan.py --port 8793 --latency 0.2
+    curl -X POST "http://127.0.0.1:8793/control?latency=10&error_rate=0"   # 调整延迟和错误率
+"""
+import argparse
+import asyncio
+import json
+import random
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="模拟千帆服务")
+state = {"latency": 0.2, "error_rate": 0.0, "requests": 0, "active": 0, "max_active": 0}
+
+RESULT = {
+    "core_issues": ["垃圾堆放", "无人清理"],
+    "entities": {"location": "小区门口", "time": "近期", "departments": ["环卫局"]},
+    "sentiment": {"type": "negative", "intensity": 0.7, "urgency": "medium", "keywords": ["垃圾"]},
+    "summary": "小区门口垃圾堆放无人清理",
+    "suggested_category": "环境卫生",
+    "suggested_department": "环卫局",
+    "priority": "medium",
+}
+
+@app.post("/rpc/2.0/ai_custom/v1/wenxinworkshop/chat/{model}")
+async def chat(model: str):
+    state["requests"] += 1
+    state["active"] += 1
+    state["max_active"] = max(state["max_active"], state["active"])
+    try:
+        await asyncio.sleep(state["latency"])
+    finally:
+        state["active"] -= 1
+    if random.random() < state["error_rate"]:
+        return JSONResponse({"error_code": 336100, "error_msg": "internal error"}, status_code=500)
+    return {
+        "id": f"as-{state['requests']}", "object": "chat.completion", "created": 0,
+        "result": json.dumps(RESULT, ensure_ascii=False),
+        "is_truncated": False, "need_clear_history": False,
+        "usage": {"prompt_tokens": 300, "completion_tokens": 80, "total_tokens": 380},
+    }
+
+@app.post("/control")
+async def control(latency: float = None, error_rate: float = None):
+    """调整响应延迟（秒）和错误率（0-1）"""
+    if latency is not None:
+        state["latency"] = latency
+    if error_rate is not None:
+        state["error_rate"] = error_rate
+    state["max_active"] = state["active"]
+    return state
+
+@app.get("/control")
+async def get_state():
+    return state
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟千帆服务")
+    parser.add_argument("--port", type=int, default=8793)
+    parser.add_argument("--latency", type=float, default=0.2, help="响应延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回错误的比例")
+    args = parser.parse_args()
+    state["latency"] = args.latency
+    state["error_rate"] = args.error_rate
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,29 @@
 """
 政务热线智能助手 - 主应用入口
 """
+import asyncio
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import tickets, analysis, qianfan_api, users
 from app.core.config import settings
-from app.db.database import engine, Base
+from app.core.middleware import CompressionMiddleware, ConditionalGetMiddleware
+from app.core.responses import FastJSONResponse
+from app.db import migrations
+from app.db.database import async_engine, async_read_engine, engine
+from app.services.enrichment_service import enrichment_pool
+from app.services import dedup_service, rollup_service, search_index
+from app.services.alert_engine import alert_engine
+from app.services.notification_broker import notification_broker
+from app.services.notification_service import notification_writer
+from app.services.pagination import NEXT_CURSOR_HEADER
 
-# 创建数据库表
-Base.metadata.create_all(bind=engine)
+# 创建数据库表，已有数据库补充新增的列和索引
+migrations.upgrade(engine)
+dedup_service.backfill_bands(engine)
+search_index.ensure_schema(engine)
+rollup_service.ensure_built()
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -17,7 +31,18 @@ app = FastAPI(
     description="基于百度千帆的政务热线智能处理系统",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=FastJSONResponse
+)
+
+# 只读接口按数据版本号返回 ETag / 304（放在CORS之内，304响应同样带CORS响应头）
+# 补全状态供前端轮询，始终返回最新状态
+app.add_middleware(
+    ConditionalGetMiddleware,
+    prefixes=("/api/v1/tickets", "/api/v1/analysis"),
+    exclude=("/api/v1/tickets/enrichment/stats", "/api/v1/analysis/dashboard/stream"),
+    exclude_suffixes=("/enrichment",),
+    time_bucket=settings.ETAG_TIME_BUCKET_SECONDS
 )
 
 # CORS配置
@@ -27,6 +52,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
+)
+
+# 响应压缩（最外层，压缩最终的响应体）
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.GZIP_MINIMUM_SIZE,
+    compresslevel=settings.GZIP_COMPRESS_LEVEL
 )
 
 # 注册路由
@@ -35,6 +68,35 @@ app.include_router(analysis.router, prefix="/api/v1/analysis", tags=["数据分
 app.include_router(qianfan_api.router, prefix="/api/v1/qianfan", tags=["千帆AI"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["用户管理"])
 
+@app.on_event("startup")
+async def start_background_workers():
+    """启动后台AI补全协程池"""
+    if settings.ENRICHMENT_MODE == "async":
+        await enrichment_pool.start()
+
+@app.on_event("startup")
+async def load_alert_engine():
+    """加载预警引擎的历史计数，之后随工单提交增量更新"""
+    await asyncio.to_thread(alert_engine.ensure_loaded)
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    """停止后台AI补全协程池"""
+    await enrichment_pool.stop()
+
+@app.on_event("shutdown")
+async def close_push_streams():
+    """写入缓冲中的通知，断开通知和大屏推送连接"""
+    await asyncio.to_thread(notification_writer.stop)
+    notification_broker.close()
+    analysis.dashboard_publisher.close()
+
+@app.on_event("shutdown")
+async def close_database():
+    """关闭异步数据库连接池"""
+    await async_engine.dispose()
+    await async_read_engine.dispose()
+
 @app.get("/")
 async def root():
     """根路径"""
@@ -20,58 +20,55 @@ import {
   FrownOutlined,
   CloseCircleOutlined
 } from '@ant-design/icons'
+import { userAPI } from '../services/api'
 
 const { Text } = Typography
 
-const NotificationCenter = () => {
+// 接口返回的通知转换为组件使用的格式
+const toItem = (n) => ({
+  id: n.id,
+  type: 'status_update',
+  title: n.title,
+  content: n.content,
+  time: new Date(n.created_at),
+  read: !!n.is_read
+})
+
+const NotificationCenter = ({ userId = 1 }) => {
   const [notifications, setNotifications] = useState([])
   const [unreadCount, setUnreadCount] = useState(0)
   const [visible, setVisible] = useState(false)
 
   useEffect(() => {
-    // 模拟通知数据
-    const mockNotifications = [
-      {
-        id: 1,
-        type: 'status_update',
-        title: '工单状态更新',
-        content: '您的工单 GH20251201001 已分派至环卫局处理',
-        emotion: 'neutral',
-        time: new Date(Date.now() - 5 * 60 * 1000),
-        read: false
-      },
-      {
-        id: 2,
-        type: 'processing',
-        title: '工单处理中',
-        content: '您的工单 GH20251201002 正在处理中，预计24小时内完成',
-        emotion: 'happy',
-        time: new Date(Date.now() - 30 * 60 * 1000),
-        read: false
-      },
-      {
-        id: 3,
-        type: 'completed',
-        title: '工单已完成',
-        content: '您的工单 GH20251130123 已处理完成，请查看并评价',
-        emotion: 'happy',
-        time: new Date(Date.now() - 2 * 60 * 60 * 1000),
-        read: true
-      },
-      {
-        id: 4,
-        type: 'urgent',
-        title: '紧急工单提醒',
-        content: '您的紧急工单 GH20251201003 将在1小时内优先处理',
-        emotion: 'urgent',
-        time: new Date(Date.now() - 4 * 60 * 60 * 1000),
-        read: true
-      }
-    ]
-    
-    setNotifications(mockNotifications)
-    setUnreadCount(mockNotifications.filter(n => !n.read).length)
-  }, [])
+    let source = null
+    let closed = false
+
+    // 先加载最近的通知，再订阅推送；从列表中最新的通知之后开始推送，期间产生的通知不会遗漏
+    userAPI.notifications(userId)
+      .then(data => {
+        const items = data.map(toItem)
+        setNotifications(items)
+        // 列表只含最近的通知，未读数另取
+        userAPI.unreadCount(userId).then(res => setUnreadCount(res.unread)).catch(() => {})
+        return items.length ? Math.max(...items.map(n => n.id)) : 0
+      })
+      .catch(() => 0)
+      .then(lastId => {
+        if (closed) return
+        // 断线后浏览器自动重连并带上 Last-Event-ID，服务端补发期间的通知
+        source = new EventSource(userAPI.notificationStreamURL(userId, lastId))
+        source.addEventListener('notification', (event) => {
+          const item = toItem(JSON.parse(event.data))
+          setNotifications(prev => prev.some(n => n.id === item.id) ? prev : [item, ...prev])
+          if (!item.read) setUnreadCount(prev => prev + 1)
+        })
+      })
+
+    return () => {
+      closed = true
+      if (source) source.close()
+    }
+  }, [userId])
 
   // 获取通知图标
   const getNotificationIcon = (type, emotion) => {
@@ -107,6 +104,7 @@ const NotificationCenter = () => {
 
   // 标记已读
   const markAsRead = (id) => {
+    userAPI.markNotificationRead(id).catch(() => {})
     setNotifications(notifications.map(n => 
       n.id === id ? { ...n, read: true } : n
     ))
@@ -115,6 +113,7 @@ const NotificationCenter = () => {
 
   // 全部标记为已读
   const markAllAsRead = () => {
+    userAPI.markAllNotificationsRead(userId).catch(() => {})
     setNotifications(notifications.map(n => ({ ...n, read: true })))
     setUnreadCount(0)
   }
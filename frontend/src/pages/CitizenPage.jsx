@@ -99,11 +99,23 @@ const CitizenPage = () => {
       }
       
       // 提交工单
-      const result = await ticketAPI.create({
+      let result = await ticketAPI.create({
         content: content,
         location_info: values.location_info
       })
       
+      // 后台补全模式下工单先入库，轮询等待AI分析完成
+      if (result.enrichment_status === 'queued' || result.enrichment_status === 'processing') {
+        for (let i = 0; i < 30; i++) {
+          await new Promise(resolve => setTimeout(resolve, 1000))
+          const state = await ticketAPI.enrichment(result.id)
+          if (state.ready || state.enrichment_status === 'failed') {
+            result = await ticketAPI.get(result.id)
+            break
+          }
+        }
+      }
+      
       setTicketResult(result)
       setAnalysis(result.ai_analysis)
       message.success({
@@ -75,25 +75,39 @@ const DashboardPage = () => {
 
   useEffect(() => {
     loadData()
-    // 模拟实时预警 - 缩短到2秒
-    const alertTimer = setTimeout(() => {
-      showRealtimeAlert()
-    }, 2000)
-    return () => clearTimeout(alertTimer)
   }, [timeRange, selectedDistrict, selectedCategory])
 
+  // 统计、预警、情绪、关键词由服务端推送：先收到完整快照，之后只收到变化的部分
+  useEffect(() => {
+    let knownAlerts = null
+    const source = new EventSource(analysisAPI.dashboardStreamURL(timeRange))
+    const apply = (event) => {
+      const data = JSON.parse(event.data)
+      if (data.statistics) setStatistics(data.statistics)
+      if (data.sentiment) setSentimentData(data.sentiment)
+      if (data.keywords) setKeywordsData(data.keywords)
+      if (data.alerts) {
+        // 首次快照之后新出现的预警弹窗提示
+        if (knownAlerts !== null) {
+          const fresh = data.alerts.find(a => !knownAlerts.has(a.title))
+          if (fresh) showRealtimeAlert(fresh)
+        }
+        knownAlerts = new Set(data.alerts.map(a => a.title))
+        setAlerts(data.alerts)
+      }
+      setLoading(false)
+    }
+    source.addEventListener('snapshot', apply)
+    source.addEventListener('delta', apply)
+    return () => source.close()
+  }, [timeRange])
+
   const loadData = async () => {
-    setLoading(true)
     try {
-      const [statsRes, alertsRes, ticketsRes, sentimentRes] = await Promise.all([
-        analysisAPI.statistics({ days: timeRange }),
-        analysisAPI.alerts({ days: timeRange }),
-        ticketAPI.list({ limit: 50 }),
-        analysisAPI.sentimentAnalysis({ days: timeRange })
-      ])
-
-      setStatistics(statsRes)
-      setAlerts(alertsRes)
+      const ticketsRes = await ticketAPI.list({
+        limit: 50,
+        fields: 'ticket_no,category,status,priority,department,content,created_at'
+      })
       
       // 筛选工单
       let filteredTickets = ticketsRes || []
@@ -106,40 +120,22 @@ const DashboardPage = () => {
         filteredTickets = filteredTickets.filter(t => t.category === selectedCategory)
       }
       setTickets(filteredTickets)
-      
-      setSentimentData(sentimentRes)
-      
-      // 加载关键词
-      try {
-        const keywordsRes = await fetch(`/api/v1/analysis/keywords-cloud?days=${timeRange}`)
-        if (keywordsRes.ok) {
-          const data = await keywordsRes.json()
-          setKeywordsData(data)
-        }
-      } catch (err) {
-        console.log('关键词数据加载失败')
-      }
     } catch (error) {
       console.error('加载数据失败:', error)
       message.error('加载数据失败')
-    } finally {
-      setLoading(false)
     }
   }
 
   // 显示实时预警
-  const showRealtimeAlert = () => {
-    const alert = {
-      type: 'hot_area',
-      level: 'high',
-      title: '🔥 热点区域预警',
-      area: '朝阳区',
-      category: '环境卫生',
-      count: 23,
-      increase: '+85%',
-      description: '近2小时内朝阳区环境卫生类工单激增23件，较昨日同期增长85%，建议立即关注'
-    }
-    setCurrentAlert(alert)
+  const showRealtimeAlert = (alert) => {
+    const { count, expected } = alert.data || {}
+    setCurrentAlert({
+      ...alert,
+      area: alert.data?.location || '全市',
+      category: alert.data?.category || '全部类别',
+      count,
+      increase: expected ? `+${Math.round((count - expected) / expected * 100)}%` : '-'
+    })
     setAlertModalVisible(true)
   }
 
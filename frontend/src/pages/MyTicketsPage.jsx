@@ -57,7 +57,10 @@ const MyTicketsPage = () => {
     setLoading(true)
     try {
       // 模拟用户ID为1
-      const data = await ticketAPI.list({ limit: 50 })
+      const data = await ticketAPI.list({
+        limit: 50,
+        fields: 'ticket_no,summary,content,category,department,status,priority,created_at'
+      })
       setTickets(data || [])
       setFilteredTickets(data || [])
     } catch (error) {
@@ -114,10 +117,15 @@ const MyTicketsPage = () => {
     return configs[status] || configs.pending
   }
 
-  // 查看详情
-  const handleViewDetail = (ticket) => {
+  // 查看详情（列表只含部分字段，详情另取完整工单）
+  const handleViewDetail = async (ticket) => {
     setSelectedTicket(ticket)
     setDetailVisible(true)
+    try {
+      setSelectedTicket(await ticketAPI.get(ticket.id))
+    } catch (error) {
+      console.error('加载工单详情失败:', error)
+    }
   }
 
   // 评价工单
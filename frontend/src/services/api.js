@@ -42,6 +42,9 @@ export const ticketAPI = {
   
   // 删除工单
   delete: (id) => api.delete(`/tickets/${id}`),
+  
+  // 获取AI补全状态
+  enrichment: (id) => api.get(`/tickets/${id}/enrichment`),
 }
 
 // 分析相关API
@@ -60,6 +63,29 @@ export const analysisAPI = {
   
   // 情绪分析
   sentimentAnalysis: (params) => api.get('/analysis/sentiment-analysis', { params }),
+  
+  // 大屏推送地址（Server-Sent Events）
+  dashboardStreamURL: (days) => `${api.defaults.baseURL}/analysis/dashboard/stream?days=${days}`,
+}
+
+// 用户相关API
+export const userAPI = {
+  // 获取通知列表
+  notifications: (userId) => api.get(`/users/notifications/${userId}`),
+  
+  // 未读通知数
+  unreadCount: (userId) => api.get(`/users/notifications/${userId}/unread-count`),
+  
+  // 标记通知已读
+  markNotificationRead: (id) => api.put(`/users/notifications/${id}/read`),
+  
+  // 全部标记已读
+  markAllNotificationsRead: (userId) => api.put('/users/notifications/read', { user_id: userId }),
+  
+  // 通知推送地址（Server-Sent Events）
+  notificationStreamURL: (userId, lastEventId) =>
+    `${api.defaults.baseURL}/users/notifications/${userId}/stream` +
+    (lastEventId != null ? `?last_event_id=${lastEventId}` : ''),
 }
 
 // 千帆AI相关API